@@ -0,0 +1,83 @@
+import io
+import os
+import time
+import tarfile
+import zipfile
+from output_files import OutputNames
+
+# Archive formats by file extension
+ARCHIVE_FORMATS = {".zip": "zip", ".tar": "tar"}
+
+
+class ArchiveSink:
+    """
+    Writes encoded results into one zip or tar archive instead of separate files.
+
+    Entries are stored without compression (JPEG data does not compress further), so adding an
+    entry costs one sequential write. Not thread-safe: entries are added by a single writer thread.
+    """
+
+    def __init__(self, path, root=None):
+        """
+        :param path: Path of the archive, ending in .zip or .tar; an existing archive is replaced.
+        :param root: Directory entry names are relative to, the current directory by default.
+        """
+        archive_format = ARCHIVE_FORMATS.get(os.path.splitext(path)[1].lower())
+        if archive_format is None:
+            raise ValueError(f"Unsupported archive: {path}. Supported extensions are: "
+                             f"{', '.join(ARCHIVE_FORMATS)}")
+        self.path = path
+        self.root = os.path.abspath(root or os.getcwd())
+        self._names = OutputNames()
+        if archive_format == "zip":
+            self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+            self._tar = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(path, "w", format=tarfile.PAX_FORMAT)
+
+    def entry_name(self, output_path):
+        """
+        Returns the archive entry name of an output path, named by output_pattern.
+
+        :param output_path: Path returned by generate_output_path().
+        :return: The path relative to the root with "/" separators, or the file name for
+                 paths outside the root.
+        """
+        output_path = os.path.abspath(output_path)
+        relative_path = os.path.relpath(output_path, self.root)
+        if relative_path.startswith(os.pardir):
+            relative_path = os.path.basename(output_path)
+        return relative_path.replace(os.sep, "/")
+
+    def write(self, output_path, encoded, source=None):
+        """
+        Adds an encoded result to the archive.
+
+        :param output_path: Path the result would have on disk.
+        :param encoded: Encoded image bytes.
+        :param source: Path to the source image; results of different sources never share a name.
+        :return: The location of the entry, "<archive>/<entry name>".
+        """
+        # An archive cannot replace an entry, so a source written again also gets a new name
+        name = self._names.reserve(self.entry_name(output_path))
+
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            self._zip.writestr(info, encoded)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(encoded)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(encoded))
+        return f"{self.path}/{name}"
+
+    def close(self):
+        """Writes the archive index and closes the file."""
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
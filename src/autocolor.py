@@ -0,0 +1,98 @@
+from PIL import Image, ImageStat
+import constants
+
+
+def parse_auto_color(border_color):
+    """
+    Returns the automatic color method of a border_color setting.
+
+    :param border_color: The profile setting: an RGB tuple, "auto" or "auto:<method>".
+    :return: One of constants.AUTO_BORDER_COLOR_METHODS, or None for a fixed color.
+    """
+    if not isinstance(border_color, str):
+        return None
+    name, _, method = border_color.partition(":")
+    method = method or constants.DEFAULT_AUTO_BORDER_COLOR_METHOD
+    if name != "auto" or method not in constants.AUTO_BORDER_COLOR_METHODS:
+        raise ValueError(f"Invalid border_color: {border_color}. Use an RGB color, \"auto\" or one of: "
+                         f"{', '.join('auto:' + m for m in constants.AUTO_BORDER_COLOR_METHODS)}")
+    return method
+
+
+def sample_decoded(img):
+    """
+    Reduces a decoded image to a small RGB sample for color statistics.
+
+    Each sample pixel averages a regular grid of constants.AUTO_COLOR_GRID_POINTS source pixels
+    per side instead of all of them, so the cost does not grow with the size of the photo.
+
+    :param img: The decoded image (PIL.Image).
+    :return: An RGB image of at most constants.AUTO_COLOR_SAMPLE_SIZE pixels per side.
+    """
+    scale = constants.AUTO_COLOR_SAMPLE_SIZE / max(img.width, img.height)
+    sample = img
+    if scale < 1:
+        size = (max(round(img.width * scale), 1), max(round(img.height * scale), 1))
+        grid = (size[0] * constants.AUTO_COLOR_GRID_POINTS, size[1] * constants.AUTO_COLOR_GRID_POINTS)
+        if grid[0] < img.width and grid[1] < img.height:
+            sample = img.resize(grid, Image.NEAREST)
+        sample = sample.resize(size, Image.BOX)
+    return sample if sample.mode == "RGB" else sample.convert("RGB")
+
+
+def sample_unloaded(img):
+    """
+    Decodes a small RGB sample of an image that is not loaded, without loading it.
+
+    The file is opened a second time through the same file object, and JPEG files are
+    decoded at up to 1/8 scale, so the cost is a fraction of a full decode.
+
+    :param img: The source image (PIL.Image), opened but not loaded.
+    :return: An RGB image of at most constants.AUTO_COLOR_SAMPLE_SIZE pixels per side.
+    """
+    position = img.fp.tell()
+    img.fp.seek(0)
+    try:
+        with Image.open(img.fp) as thumbnail:
+            thumbnail.draft("RGB", (constants.AUTO_COLOR_SAMPLE_SIZE, constants.AUTO_COLOR_SAMPLE_SIZE))
+            return sample_decoded(thumbnail)
+    finally:
+        img.fp.seek(position)
+
+
+def pick_border_color(sample, method):
+    """
+    Picks a border color from a small sample of the photo with Pillow's native statistics.
+
+    - "edge": the dominant color of the outer edge of the photo,
+    - "average": the mean color of the whole photo,
+    - "palette": the dominant color of the whole photo.
+
+    :param sample: A small RGB image, see sample_decoded() and sample_unloaded().
+    :param method: One of constants.AUTO_BORDER_COLOR_METHODS.
+    :return: An RGB tuple.
+    """
+    if method == "average":
+        return tuple(round(value) for value in ImageStat.Stat(sample).mean)
+
+    if method == "edge":
+        # The four edge strips side by side in one image
+        width, height = sample.size
+        strip = max(round(min(width, height) * constants.AUTO_COLOR_EDGE_SHARE), 1)
+        boxes = [(0, 0, width, strip), (0, height - strip, width, height),
+                 (0, 0, strip, height), (width - strip, 0, width, height)]
+        edges = Image.new("RGB", (2 * width + 2 * height, strip))
+        offset = 0
+        for left, top, right, bottom in boxes:
+            region = sample.crop((left, top, right, bottom))
+            if region.width < region.height:
+                region = region.transpose(Image.Transpose.ROTATE_90)
+            edges.paste(region, (offset, 0))
+            offset += region.width
+        sample = edges
+
+    # Most frequent color of a small palette; quantization merges near-identical shades
+    quantized = sample.quantize(colors=constants.AUTO_COLOR_PALETTE_SIZE, method=Image.Quantize.MEDIANCUT)
+    count, index = max(quantized.getcolors())
+    palette = quantized.getpalette()
+    return tuple(palette[index * 3:index * 3 + 3])
@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import PIL
+from executors import run_batch, resolve_backend
+from image_processor import process_image_variants
+from profile_plan import compile_profile
+import constants
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Synthetic corpus: (width, height) pairs covering common camera, phone, panorama and small web sizes
+CORPUS_SIZES = [
+    (640, 480),
+    (1920, 1080),
+    (4000, 3000),
+    (3000, 4000),
+    (6000, 2000),
+    (2048, 2048),
+]
+CORPUS_SUBSAMPLINGS = [0, 1, 2]  # 4:4:4, 4:2:2, 4:2:0
+CORPUS_QUALITY = 90
+# Input formats: file extension and image mode, covering the normalization paths of non-JPEG sources
+CORPUS_FORMATS = {
+    "jpeg": ("jpg", "RGB"),
+    "png": ("png", "RGBA"),  # Transparency flattened onto the border
+    "png16": ("png", "I;16"),  # 16-bit grayscale
+    "webp": ("webp", "RGBA"),
+    "tiff": ("tif", "CMYK"),
+}
+
+
+def run_benchmark(count=12, modes=None, workers=None, executors=None, border_colors=None, formats=None):
+    """
+    Benchmarks process_image on a synthetic corpus, JPEG by default.
+
+    Each scenario runs in a fresh process, so its peak RSS is not affected by other scenarios.
+
+    :param count: Number of images in the corpus.
+    :param modes: Processing modes to benchmark.
+    :param workers: Worker counts to benchmark.
+    :param executors: Executor backends to benchmark.
+    :param border_colors: Border colors to benchmark: "fixed" for the default color, "auto" or "auto:<method>".
+    :param formats: Input formats to benchmark, keys of CORPUS_FORMATS; each gets its own corpus.
+    :return: A JSON-serializable report.
+    """
+    modes = modes or ["border_size", "output_size"]
+    border_colors = border_colors or ["fixed"]
+    workers = workers or [1, 2, 4]
+    executors = executors or ["threads", "processes"]
+    formats = formats or ["jpeg"]
+
+    with tempfile.TemporaryDirectory(prefix=f"{constants.APP_NAME.lower()}-bench-") as work_dir:
+        output_dir = os.path.join(work_dir, "output")
+        os.makedirs(output_dir)
+
+        corpora = []
+        results = []
+        spawn_context = multiprocessing.get_context("spawn")
+        for image_format in formats:
+            corpus = generate_corpus(os.path.join(work_dir, f"corpus-{image_format}"), count, image_format)
+            corpora.extend(corpus)
+            for mode in modes:
+                for border_color in border_colors:
+                    for executor in executors:
+                        for max_workers in workers:
+                            profile_settings = benchmark_profile(mode, output_dir, border_color)
+                            with ProcessPoolExecutor(max_workers=1, mp_context=spawn_context) as runner:
+                                result = runner.submit(run_scenario, corpus, profile_settings, max_workers,
+                                                       executor).result()
+                            result.update(format=image_format, mode=mode, border_color=border_color)
+                            results.append(result)
+                            print(f"{image_format:<7} {mode:<12} {border_color:<12} {result['executor']:<10} "
+                                  f"workers={max_workers:<3} {result['images_per_s']:8.2f} images/s "
+                                  f"{result['mp_per_s']:8.2f} MP/s p95={result['latency_p95_ms']:.1f} ms",
+                                  file=sys.stderr)
+
+    return {
+        "environment": {
+            "app_version": constants.VERSION,
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": [{"format": c["format"], "width": c["width"], "height": c["height"], "subsampling": c["subsampling"]}
+                   for c in corpora],
+        "results": results,
+    }
+
+
+def run_startup_benchmark(runs=12):
+    """
+    Measures CLI cold-start time: each run starts a fresh interpreter, like a context-menu launch.
+
+    The commands run against a temporary settings directory, created by an untimed first run,
+    so the timed runs take the read-only settings path.
+
+    :param runs: Number of timed runs per command.
+    :return: A JSON-serializable report.
+    """
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+    with tempfile.TemporaryDirectory(prefix=f"{constants.APP_NAME.lower()}-startup-") as work_dir:
+        image_path = os.path.join(work_dir, "startup.jpg")
+        synthetic_image((640, 480), 0).save(image_path, format="JPEG", quality=CORPUS_QUALITY)
+        env = dict(os.environ, HOME=work_dir, APPDATA=work_dir)
+        commands = {
+            "help": ["--help"],
+            "list-profiles": ["settings", "list-profiles"],
+            "process-one-file": ["process", image_path, "--force"],
+        }
+
+        results = []
+        for name, arguments in commands.items():
+            command = [sys.executable, main_path] + arguments
+            subprocess.run(command, env=env, capture_output=True, check=True)  # Creates the settings
+
+            timings = []
+            for _ in range(runs):
+                start_time = time.perf_counter()
+                subprocess.run(command, env=env, capture_output=True, check=True)
+                timings.append(time.perf_counter() - start_time)
+
+            # One more run reports the imported modules and their cumulative import time
+            import_time = subprocess.run([sys.executable, "-X", "importtime"] + command[1:], env=env,
+                                         capture_output=True, text=True, check=True).stderr
+            modules, import_us = parse_import_time(import_time)
+
+            result = {
+                "command": name,
+                "runs": runs,
+                "median_ms": round(percentile(timings, 50) * 1000, 2),
+                "p95_ms": round(percentile(timings, 95) * 1000, 2),
+                "import_ms": round(import_us / 1000, 2),
+                "modules_imported": len(modules),
+                "imports_pillow": "PIL" in modules,
+            }
+            results.append(result)
+            print(f"{name:<18} median={result['median_ms']:.1f} ms p95={result['p95_ms']:.1f} ms "
+                  f"imports={result['import_ms']:.1f} ms pillow={result['imports_pillow']}", file=sys.stderr)
+
+    return {
+        "environment": {
+            "app_version": constants.VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def parse_import_time(output):
+    """
+    Parses the output of python -X importtime.
+
+    :param output: The captured stderr.
+    :return: A tuple (names of the imported modules, total import time in microseconds).
+    """
+    modules = []
+    total_us = 0
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # The header line
+        modules.append(name.strip())
+        if not name.startswith("  "):
+            total_us += int(cumulative)  # Top-level imports include the time of their nested imports
+    return modules, total_us
+
+
+def generate_corpus(corpus_dir, count, image_format="jpeg"):
+    """
+    Generates a deterministic synthetic corpus of varied sizes and aspect ratios, and for JPEG, subsampling.
+
+    :param corpus_dir: Directory to write the images to.
+    :param count: Number of images.
+    :param image_format: One of CORPUS_FORMATS.
+    :return: A list of dicts with the path, format, size and subsampling of each image.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    extension, mode = CORPUS_FORMATS[image_format]
+    corpus = []
+    for index in range(count):
+        width, height = CORPUS_SIZES[index % len(CORPUS_SIZES)]
+        path = os.path.join(corpus_dir, f"bench_{index:04d}_{width}x{height}.{extension}")
+        image = synthetic_image((width, height), index)
+        subsampling = None
+        if image_format == "jpeg":
+            subsampling = CORPUS_SUBSAMPLINGS[index % len(CORPUS_SUBSAMPLINGS)]
+            image.save(path, format="JPEG", quality=CORPUS_QUALITY, subsampling=subsampling)
+        else:
+            convert_corpus_image(image, mode).save(path, quality=CORPUS_QUALITY)
+        corpus.append({"path": path, "format": image_format, "width": width, "height": height,
+                       "subsampling": subsampling})
+    return corpus
+
+
+def convert_corpus_image(image, mode):
+    """
+    Converts a synthetic RGB image to the mode of a corpus format.
+
+    :param image: An RGB image returned by synthetic_image().
+    :param mode: Target mode: "RGBA" gets a radial transparency, "I;16" spans the full 16-bit range.
+    :return: The converted image (PIL.Image).
+    """
+    if mode == "RGBA":
+        image.putalpha(Image.radial_gradient("L").resize(image.size))
+        return image
+    if mode == "I;16":
+        return image.convert("L").convert("I").point(lambda value: value * 257).convert("I;16")
+    return image.convert(mode)
+
+
+def synthetic_image(size, seed):
+    """
+    Builds a deterministic image with fine detail and smooth gradients.
+
+    :param size: Image size (width, height).
+    :param seed: Varies the fractal region, so images differ from each other.
+    :return: An RGB image (PIL.Image).
+    """
+    width, height = size
+    # Render the fractal at a quarter of the size, it is the slow part
+    small_size = (max(width // 4, 1), max(height // 4, 1))
+    offset = (seed % 7) * 0.05
+    detail = Image.effect_mandelbrot(small_size, (-2.0 + offset, -1.2, 0.8 + offset, 1.2), 100)
+    channels = (
+        detail.resize(size, Image.BICUBIC),
+        Image.linear_gradient("L").resize(size),
+        Image.radial_gradient("L").resize(size),
+    )
+    return Image.merge("RGB", channels)
+
+
+def benchmark_profile(mode, output_dir, border_color="fixed"):
+    """
+    Returns the profile used for a benchmark scenario, based on the default settings.
+
+    :param mode: Processing mode.
+    :param output_dir: Directory for the results.
+    :param border_color: "fixed" for the default color, or an automatic color setting.
+    :return: Profile settings.
+    """
+    return {
+        "mode": mode,
+        "border_color": constants.DEFAULT_BORDER_COLOR if border_color == "fixed" else border_color,
+        "border_size": constants.DEFAULT_BORDER_SIZE,
+        "output_size": constants.DEFAULT_OUTPUT_SIZE,
+        "min_border": constants.DEFAULT_MIN_BORDER,
+        "overwrite": False,
+        "output_pattern": os.path.join(output_dir, "{filename}_" + mode + ".{ext}"),
+    }
+
+
+def run_scenario(corpus, profile_settings, max_workers, executor):
+    """
+    Processes the corpus once and measures it. Meant to run in a fresh process.
+
+    :return: A dict of throughput, latency and memory figures.
+    """
+    backend = resolve_backend(executor, len(corpus))
+    pixels = {c["path"]: c["width"] * c["height"] for c in corpus}
+    latencies = []
+    failed = 0
+
+    start_time = time.perf_counter()
+    # The profile is compiled once per scenario, like the process command does
+    plan = compile_profile(profile_settings)
+    for file, elapsed, error in run_batch([c["path"] for c in corpus], {"plan": plan}, max_workers, backend,
+                                          task=timed_process_image):
+        if error is None:
+            latencies.append(elapsed)
+        else:
+            failed += 1
+    total_time = time.perf_counter() - start_time
+
+    megapixels = sum(pixels.values()) / 1_000_000
+    return {
+        "executor": backend,
+        "workers": max_workers,
+        "images": len(corpus),
+        "failed": failed,
+        "seconds": round(total_time, 4),
+        "images_per_s": round(len(corpus) / total_time, 3),
+        "mp_per_s": round(megapixels / total_time, 3),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": peak_rss_mb(children=True) if backend == "processes" else None,
+    }
+
+
+def timed_process_image(input_path, plan):
+    """
+    Processes an image with a compiled profile and returns its wall-clock time in seconds.
+    """
+    start_time = time.perf_counter()
+    process_image_variants(input_path, [plan])
+    return time.perf_counter() - start_time
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of the values, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def peak_rss_mb(children=False):
+    """
+    Returns the peak resident set size in MB, or None where the resource module is not available.
+
+    :param children: Report the largest finished child process (the process pool workers)
+                     instead of the current process.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if platform.system() == "Darwin" else 1024
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return round(peak * unit / (1024 * 1024), 1)
+
+
+def write_report(report, output_path=None):
+    """
+    Writes the report as JSON to a file, or to stdout if no path is given.
+    """
+    data = json.dumps(report, indent=4)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(data)
+    else:
+        print(data)
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import hashlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import constants
+from utils import get_settings_directory
+
+
+def hash_profile(profile_settings):
+    """
+    Hashes the effective profile settings together with the application version.
+
+    :param profile_settings: Current profile parameters.
+    :return: A hex digest identifying the profile.
+    """
+    payload = json.dumps([constants.VERSION, profile_settings], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def hash_file(path):
+    """
+    Hashes the content of a file.
+
+    :param path: Path to the file.
+    :return: A hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(constants.CACHE_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProcessingCache:
+    """
+    A persistent manifest of processed files, used to skip inputs whose output is still valid.
+
+    Entries are keyed by the absolute input path and hold the input content hash with its
+    size and mtime, so unchanged files are recognized by stat alone and touched-but-identical
+    files by their hash. Each entry keeps the outputs of every profile (or profile group) hash.
+    """
+
+    def __init__(self, profile_settings=None):
+        self.cache_dir = str(os.path.join(get_settings_directory(), constants.CACHE_DIR_NAME))
+        self.manifest_path = os.path.join(self.cache_dir, constants.CACHE_MANIFEST_FILENAME)
+        self.profile_hash = hash_profile(profile_settings) if profile_settings is not None else None
+        self._gc_position = 0
+        self.entries = self._load_manifest()
+        self._pending = {}
+        self._changed = False
+        self._hasher = None
+        # The pipeline checks files in its reader thread while results are recorded in the main thread
+        self._lock = threading.RLock()
+
+    def is_up_to_date(self, input_path, profile_hash=None):
+        """
+        Checks whether the input was already processed with the current profile and its output is intact.
+
+        :param input_path: Path to the source image.
+        :param profile_hash: Profile hash to check instead of the one the cache was created with.
+        :return: True if the file can be skipped; False also if it cannot be read, so the task reports it.
+        """
+        key = os.path.abspath(input_path)
+        try:
+            stat = os.stat(key)
+            with self._lock:
+                entry = self.entries.get(key)
+                if not entry:
+                    # A new file is processed anyway, record() hashes it off the submitting thread
+                    self._pending[key] = (stat.st_size, stat.st_mtime_ns, None)
+                    return False
+                fast_path_hash = entry["hash"] if entry["size"] == stat.st_size and \
+                    entry["mtime_ns"] == stat.st_mtime_ns else None
+
+            # Hash outside the lock, it is the slow part
+            content_hash = fast_path_hash or hash_file(key)
+        except OSError:
+            return False
+
+        with self._lock:
+            return self._check_entry(key, stat, content_hash, profile_hash or self.profile_hash)
+
+    def _check_entry(self, key, stat, content_hash, profile_hash):
+        entry = self.entries.get(key)
+
+        # Remember the fingerprint taken before processing for record()
+        self._pending[key] = (stat.st_size, stat.st_mtime_ns, content_hash)
+
+        if not entry or entry["hash"] != content_hash:
+            return False
+
+        # Content is the same, refresh the fast path fingerprint
+        entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        entry["last_seen"] = time.time()
+        self._changed = True
+
+        outputs = entry["results"].get(profile_hash)
+        if not outputs:
+            return False
+
+        for output in outputs:
+            try:
+                output_stat = os.stat(output["path"])
+            except OSError:
+                return False
+            if output_stat.st_size != output["size"] or output_stat.st_mtime_ns != output["mtime_ns"]:
+                return False
+        return True
+
+    def record(self, input_path, output_paths, profile_hash=None):
+        """
+        Records a successfully processed file.
+
+        An input without a content hash yet (a new file, a run with --force or an input overwritten
+        by its output) is hashed on background threads; save() waits for them.
+
+        :param input_path: Path to the source image.
+        :param output_paths: Paths of the saved results.
+        :param profile_hash: Profile hash to record instead of the one the cache was created with.
+        """
+        key = os.path.abspath(input_path)
+        profile_hash = profile_hash or self.profile_hash
+        outputs = []
+        for output_path in output_paths:
+            output_path = os.path.abspath(output_path)
+            output_stat = os.stat(output_path)
+            outputs.append({"path": output_path, "size": output_stat.st_size, "mtime_ns": output_stat.st_mtime_ns})
+
+        with self._lock:
+            fingerprint = self._pending.pop(key, None)
+            # An input overwritten by its output is fingerprinted again, as the next run will see it
+            if any(output["path"] == key for output in outputs):
+                fingerprint = None
+            if fingerprint is not None and fingerprint[2] is not None:
+                self._record_entry(key, outputs, profile_hash, fingerprint)
+                return
+            if self._hasher is None:
+                self._hasher = ThreadPoolExecutor(max_workers=constants.CACHE_HASH_WORKERS,
+                                                  thread_name_prefix="cache-hash")
+            self._hasher.submit(self._record_hashed, key, outputs, profile_hash, fingerprint)
+
+    def _record_hashed(self, key, outputs, profile_hash, fingerprint):
+        try:
+            stat = os.stat(key)
+            content_hash = hash_file(key)
+        except OSError:
+            return  # The input is gone, there is nothing to skip next time
+        if fingerprint is not None and fingerprint[:2] != (stat.st_size, stat.st_mtime_ns):
+            return  # The input changed while it was processed, the next run processes it again
+        with self._lock:
+            self._record_entry(key, outputs, profile_hash, (stat.st_size, stat.st_mtime_ns, content_hash))
+
+    def _record_entry(self, key, outputs, profile_hash, fingerprint):
+        size, mtime_ns, content_hash = fingerprint
+        entry = self.entries.get(key)
+        if not entry or entry["hash"] != content_hash:
+            entry = self.entries[key] = {"results": {}}
+
+        entry.update(size=size, mtime_ns=mtime_ns, hash=content_hash, last_seen=time.time())
+        entry["results"][profile_hash] = outputs
+        self._changed = True
+
+    def output_paths(self):
+        """Return the set of all recorded output paths, except inputs overwritten by their output."""
+        with self._lock:
+            return {
+                output["path"] for key, entry in self.entries.items()
+                for outputs in entry["results"].values() for output in outputs if output["path"] != key
+            }
+
+    def collect_garbage(self):
+        """
+        Evicts stale entries: the oldest entries above the size limit, and entries that were not
+        seen for too long or whose input was deleted.
+
+        Age and deleted inputs are checked for constants.CACHE_GC_BATCH entries per call,
+        continuing where the previous save stopped, so a save costs the same whatever the
+        manifest size. An input whose directory is missing as well, e.g. on an unmounted share,
+        is unreachable rather than deleted; it is kept until it ages out.
+
+        :return: Number of evicted entries.
+        """
+        initial_count = len(self.entries)
+
+        if len(self.entries) > constants.CACHE_MAX_ENTRIES:
+            newest = sorted(self.entries.items(), key=lambda item: item[1].get("last_seen", 0), reverse=True)
+            self.entries = dict(newest[:constants.CACHE_MAX_ENTRIES])
+
+        oldest_seen = time.time() - constants.CACHE_MAX_AGE_DAYS * 24 * 60 * 60
+        if self._gc_position >= len(self.entries):
+            self._gc_position = 0
+        position = self._gc_position
+        batch = list(itertools.islice(self.entries.items(), position, position + constants.CACHE_GC_BATCH))
+        for key, entry in batch:
+            if entry.get("last_seen", 0) < oldest_seen or \
+                    (not os.path.exists(key) and os.path.isdir(os.path.dirname(key))):
+                del self.entries[key]
+            else:
+                position += 1
+        self._gc_position = position
+
+        evicted = initial_count - len(self.entries)
+        if evicted:
+            self._changed = True
+        return evicted
+
+    def save(self):
+        """Evict stale entries and write the manifest atomically, if anything changed."""
+        # Wait for the inputs recorded without a hash; the hashing threads take the lock
+        if self._hasher is not None:
+            self._hasher.shutdown(wait=True)
+            self._hasher = None
+
+        with self._lock:
+            self.collect_garbage()
+            if not self._changed:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.tmp"
+            # Encoded in one call: json.dump() would write every small token separately
+            data = json.dumps({"version": constants.CACHE_FORMAT_VERSION, "gc_position": self._gc_position,
+                               "entries": self.entries})
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.manifest_path)
+            self._changed = False
+
+    def clear(self):
+        """Remove all entries and the manifest file."""
+        self.entries = {}
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}  # A damaged manifest only costs a full re-run
+        if data.get("version") != constants.CACHE_FORMAT_VERSION:
+            return {}
+        self._gc_position = data.get("gc_position", 0)
+        return data.get("entries", {})
@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from PIL import Image
+from normalize import canvas_color
+import constants
+
+
+class BorderCanvasCache:
+    """
+    An LRU pool of prebuilt border canvases.
+
+    A canvas is keyed by (canvas size, inner box, color, mode). Its border area never changes,
+    so a reused canvas only needs the new image pasted into the inner box. A canvas is lent
+    to one caller at a time, so concurrent threads never share a canvas.
+    """
+
+    def __init__(self, max_canvases=constants.BORDER_CANVAS_CACHE_SIZE):
+        self.max_canvases = max_canvases
+        self._pool = OrderedDict()  # key -> list of idle canvases
+        self._idle_count = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def framed(self, img, borders, border_color):
+        """
+        Lends a canvas with the image pasted into the border frame.
+
+        :param img: The source image (PIL.Image).
+        :param borders: A tuple of borders (left, top, right, bottom).
+        :param border_color: The color of the border (RGB tuple).
+        :return: A context manager yielding the framed image, valid until the context exits.
+        """
+        left_border, top_border, right_border, bottom_border = borders
+        canvas_size = (img.width + left_border + right_border, img.height + top_border + bottom_border)
+        key = (canvas_size, (left_border, top_border, img.width, img.height), tuple(border_color), img.mode)
+
+        canvas = self._acquire(key)
+        if canvas is None:
+            canvas = Image.new(img.mode, canvas_size, canvas_color(img.mode, border_color))
+        canvas.paste(img, (left_border, top_border))
+        try:
+            yield canvas
+        finally:
+            self._release(key, canvas)
+
+    def _acquire(self, key):
+        with self._lock:
+            canvases = self._pool.get(key)
+            if not canvases:
+                return None
+            self._pool.move_to_end(key)
+            self._idle_count -= 1
+            canvas = canvases.pop()
+            if not canvases:
+                del self._pool[key]
+            return canvas
+
+    def _release(self, key, canvas):
+        with self._lock:
+            self._pool.setdefault(key, []).append(canvas)
+            self._pool.move_to_end(key)
+            self._idle_count += 1
+
+            # Evict the least recently used canvases above the bound
+            while self._idle_count > self.max_canvases:
+                oldest_key, canvases = next(iter(self._pool.items()))
+                canvases.pop(0)
+                self._idle_count -= 1
+                if not canvases:
+                    del self._pool[oldest_key]
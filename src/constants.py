@@ -1,24 +1,92 @@
 # Application-level constants
 APP_NAME = "EasyFrame"
 VERSION = "0.1.0"
-SUPPORTED_FORMATS = ["jpg"]
+SUPPORTED_FORMATS = ["jpg", "jpeg", "jpe", "png", "webp", "tif", "tiff", "bmp"]  # Results are always JPEG
+JPEG_EXTENSIONS = ["jpg", "jpeg", "jpe"]  # Other extensions of the source become "jpg" in output names
 
 # Logging settings
 LOG_FILE_MAX_SIZE = 1 * 1024 * 1024  # 1 MB
 LOG_BACKUP_COUNT = 5  # Keep up to 5 backup files
 LOGS_DIR_NAME = "logs"  # Name of the logs directory
+LOG_LEVEL = "INFO"  # "DEBUG" also logs every skipped file
+PROGRESS_REFRESH_INTERVAL = 0.2  # Seconds between redraws of the progress line on a terminal
+PROGRESS_LOG_INTERVAL = 10  # Seconds between progress lines when the output is not a terminal
 
 # Default settings for initial profile creation
 DEFAULT_MAX_WORKERS = 4
+DEFAULT_EXECUTOR = "threads"  # Can be "threads", "processes" or "auto"
+EXECUTOR_BACKENDS = ["threads", "processes", "auto"]
+TASKS_IN_FLIGHT_PER_WORKER = 2  # Submission window size relative to max_workers
+PIPELINE_PREFETCH_DEPTH = 8  # Files read ahead by the pipeline reader thread
+PIPELINE_WRITE_QUEUE_DEPTH = 16  # Encoded files waiting for the pipeline writer thread
+DEFAULT_MEMORY_BUDGET_MB = 0  # Memory budget for concurrently processed images, 0 disables the scheduler
+LARGE_IMAGE_BUDGET_SHARE = 0.5  # Images needing more of the budget than this run in the large image lane
+BORDER_CANVAS_CACHE_SIZE = 8  # Idle border canvases kept for reuse per process
+WATCH_POLL_INTERVAL = 0.1  # Seconds between scans of the watched folders
+WATCH_SETTLE_SECONDS = 2.0  # A file without a JPEG end marker is processed once unchanged for this long
+WATCH_CACHE_SAVE_INTERVAL = 30  # Seconds between manifest saves of the watch daemon
+DEFAULT_SERVE_HOST = "127.0.0.1"  # The framing service only listens on localhost by default
+DEFAULT_SERVE_PORT = 8765
+SERVE_MAX_REQUEST_MB = 64  # Larger uploads are rejected with 413
+SERVE_QUEUE_TIMEOUT = 5.0  # Seconds a request waits for a worker slot before it is rejected with 503
+SERVE_LATENCY_WINDOW = 1000  # Recent requests used for the latency percentiles
 DEFAULT_BORDER_COLOR = (255, 255, 255)  # White
+DEFAULT_AUTO_BORDER_COLOR_METHOD = "edge"  # Used for border_color "auto"
+AUTO_BORDER_COLOR_METHODS = ["edge", "average", "palette"]  # border_color "auto:<method>"
+AUTO_COLOR_SAMPLE_SIZE = 64  # Longer side of the sample automatic colors are computed on
+AUTO_COLOR_GRID_POINTS = 4  # Source pixels per side averaged into one sample pixel
+AUTO_COLOR_EDGE_SHARE = 0.1  # Width of the edge strips used by the "edge" method, relative to the shorter side
+AUTO_COLOR_PALETTE_SIZE = 8  # Colors the sample is quantized to when picking a dominant color
 DEFAULT_PROFILE = "basic_profile"
-DEFAULT_MODE = "border_size"  # Can be "border_size" or "output_size"
+DEFAULT_MODE = "border_size"  # Can be "border_size", "output_size" or "lossless_border"
 DEFAULT_BORDER_SIZE = "5%"
 DEFAULT_OUTPUT_SIZE = (1080, 1080)
 DEFAULT_MIN_BORDER = 0
+DEFAULT_RESAMPLE_PRESET = "quality"  # Can be "quality", "balanced" or "fast"
+DEFAULT_STREAMING = None  # border_size mode: True, False, or None to stream large JPEG files
+STREAMING_MIN_MEGAPIXELS = 50  # Images of at least this size are streamed when streaming is None
+DEFAULT_JPEG_QUALITY = 95
+DEFAULT_JPEG_SUBSAMPLING = 0  # 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+DEFAULT_JPEG_PROGRESSIVE = False
+DEFAULT_JPEG_OPTIMIZE = False
+DEFAULT_MAX_BYTES = 0  # Size limit of an output file in bytes, 0 for no limit
+MIN_SEARCH_JPEG_QUALITY = 10  # Lowest quality tried when fitting max_bytes
+MAX_BYTES_SEARCH_STEPS = 7  # Extra encodes when fitting max_bytes; enough to search qualities 10-94 exactly
+# Resample presets for output_size mode: (draft headroom factor, reducing_gap).
+# A draft factor of N lets libjpeg decode at a reduced DCT scale that still keeps
+# at least N times the output size; None decodes at full resolution.
+RESAMPLE_PRESETS = {
+    "quality": (None, None),
+    "balanced": (2, 3.0),
+    "fast": (1, 2.0),
+}
+# With several profiles, faster presets may resize from an already resized variant this many times larger
+RESIZE_SOURCE_HEADROOM = 2
 DEFAULT_OUTPUT_PATTERN = "{filename}_processed.{ext}"
 DEFAULT_ALLOW_OVERWRITE = False
+PROFILE_GEOMETRY_CACHE_SIZE = 64  # Source sizes whose borders and resize dimensions are memoized per profile
+OUTPUT_FSYNC = True  # Flush every output file to disk before it is renamed into place
+OUTPUT_DIR_FSYNC_BATCH = 64  # Renames after which the changed directories are flushed
+OUTPUT_DIR_FSYNC_INTERVAL = 1.0  # Seconds after which the changed directories are flushed on the next rename
+OUTPUT_NAMES_RECENT = 10000  # Written output names still kept from other sources of the same process
+
+# External tool used by the lossless border mode
+JPEGTRAN_EXECUTABLE = "jpegtran"
+
+# Per-stage instrumentation
+METRICS_HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+METRICS_SLOWEST_FILES = 10
 
 # File paths for settings
 USER_CONFIG_FILENAME = "user_settings.json"
-PROFILES_DIR_NAME = "profiles"
\ No newline at end of file
+PROFILES_DIR_NAME = "profiles"
+
+# Incremental processing cache
+CACHE_DIR_NAME = "cache"
+CACHE_MANIFEST_FILENAME = "manifest.json"
+CACHE_FORMAT_VERSION = 2
+CACHE_MAX_AGE_DAYS = 90  # Entries not seen for this long are evicted
+CACHE_MAX_ENTRIES = 1_000_000
+CACHE_HASH_CHUNK_SIZE = 1024 * 1024
+CACHE_HASH_WORKERS = 2  # Threads hashing inputs off the processing loop
+CACHE_GC_BATCH = 1000  # Entries checked for a deleted input per manifest save
\ No newline at end of file
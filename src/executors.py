@@ -0,0 +1,180 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from image_processor import process_image
+import constants
+
+# Task function and profile settings of the current worker process, set once by the pool initializer
+_worker_task = None
+_worker_profile_settings = None
+
+
+def _init_worker(task, profile_settings):
+    """
+    Stores the task and profile settings in a worker process so they are sent once per worker, not per task.
+
+    :param task: Function called for each file as task(input_path, **profile_settings).
+    :param profile_settings: Current profile parameters.
+    """
+    global _worker_task, _worker_profile_settings
+    _worker_task = task
+    _worker_profile_settings = profile_settings
+
+
+def _process_in_worker(input_path, file_arguments):
+    """
+    Processes a single file in a worker process using the task and profile received by the initializer.
+
+    :param input_path: Path to the source image.
+    :param file_arguments: Keyword arguments of this file: the prefetched content, reserved output paths.
+    :return: The task result, by default the path of the saved result.
+    """
+    return _worker_task(input_path, **file_arguments, **_worker_profile_settings)
+
+
+def resolve_backend(backend, file_count=None):
+    """
+    Resolves the executor backend name, choosing one for the "auto" setting.
+
+    :param backend: One of constants.EXECUTOR_BACKENDS.
+    :param file_count: Number of files in the batch, or None if it is not known in advance.
+    :return: "threads" or "processes".
+    """
+    if backend not in constants.EXECUTOR_BACKENDS:
+        raise ValueError(
+            f"Invalid executor: {backend}. Supported executors are: {', '.join(constants.EXECUTOR_BACKENDS)}")
+
+    if backend == "auto":
+        # Starting worker processes only pays off when there is more than one file and more than one core
+        is_batch = file_count is None or file_count > 1
+        return "processes" if is_batch and (os.cpu_count() or 1) > 1 else "threads"
+    return backend
+
+
+def run_batch(files, profile_settings, max_workers=constants.DEFAULT_MAX_WORKERS,
+              backend=constants.DEFAULT_EXECUTOR, scheduler=None, task=process_image, prefetched=False,
+              reserve=None, release=None):
+    """
+    Processes files concurrently, keeping a bounded number of tasks in flight.
+
+    :param files: Iterable of paths to the source images, consumed lazily.
+    :param profile_settings: Current profile parameters.
+    :param max_workers: Number of worker threads or processes.
+    :param backend: Executor backend, one of constants.EXECUTOR_BACKENDS.
+    :param scheduler: Optional MemoryBudgetScheduler that admits tasks by estimated memory cost.
+    :param task: Module-level function called for each file as task(input_path, **profile_settings).
+    :param prefetched: Whether files yields (file_path, content) pairs; the content is passed to the
+                       task as data=content, and an OSError content is reported as the file's error.
+    :param reserve: Optional function called as reserve(file_path) in this process when the file is
+                    submitted; its result is passed to the task as output_paths=, so output names are
+                    chosen where worker processes cannot race for them.
+    :param release: Optional function called as release(reserved) with the result of reserve()
+                    once the task of the file has finished or failed.
+    :return: A generator of (file_path, result, error) tuples, error is None on success.
+    """
+    backend = resolve_backend(backend)
+
+    if backend == "processes":
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(task, profile_settings)
+        )
+        submit_task = lambda file, arguments: executor.submit(_process_in_worker, file, arguments)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        submit_task = lambda file, arguments: executor.submit(task, file, **arguments, **profile_settings)
+
+    def submit(file, data):
+        arguments = {}
+        if data is not None:
+            arguments["data"] = data
+        if reserve is not None:
+            arguments["output_paths"] = reserve(file)
+        return submit_task(file, arguments), arguments.get("output_paths")
+
+    max_in_flight = max_workers * constants.TASKS_IN_FLIGHT_PER_WORKER
+
+    with executor:
+        pending = {}
+        files_iter = iter(files)
+        exhausted = False
+        blocked = None  # A (file, data, cost) tuple waiting for memory to be released
+
+        while pending or blocked or not exhausted:
+            # Top up the submission window
+            while len(pending) < max_in_flight:
+                if blocked:
+                    file, data, cost = blocked
+                else:
+                    item = next(files_iter, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    file, data = item if prefetched else (item, None)
+                    if isinstance(data, OSError):
+                        yield file, None, data
+                        continue
+                    cost = scheduler.estimate(file, data) if scheduler else 0
+
+                if scheduler:
+                    if not scheduler.can_admit(cost):
+                        blocked = (file, data, cost)
+                        break
+                    scheduler.admit(cost)
+
+                blocked = None
+                future, reserved = submit(file, data)
+                pending[future] = (file, cost, reserved)
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file, cost, reserved = pending.pop(future)
+                if scheduler:
+                    scheduler.release(cost)
+                if release is not None and reserved is not None:
+                    release(reserved)
+                error = future.exception()
+                yield file, None if error else future.result(), error
+
+
+class BatchStats:
+    """
+    Collects throughput statistics of a batch run.
+    """
+
+    def __init__(self, backend, max_workers):
+        self.backend = backend
+        self.max_workers = max_workers
+        self.processed = 0
+        self.failed = 0
+        self.start_time = time.perf_counter()
+        self.end_time = None
+
+    def add(self, error):
+        """Counts a finished file."""
+        if error is None:
+            self.processed += 1
+        else:
+            self.failed += 1
+
+    def finish(self):
+        """Stops the batch timer."""
+        self.end_time = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+    @property
+    def throughput(self):
+        """Successfully processed images per second."""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        """Return a human-readable throughput report."""
+        return (f"Processed {self.processed} file(s), {self.failed} failed, in {self.elapsed:.2f}s "
+                f"({self.throughput:.2f} images/s, '{self.backend}' backend, {self.max_workers} workers).")
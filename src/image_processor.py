@@ -1,219 +1,493 @@
+import io
+import os
+from contextlib import contextmanager
 from PIL import Image, ImageOps
 import constants
+from canvas_cache import BorderCanvasCache
+from lossless import add_lossless_border
+from streaming import should_stream, decode_into_frame
+from normalize import normalize_mode, canvas_mode, canvas_color, ALPHA_MODES
+from autocolor import sample_decoded, sample_unloaded, pick_border_color
 from utils import generate_output_path
+from output_files import output_names, write_atomic
+from profile_plan import compile_profile
 
+# Prebuilt border canvases shared by the threads of this process
+border_canvas_cache = BorderCanvasCache()
 
-def process_image(input_path, **profile_settings):
+
+
+def process_image(input_path, metrics=None, **profile_settings):
     """
     Adds a border to an image. Supports different modes.
 
     :param input_path: Path to the source image.
+    :param metrics: Optional FileMetrics that records per-stage timings and byte counts.
     :param profile_settings: Current profile parameters.
+    :return: Path of the saved result.
     """
-    # Extract parameters from the profile
-    mode = profile_settings.get("mode", constants.DEFAULT_MODE)
-    overwrite = profile_settings.get("overwrite", constants.DEFAULT_ALLOW_OVERWRITE)
-    output_pattern = profile_settings.get("output_pattern", constants.DEFAULT_OUTPUT_PATTERN)
-
-    img = Image.open(input_path)
-
-    # Define valid modes and their required/optional arguments
-    mode_args = {
-        "output_size": {
-            "required": ["output_size"],
-            "optional": ["min_border"]
-        },
-        "border_size": {
-            "required": ["border_size"],
-            "optional": []
-        }
-    }
+    return process_image_variants(input_path, [profile_settings], metrics)[0]
 
-    # Validate the mode
-    if mode not in mode_args:
-        raise ValueError(f"Invalid mode: {mode}. Supported modes are: {', '.join(mode_args.keys())}")
 
-    # Filter arguments based on the mode
-    filtered_profile_settings = filter_profile_settings(
-        profile_settings,
-        required_keys=mode_args[mode]["required"],
-        optional_keys=mode_args[mode]["optional"]
-    )
+def process_image_variants(input_path, profiles, metrics=None, data=None, output_paths=None):
+    """
+    Produces one framed variant of an image per profile, decoding the source only once.
+
+    :param input_path: Path to the source image.
+    :param profiles: List of profile settings or compiled ProfilePlan objects, one per output.
+    :param metrics: Optional FileMetrics that records per-stage timings and byte counts.
+    :param data: Optional content of the source file, already read by the caller.
+    :param output_paths: Paths returned by reserve_output_paths() in the submitting process;
+                         by default the names are reserved in this process.
+    :return: Paths of the saved results, in the order of the profiles.
+    """
+    rendered = render_image_variants(input_path, profiles, metrics, data)
 
-    # Initialize borders
-    borders = None
+    # Save the results
+    if output_paths is None:
+        output_paths = [write_output(output_path, encoded, input_path) for output_path, encoded in rendered]
+    else:
+        for output_path, (_, encoded) in zip(output_paths, rendered):
+            write_atomic(output_path, encoded)
+    if metrics:
+        metrics.mark("write")
 
-    # Select mode
-    if mode == "output_size":
-        target_size = filtered_profile_settings["output_size"]
-        min_border = filtered_profile_settings.get("min_border", constants.DEFAULT_MIN_BORDER)
+    return output_paths
 
-        # Resize the image and calculate borders
-        resized_img, new_size = resize_image(img, target_size, min_border)
-        borders = calculate_borders_for_output_size(new_size, target_size)
 
-        # Update the image to the resized version
-        img = resized_img
-    elif mode == "border_size":
-        borders = calculate_borders_for_border_size(img, **filtered_profile_settings)
+def render_image_variants(input_path, profiles, metrics=None, data=None):
+    """
+    Frames and encodes one variant of an image per profile in memory, decoding the source only once.
 
-    # Apply the border
-    img_with_border = apply_border(img, borders, tuple(profile_settings.get("border_color", constants.DEFAULT_BORDER_COLOR)))
+    :param input_path: Path to the source image, also used to name the outputs.
+    :param profiles: List of profile settings or compiled ProfilePlan objects, one per output.
+    :param metrics: Optional FileMetrics that records per-stage timings and byte counts.
+    :param data: Optional content of the source file, already read by the caller.
+    :return: A list of (output_path, encoded JPEG bytes), in the order of the profiles.
+    """
+    if data is not None:
+        img = Image.open(io.BytesIO(data))
+    else:
+        img = Image.open(input_path)
+    if metrics:
+        metrics.bytes_read = len(data) if data is not None else os.path.getsize(input_path)
+        metrics.mark("open")
 
-    output_path = generate_output_path(input_path, output_pattern, overwrite)
+    variants = [prepare_variant(img, profile_settings) for profile_settings in profiles]
+    buffers = [io.BytesIO() for _ in variants]
+    encode_variants(img, variants, buffers, data if data is not None else input_path, metrics)
 
-    # Save the result
-    img_with_border.save(output_path, format="JPEG", quality=95, subsampling=0)
+    return [
+        (generate_output_path(input_path, variant["output_pattern"], variant["overwrite"]), buffer.getvalue())
+        for variant, buffer in zip(variants, buffers)
+    ]
 
 
-def resize_image(img, target_size, min_border=0):
+def frame_image(source, plan=None, **profile_settings):
     """
-    Resizes the image to fit within the target size, considering a minimum border width.
+    Frames an image entirely in memory.
 
-    :param img: The source image (PIL.Image).
-    :param target_size: The target size (width, height) or a single value for the larger side.
-    :param min_border: Minimum border width.
-    :return: Resized image and its new dimensions (width, height).
+    :param source: The source image as bytes, a bytes-like object, a binary file object or a path.
+    :param plan: A ProfilePlan compiled once for many images; profile_settings are ignored if given.
+    :param profile_settings: Profile parameters; output_pattern and overwrite are ignored.
+    :return: The encoded JPEG bytes.
     """
-    img_width, img_height = img.size
+    output = io.BytesIO()
+    frame_image_into(source, output, plan, **profile_settings)
+    return output.getvalue()
 
-    if isinstance(target_size, int):  # Single value: scale by the larger side
-        scale = target_size / max(img_width, img_height)
-        new_width, new_height = map(make_even, (int(img_width * scale), int(img_height * scale)))
-    elif isinstance(target_size, (tuple, list)) and len(target_size) == 2:  # Tuple (width, height)
-        target_width, target_height = map(make_even, target_size)
-        scale = min(
-            (target_width - 2 * min_border) / img_width,
-            (target_height - 2 * min_border) / img_height
-        )
-        new_width, new_height = map(make_even, (int(img_width * scale), int(img_height * scale)))
+
+def frame_image_into(source, output, plan=None, **profile_settings):
+    """
+    Frames an image and writes the encoded JPEG into a caller-supplied buffer, without touching disk.
+
+    :param source: The source image as bytes, a bytes-like object, a binary file object or a path;
+                   a file object that cannot seek is read into memory first.
+    :param output: A writable binary file object, e.g. io.BytesIO; the JPEG is written at its current position.
+    :param plan: A ProfilePlan compiled once for many images; profile_settings are ignored if given.
+    :param profile_settings: Profile parameters; output_pattern and overwrite are ignored.
+    :return: Number of bytes written.
+    """
+    if hasattr(source, "read") and not (hasattr(source, "seekable") and source.seekable()):
+        # A stream such as a request body; Image.open() would buffer it in memory anyway
+        source = source.read()
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        img = Image.open(io.BytesIO(source))
+        lossless_source = source
+    elif hasattr(source, "read"):
+        source_start = source.tell()
+        img = Image.open(source)
+        lossless_source = None  # Read only if jpegtran needs it
     else:
-        raise ValueError("target_size must be an int or a tuple (width, height)")
+        img = Image.open(source)
+        lossless_source = source
 
-    # Resize the image
-    img_resized = img.resize((new_width, new_height), Image.LANCZOS)
+    with img:
+        variant = prepare_variant(img, plan or profile_settings)
+        if variant["mode"] == "lossless_border" and lossless_source is None:
+            source.seek(source_start)
+            lossless_source = source.read()
 
-    return img_resized, (new_width, new_height)
+        output_start = output.tell()
+        encode_variants(img, [variant], [output], lossless_source)
+        return output.tell() - output_start
 
 
-def calculate_borders_for_output_size(new_size, output_size):
+def encode_variants(img, variants, outputs, lossless_source=None, metrics=None):
     """
-    Calculates the border dimensions for the output size mode.
+    Frames and encodes variants of an opened image, decoding it only once.
 
-    :param new_size: The size of the resized image (width, height).
-    :param output_size: The target image size (including the border), tuple (width, height).
-    :return: A tuple of borders (left, top, right, bottom).
+    Resized images are shared between output_size variants of the same size, and variants
+    with a faster resample preset may be resized from a larger variant instead of the source.
+
+    :param img: The source image (PIL.Image), opened but not loaded.
+    :param variants: Variants returned by prepare_variant().
+    :param outputs: Writable binary file objects, one per variant.
+    :param lossless_source: Path or content of the source JPEG, needed by lossless_border variants.
+    :param metrics: Optional FileMetrics that records per-stage timings and byte counts.
     """
-    new_width, new_height = new_size
-    output_width, output_height = output_size
+    # The photo of lossless variants is never decoded, so automatic colors come from a reduced-scale decode
+    resolve_border_colors(img, [variant for variant in variants if variant["mode"] == "lossless_border"], False)
+
+    for variant, output in zip(variants, outputs):
+        if variant["mode"] == "lossless_border":
+            # Work on DCT coefficients without decoding; borders are rounded up to MCU multiples
+            encoded = add_lossless_border(img, lossless_source, variant["borders"], variant["border_color"])
+            output.write(encoded)
+            if metrics:
+                metrics.bytes_written += len(encoded)
+                metrics.mark("lossless")
+
+    decoded_indexes = [index for index, variant in enumerate(variants) if variant["mode"] != "lossless_border"]
+    if not decoded_indexes:
+        return
+
+    # A lone border_size variant of a large JPEG is decoded straight into its canvas
+    if len(decoded_indexes) == 1 and variants[decoded_indexes[0]]["mode"] == "border_size" \
+            and should_stream(img, variants[decoded_indexes[0]]["streaming"]):
+        index = decoded_indexes[0]
+        variant = variants[index]
+        resolve_border_colors(img, [variant], False)
+        img_with_border = decode_into_frame(img, variant["borders"], variant["border_color"])
+        if metrics:
+            metrics.mark("decode")
+
+        # Progressive encoding would make libjpeg buffer the coefficients of the whole image
+        encode_jpeg(img_with_border, outputs[index], dict(variant["encode_options"], progressive=False),
+                    variant["max_bytes"])
+        if metrics:
+            metrics.bytes_written += outputs[index].tell()
+            metrics.mark("encode")
+        return
+
+    # Decode once, at a reduced scale if every variant allows it
+    apply_shared_draft(img, [variants[index] for index in decoded_indexes])
+    img.load()
+    if metrics:
+        metrics.mark("decode")
+
+    # Bring other formats to RGB or grayscale, alpha is kept until the image is pasted into its frame
+    normalized = normalize_mode(img)
+    if normalized is not img:
+        img = normalized
+        if metrics:
+            metrics.mark("normalize")
+
+    if resolve_border_colors(img, [variants[index] for index in decoded_indexes], True) and metrics:
+        metrics.mark("color")
+
+    # Largest variants first, so smaller ones can be resized from them
+    decoded_indexes.sort(key=lambda index: variants[index]["area"], reverse=True)
+    resized_images = {}
+
+    for index in decoded_indexes:
+        variant = variants[index]
+
+        if variant["mode"] == "output_size":
+            key = (variant["new_size"], variant["preset"])
+            framed_source = resized_images.get(key)
+            if framed_source is None:
+                source = select_resize_source(img, resized_images, variant)
+                framed_source = source.resize(variant["new_size"], Image.LANCZOS,
+                                              reducing_gap=variant["reducing_gap"])
+                resized_images[key] = framed_source
+            if metrics:
+                metrics.mark("resize")
+        else:
+            framed_source = img
 
-    # Calculate the border dimensions
-    left_border = (output_width - new_width) // 2
-    top_border = (output_height - new_height) // 2
-    right_border = output_width - new_width - left_border
-    bottom_border = output_height - new_height - top_border
+        # Apply the border; output_size frames of a fixed color repeat across a batch, so their canvases are
+        # reused, except under transparent images, which need a photo area of the border color
+        reuse_canvas = variant["mode"] == "output_size" and not variant["auto_color"] \
+            and framed_source.mode not in ALPHA_MODES
+        with bordered(framed_source, variant["borders"], variant["border_color"],
+                      reuse_canvas=reuse_canvas) as img_with_border:
+            if metrics:
+                metrics.mark("border")
 
-    return left_border, top_border, right_border, bottom_border
+            # Encode the result
+            encode_jpeg(img_with_border, outputs[index], variant["encode_options"], variant["max_bytes"])
+            if metrics:
+                metrics.bytes_written += outputs[index].tell()
+                metrics.mark("encode")
 
 
-def calculate_borders_for_border_size(img, border_size):
+def resolve_border_colors(img, variants, decoded):
     """
-    Calculates the border dimensions for the border-size border mode.
+    Sets the automatic border colors of variants, computed from one small sample of the image.
 
     :param img: The source image (PIL.Image).
-    :param border_size: The size of the border, which can be:
-                        - A single value (int or percentage, e.g., "10" or "10%").
-                        - Two values (horizontal, vertical, e.g., "10,20" or "10%,20").
-                        - Four values (left, top, right, bottom, e.g., "10,20,30,40" or combinations like "10,10%,20,20%").
-    :return: A tuple of borders (left, top, right, bottom).
-    """
-    img_width, img_height = img.size
-
-    def to_pixels(value, reference):
-        """Converts a value to pixels. Supports percentages (e.g., "10%") and integers."""
-        if isinstance(value, str) and value.endswith('%'):
-            return make_even(int(float(value.strip('%')) / 100 * reference))
-        elif value.isdigit():
-            return make_even(int(value))
-        else:
-            raise ValueError(f"Invalid border size value: {value}")
+    :param variants: Variants returned by prepare_variant().
+    :param decoded: Whether the image is loaded; otherwise the sample is decoded separately.
+    :return: True if any color was computed.
+    """
+    sample = None
+    colors = {}
+    for variant in variants:
+        method = variant["auto_color"]
+        if not method:
+            continue
+        if sample is None:
+            sample = sample_decoded(img) if decoded else sample_unloaded(img)
+        if method not in colors:
+            colors[method] = pick_border_color(sample, method)
+        variant["border_color"] = colors[method]
+    return sample is not None
+
+
+def write_output(output_path, encoded, source=None):
+    """
+    Writes an encoded result to disk under a name no other source of this process uses,
+    atomically, so a concurrent reader or a crash never sees a truncated file.
 
-    # Split and process border_size
-    if isinstance(border_size, str):
-        parts = border_size.split(',')
-    elif isinstance(border_size, (tuple, list)):
-        parts = [str(p) for p in border_size]
-    else:
-        parts = [str(border_size)]
-
-    # Handle different lengths of parts
-    if len(parts) == 1:
-        border = to_pixels(parts[0], max(img_width, img_height))
-        left_border = top_border = right_border = bottom_border = border
-    elif len(parts) == 2:
-        left_border = right_border = to_pixels(parts[0], img_width)
-        top_border = bottom_border = to_pixels(parts[1], img_height)
-    elif len(parts) == 4:
-        left_border = to_pixels(parts[0], img_width)
-        top_border = to_pixels(parts[1], img_height)
-        right_border = to_pixels(parts[2], img_width)
-        bottom_border = to_pixels(parts[3], img_height)
+    :param output_path: Path of the result.
+    :param encoded: Encoded image bytes.
+    :param source: Path to the source image the result belongs to.
+    :return: The path written, output_path or a numbered variant of it.
+    """
+    output_path = output_names.reserve(output_path, source)
+    try:
+        write_atomic(output_path, encoded)
+    finally:
+        output_names.release(output_path)
+    return output_path
+
+
+def reserve_output_paths(input_path, profiles):
+    """
+    Reserves the output paths of an image, one per profile, under names no other source uses.
+
+    Called by the process that submits the work, so worker processes of a pool, which do not
+    share the reserved names, never pick an output name on their own.
+
+    :param input_path: Path to the source image.
+    :param profiles: List of profile settings or compiled ProfilePlan objects, one per output.
+    :return: The reserved paths, in the order of the profiles.
+    """
+    output_paths = []
+    for profile_settings in profiles:
+        plan = compile_profile(profile_settings)
+        output_path = generate_output_path(input_path, plan.output_pattern, plan.overwrite)
+        output_paths.append(output_names.reserve(output_path, input_path))
+    return output_paths
+
+
+def release_output_paths(output_paths):
+    """
+    Releases the paths returned by reserve_output_paths() once the image is written or failed.
+
+    :param output_paths: The reserved paths.
+    """
+    for output_path in output_paths:
+        output_names.release(output_path)
+
+
+def prepare_variant(img, profile_settings):
+    """
+    Calculates what can be known about the output of a profile from the image header.
+
+    :param img: The source image (PIL.Image), opened but not necessarily loaded.
+    :param profile_settings: A ProfilePlan, or profile parameters, which are validated and compiled first.
+    :return: A dict describing the variant.
+    """
+    plan = compile_profile(profile_settings)
+
+    # Dimensions are calculated from the header size, so every preset produces the same output size
+    new_size, borders = plan.geometry(img.size)
+    variant = {
+        "mode": plan.mode,
+        "overwrite": plan.overwrite,
+        "output_pattern": plan.output_pattern,
+        "border_color": plan.border_color,
+        "auto_color": plan.auto_color,
+        "borders": borders,
+        "area": img.width * img.height,
+    }
+
+    if plan.mode == "output_size":
+        variant.update(
+            new_size=new_size,
+            preset=plan.preset,
+            reducing_gap=plan.reducing_gap,
+            area=new_size[0] * new_size[1],
+        )
     else:
-        raise ValueError("border_size must contain 1, 2, or 4 values (pixels or percentages).")
+        variant["streaming"] = plan.streaming
 
-    return left_border, top_border, right_border, bottom_border
+    if plan.mode != "lossless_border":
+        variant["encode_options"] = dict(plan.encode_options)
+        variant["max_bytes"] = plan.max_bytes
 
+    return variant
 
-def apply_border(img, borders, border_color):
+
+def encode_jpeg(img, output, encode_options, max_bytes=0):
     """
-    Applies the border to the image.
+    Encodes an image as JPEG, lowering the quality if needed to fit a size limit.
 
-    :param img: The source image (PIL.Image).
-    :param borders: A tuple of borders (left, top, right, bottom).
-    :param border_color: The color of the border (RGB tuple).
-    :return: The image with the added border.
+    With a limit, the configured quality is tried first; if it is too large, a binary search
+    over lower qualities encodes in memory at most constants.MAX_BYTES_SEARCH_STEPS more times
+    and keeps the highest quality that fits. If even the lowest searched quality does not fit,
+    the smallest encoding is written.
+
+    :param img: The image to encode (PIL.Image).
+    :param output: A writable binary file object.
+    :param encode_options: Pillow JPEG options: quality, subsampling, progressive and optimize.
+    :param max_bytes: Size limit of the encoded image in bytes, 0 for no limit.
     """
-    left_border, top_border, right_border, bottom_border = borders
-    return ImageOps.expand(
-        img,
-        border=(left_border, top_border, right_border, bottom_border),
-        fill=border_color
-    )
+    if not max_bytes:
+        img.save(output, format="JPEG", **encode_options)
+        return
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", **encode_options)
+    if buffer.tell() <= max_bytes:
+        output.write(buffer.getbuffer())
+        return
+
+    # Binary search for the highest quality that fits, on the already framed image
+    fitting = None
+    smallest = buffer
+    low, high = constants.MIN_SEARCH_JPEG_QUALITY, encode_options["quality"] - 1
+    for _ in range(constants.MAX_BYTES_SEARCH_STEPS):
+        if low > high:
+            break
+        quality = (low + high) // 2
+        candidate = io.BytesIO()
+        img.save(candidate, format="JPEG", **dict(encode_options, quality=quality))
+        if candidate.tell() <= max_bytes:
+            fitting = candidate
+            low = quality + 1
+        else:
+            if candidate.tell() < smallest.tell():
+                smallest = candidate
+            high = quality - 1
+
+    output.write((fitting or smallest).getbuffer())
 
 
-def filter_profile_settings(profile_settings, required_keys=None, optional_keys=None, required=True):
+def apply_shared_draft(img, variants):
     """
-    Filters a dictionary of keyword arguments, validating required and optional keys.
+    Configures reduced-scale decoding that satisfies all variants decoded from the image.
 
-    :param profile_settings: Dictionary of keyword arguments to filter.
-    :param required_keys: List of keys that are required.
-    :param optional_keys: List of keys that are optional.
-    :param required: Whether to enforce the presence of required keys.
-    :return: A dictionary containing only the allowed keys.
+    :param img: The source image (PIL.Image), not yet loaded.
+    :param variants: Variants returned by prepare_variant().
     """
-    required_keys = required_keys or []
-    optional_keys = optional_keys or []
+    requested_width = requested_height = 0
+    for variant in variants:
+        draft_factor = constants.RESAMPLE_PRESETS[variant["preset"]][0] if variant["mode"] == "output_size" else None
+        if not draft_factor:
+            return  # This variant needs the full resolution
+        new_width, new_height = variant["new_size"]
+        requested_width = max(requested_width, new_width * draft_factor)
+        requested_height = max(requested_height, new_height * draft_factor)
 
-    # Check for missing required keys
-    if required:
-        missing_keys = [key for key in required_keys if key not in profile_settings]
-        if missing_keys:
-            raise ValueError(f"Missing required keys: {', '.join(missing_keys)}")
+    # Let libjpeg decode at 1/2, 1/4 or 1/8 scale; it never goes below the requested size
+    img.draft(img.mode, (requested_width, requested_height))
 
-    # Filter and include only valid keys
-    filtered_profile_settings = {
-        key: value for key, value in profile_settings.items()
-        if key in required_keys or key in optional_keys
-    }
 
-    return filtered_profile_settings
+def select_resize_source(img, resized_images, variant):
+    """
+    Picks the image to resize a variant from: the decoded source, or for faster presets the
+    smallest already resized image that keeps enough headroom over the new size.
+
+    :param img: The decoded source image (PIL.Image).
+    :param resized_images: Already resized images keyed by (new_size, preset).
+    :param variant: The variant to resize for.
+    :return: The source image (PIL.Image).
+    """
+    if variant["preset"] == "quality":
+        return img
+
+    new_width, new_height = variant["new_size"]
+    headroom = constants.RESIZE_SOURCE_HEADROOM
+    candidates = [
+        resized for resized in resized_images.values()
+        if resized.width >= new_width * headroom and resized.height >= new_height * headroom
+    ]
+    return min(candidates, key=lambda resized: resized.width * resized.height, default=img)
 
 
-def make_even(value):
+def resize_image(img, target_size, min_border=0, preset=constants.DEFAULT_RESAMPLE_PRESET):
     """
-    Rounds the value to the nearest even number.
+    Resizes the image to fit within the target size, considering a minimum border width.
 
-    :param value: An integer.
-    :return: The nearest even number.
+    :param img: The source image (PIL.Image). Pass it before it is loaded to allow reduced-scale decoding.
+    :param target_size: The target size (width, height) or a single value for the larger side.
+    :param min_border: Minimum border width.
+    :param preset: Resample preset, one of constants.RESAMPLE_PRESETS.
+    :return: Resized image and its new dimensions (width, height).
     """
-    return value if value % 2 == 0 else value + 1
\ No newline at end of file
+    variant = prepare_variant(img, {
+        "mode": "output_size", "output_size": target_size, "min_border": min_border, "resample_preset": preset
+    })
+    apply_shared_draft(img, [variant])
+
+    # Resize the image
+    img_resized = img.resize(variant["new_size"], Image.LANCZOS, reducing_gap=variant["reducing_gap"])
+
+    return img_resized, variant["new_size"]
+
+
+def apply_border(img, borders, border_color):
+    """
+    Applies the border to the image.
+
+    :param img: The source image (PIL.Image).
+    :param borders: A tuple of borders (left, top, right, bottom).
+    :param border_color: The color of the border (RGB tuple).
+    :return: The image with the added border.
+    """
+    left_border, top_border, right_border, bottom_border = borders
+    mode = canvas_mode(img.mode)
+    if img.mode == mode:
+        return ImageOps.expand(
+            img,
+            border=(left_border, top_border, right_border, bottom_border),
+            fill=canvas_color(mode, border_color)
+        )
+
+    # Flatten the alpha channel onto the border color while pasting, in the same pass
+    canvas = Image.new(mode, (img.width + left_border + right_border, img.height + top_border + bottom_border),
+                       canvas_color(mode, border_color))
+    canvas.paste(img, (left_border, top_border), img)
+    return canvas
+
+
+@contextmanager
+def bordered(img, borders, border_color, reuse_canvas=False):
+    """
+    Applies the border to the image, optionally on a reused canvas.
+
+    :param img: The source image (PIL.Image).
+    :param borders: A tuple of borders (left, top, right, bottom).
+    :param border_color: The color of the border (RGB tuple).
+    :param reuse_canvas: Whether to take the canvas from the shared border canvas cache.
+    :return: A context manager yielding the image with the added border, valid until the context exits.
+    """
+    if reuse_canvas:
+        with border_canvas_cache.framed(img, borders, border_color) as img_with_border:
+            yield img_with_border
+    else:
+        yield apply_border(img, borders, border_color)
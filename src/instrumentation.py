@@ -0,0 +1,138 @@
+import json
+import time
+import heapq
+from image_processor import process_image_variants, render_image_variants
+import constants
+
+
+class FileMetrics:
+    """
+    Per-stage timings and byte counts of one processed file.
+
+    Stages are timed as laps: each mark() closes the stage that started at the previous mark,
+    so instrumentation costs one perf_counter() call per stage.
+    """
+
+    __slots__ = ("path", "stages", "bytes_read", "bytes_written", "_last")
+
+    def __init__(self, path):
+        self.path = path
+        self.stages = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        """Closes the given stage at the current time."""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "stages": self.stages,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def instrumented_process_image_variants(input_path, profiles, output_paths=None):
+    """
+    Runs process_image_variants with per-stage instrumentation.
+
+    :param input_path: Path to the source image.
+    :param profiles: List of profile settings, one per output.
+    :param output_paths: Paths reserved by the submitting process, see reserve_output_paths().
+    :return: A tuple (output paths, file metrics dict).
+    """
+    metrics = FileMetrics(input_path)
+    output_paths = process_image_variants(input_path, profiles, metrics=metrics, output_paths=output_paths)
+    return output_paths, metrics.to_dict()
+
+
+def instrumented_render_image_variants(input_path, profiles, data=None):
+    """
+    Runs render_image_variants with per-stage instrumentation; the write stage is added by the writer.
+
+    :param input_path: Path to the source image.
+    :param profiles: List of profile settings, one per output.
+    :param data: Optional content of the source file, already read by the caller.
+    :return: A tuple (rendered outputs, file metrics dict).
+    """
+    metrics = FileMetrics(input_path)
+    rendered = render_image_variants(input_path, profiles, metrics=metrics, data=data)
+    return rendered, metrics.to_dict()
+
+
+class RunMetrics:
+    """
+    Aggregates file metrics of a run into totals, latency histograms and the slowest files.
+    """
+
+    def __init__(self):
+        self.file_count = 0
+        self.stage_totals = {}
+        self.stage_histograms = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._slowest = []  # Min-heap of (total seconds, path)
+
+    def add(self, file_metrics):
+        """
+        Adds the metrics of one file.
+
+        :param file_metrics: A dict returned by FileMetrics.to_dict().
+        """
+        self.file_count += 1
+        self.bytes_read += file_metrics["bytes_read"]
+        self.bytes_written += file_metrics["bytes_written"]
+
+        total = 0.0
+        for stage, seconds in file_metrics["stages"].items():
+            total += seconds
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+            histogram = self.stage_histograms.setdefault(stage, [0] * (len(constants.METRICS_HISTOGRAM_BOUNDS_MS) + 1))
+            histogram[_bucket_index(seconds * 1000)] += 1
+
+        entry = (total, file_metrics["path"])
+        if len(self._slowest) < constants.METRICS_SLOWEST_FILES:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def to_dict(self):
+        """Return a machine-readable summary of the run."""
+        bucket_labels = [f"<={bound}ms" for bound in constants.METRICS_HISTOGRAM_BOUNDS_MS]
+        bucket_labels.append(f">{constants.METRICS_HISTOGRAM_BOUNDS_MS[-1]}ms")
+        return {
+            "files": self.file_count,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "stage_totals_s": {stage: round(seconds, 6) for stage, seconds in self.stage_totals.items()},
+            "stage_histograms": {
+                stage: dict(zip(bucket_labels, counts)) for stage, counts in self.stage_histograms.items()
+            },
+            "slowest_files": [
+                {"path": path, "total_s": round(total, 6)} for total, path in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+    def summary(self):
+        """Return a human-readable one-line summary of the stage totals."""
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.stage_totals.items())
+        mb = 1024 * 1024
+        return (f"Stage totals over {self.file_count} file(s): {stages}; "
+                f"read {self.bytes_read / mb:.1f} MB, wrote {self.bytes_written / mb:.1f} MB.")
+
+    def write(self, path):
+        """Write the summary as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+
+def _bucket_index(milliseconds):
+    for index, bound in enumerate(constants.METRICS_HISTOGRAM_BOUNDS_MS):
+        if milliseconds <= bound:
+            return index
+    return len(constants.METRICS_HISTOGRAM_BOUNDS_MS)
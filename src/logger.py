@@ -1,67 +1,193 @@
 import os
+import sys
+import json
+import time
+import queue
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from utils import get_settings_directory
 import constants
 
+# The application logger; it does not propagate, so records of libraries such as Pillow stay out of the log
+log = logging.getLogger(constants.APP_NAME)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line, with the fields passed as extra={"fields": {...}}.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    A queue handler for a listener in the same process.
+
+    QueueHandler.prepare() renders the traceback into the message and drops exc_info, which
+    suits queues that pickle records; here the record is passed as it is, so the JSON log gets
+    the traceback as a field of its own.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """
+    A console handler that clears the progress line of a terminal before writing a message.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(stream or sys.stderr)
+        self.is_terminal = self.stream.isatty()
+
+    def format(self, record):
+        message = super().format(record)
+        return f"\r\033[K{message}" if self.is_terminal else message
+
 
 class AppLogger:
     """
     A class to handle application logging with rotation.
+
+    Records are put on a queue by the logging thread and written by a background listener
+    thread, so file rotation and console output never block the processing loop. The log
+    file gets one JSON object per record; the console only gets warnings and errors.
     """
 
-    def __init__(self):
+    def __init__(self, level=constants.LOG_LEVEL):
         # Get the base directory for logs using get_settings_directory()
         self.logs_dir = str(os.path.join(get_settings_directory(), constants.LOGS_DIR_NAME))
         os.makedirs(self.logs_dir, exist_ok=True)  # Create logs directory if it doesn't exist
         self.log_file = os.path.join(self.logs_dir, "app.log")
-        self._setup_logging()
+        self._setup_logging(level)
 
-    def _setup_logging(self):
+    def _setup_logging(self, level):
         """
         Configures logging with rotation using constants from constants.py.
         """
-        logging.basicConfig(
-            level=logging.DEBUG,  # Log everything (DEBUG and above)
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[
-                RotatingFileHandler(
-                    self.log_file,
-                    maxBytes=constants.LOG_FILE_MAX_SIZE,  # Use constant for max file size
-                    backupCount=constants.LOG_BACKUP_COUNT,  # Use constant for backup count
-                    encoding="utf-8"
-                ),
-                logging.StreamHandler()  # Print logs to the console
-            ]
+        file_handler = RotatingFileHandler(
+            self.log_file,
+            maxBytes=constants.LOG_FILE_MAX_SIZE,  # Use constant for max file size
+            backupCount=constants.LOG_BACKUP_COUNT,  # Use constant for backup count
+            encoding="utf-8"
         )
-        logging.info("Logging setup complete. Log file: %s", self.log_file)
+        file_handler.setFormatter(JsonFormatter())
+        console_handler = ConsoleHandler()  # Print warnings and errors to the console
+        console_handler.setLevel(logging.WARNING)
+        console_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        log_queue = queue.SimpleQueue()
+        self.listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        self.listener.start()
+
+        log.handlers[:] = [LocalQueueHandler(log_queue)]
+        log.setLevel(level)
+        log.propagate = False
+        log.info("Logging setup complete. Log file: %s", self.log_file)
+
+    def stop(self):
+        """Writes the queued records and stops the listener thread."""
+        self.listener.stop()
+
+    @staticmethod
+    def record(message, level=logging.INFO, **fields):
+        """Log a structured record; the fields are written as JSON keys of the record."""
+        log.log(level, message, extra={"fields": fields})
 
     @staticmethod
     def info(message):
         """Log an info message."""
-        logging.info(message)
+        log.info(message)
 
     @staticmethod
     def debug(message):
         """Log a debug message."""
-        logging.debug(message)
+        log.debug(message)
 
     @staticmethod
     def warning(message):
         """Log a warning message."""
-        logging.warning(message)
+        log.warning(message)
 
     @staticmethod
     def error(message):
         """Log an error message."""
-        logging.error(message)
+        log.error(message)
 
     @staticmethod
     def critical(message):
         """Log a critical message."""
-        logging.critical(message)
+        log.critical(message)
 
     @staticmethod
     def exception(message):
         """Log an exception with traceback."""
-        logging.exception(message)
\ No newline at end of file
+        log.exception(message)
+
+
+class ProgressReporter:
+    """
+    A throttled progress line with the processing rate and, once the total is known, the ETA.
+
+    update() only counts and compares a clock, and the line is redrawn at most every
+    constants.PROGRESS_REFRESH_INTERVAL seconds on a terminal, or written as a plain line
+    every constants.PROGRESS_LOG_INTERVAL seconds otherwise, so the cost per file is constant.
+    """
+
+    def __init__(self, stream=None, total=None):
+        self.stream = stream or sys.stderr
+        self.is_terminal = self.stream.isatty()
+        self.interval = constants.PROGRESS_REFRESH_INTERVAL if self.is_terminal else constants.PROGRESS_LOG_INTERVAL
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0  # Set by the caller, possibly from another thread
+        self.start_time = time.monotonic()
+        self._next_draw = self.start_time + self.interval
+
+    def update(self, failed=False):
+        """Counts a finished file and redraws the line if it is due."""
+        self.done += 1
+        if failed:
+            self.failed += 1
+        now = time.monotonic()
+        if now >= self._next_draw:
+            self._next_draw = now + self.interval
+            self._draw(now)
+
+    def finish(self):
+        """Draws the final state and ends the line."""
+        if self.done + self.skipped and (self.is_terminal or time.monotonic() - self.start_time >= self.interval):
+            self._draw(time.monotonic())
+            if self.is_terminal:
+                self.stream.write("\n")
+                self.stream.flush()
+
+    def _draw(self, now):
+        elapsed = now - self.start_time
+        done = self.done + self.skipped
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = f"{done}"
+        if self.total is not None:
+            line += f"/{self.total}"
+        line += f" file(s), {self.skipped} skipped, {self.failed} failed, {rate:.1f} files/s"
+        if self.total is not None and rate > 0:
+            remaining = max(self.total - done, 0) / rate
+            line += f", ETA {int(remaining // 60):02d}:{int(remaining % 60):02d}"
+
+        if self.is_terminal:
+            self.stream.write(f"\r\033[K{line}")
+        else:
+            self.stream.write(f"{line}\n")
+        self.stream.flush()
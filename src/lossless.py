@@ -0,0 +1,105 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from PIL import Image, JpegImagePlugin
+import constants
+
+
+def add_lossless_border(img, source, borders, border_color):
+    """
+    Adds a border to a JPEG without decoding it, working on DCT coefficients via jpegtran.
+
+    A solid-color canvas is encoded with the quantization tables and sampling of the source,
+    and the source coefficients are dropped into it unchanged. The photo area of the output
+    is therefore bit-exact with the input.
+
+    :param img: The source image (PIL.Image), opened but not loaded.
+    :param source: Path to the source image, or its content as a bytes-like object.
+    :param borders: A tuple of borders (left, top, right, bottom), rounded up to MCU multiples.
+                    When the photo size is not a multiple of the MCU size, the padding the source
+                    encoder added to fill its last MCUs becomes visible at its right and bottom edges.
+    :param border_color: The color of the border (RGB tuple).
+    :return: The encoded JPEG bytes.
+    """
+    if img.format != "JPEG":
+        raise ValueError(f"Lossless border mode supports only JPEG input, got {img.format}.")
+    if img.mode not in ("RGB", "L"):
+        raise ValueError(f"Lossless border mode supports only RGB and grayscale JPEG, got {img.mode}.")
+
+    jpegtran = shutil.which(constants.JPEGTRAN_EXECUTABLE)
+    if jpegtran is None:
+        raise RuntimeError(
+            f"'{constants.JPEGTRAN_EXECUTABLE}' was not found in PATH. "
+            f"Install the libjpeg(-turbo) tools to use the lossless border mode.")
+
+    # Grayscale JPEGs have a single component and no chroma subsampling
+    encode_options = {}
+    if len(img.layer) > 1:
+        encode_options["subsampling"] = JpegImagePlugin.get_sampling(img)
+        if encode_options["subsampling"] == -1:
+            raise ValueError("Lossless border mode does not support this JPEG chroma subsampling.")
+
+    mcu_width, mcu_height = get_mcu_size(img)
+    left_border, top_border, right_border, bottom_border = borders
+    left_border, right_border = (round_up(b, mcu_width) for b in (left_border, right_border))
+    top_border, bottom_border = (round_up(b, mcu_height) for b in (top_border, bottom_border))
+
+    # Partial edge MCUs of the photo are copied whole, so the photo occupies whole MCUs; up to
+    # MCU - 1 pixels of encoder padding of the source show as a strip at its right and bottom edges
+    photo_width = round_up(img.width, mcu_width)
+    photo_height = round_up(img.height, mcu_height)
+    canvas_size = (left_border + photo_width + right_border, top_border + photo_height + bottom_border)
+
+    canvas = Image.new("RGB", canvas_size, tuple(border_color))
+    if img.mode == "L":
+        canvas = canvas.convert("L")
+
+    # Same quantization and sampling as the source, so jpegtran drops the coefficients as-is
+    canvas_buffer = io.BytesIO()
+    canvas.save(canvas_buffer, format="JPEG", qtables=img.quantization, **encode_options)
+
+    # jpegtran reads the canvas from stdin, but the dropped photo only from a file, so
+    # content in memory is spooled to a temporary file
+    photo_path = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        fd, photo_path = tempfile.mkstemp(suffix=".jpg")
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+    try:
+        # The result is read from stdout, so the input can safely be overwritten afterwards
+        result = subprocess.run(
+            [jpegtran, "-copy", "none", "-drop", f"+{left_border}+{top_border}", photo_path or source],
+            input=canvas_buffer.getbuffer(), capture_output=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"jpegtran failed: {result.stderr.decode(errors='replace').strip()}")
+    finally:
+        if photo_path:
+            os.remove(photo_path)
+
+    return result.stdout
+
+
+def get_mcu_size(img):
+    """
+    Returns the size of a minimum coded unit of a JPEG image.
+
+    :param img: The source JPEG image (PIL.Image).
+    :return: MCU size in pixels (width, height).
+    """
+    max_h = max(layer[1] for layer in img.layer)
+    max_v = max(layer[2] for layer in img.layer)
+    return 8 * max_h, 8 * max_v
+
+
+def round_up(value, multiple):
+    """
+    Rounds the value up to the nearest multiple.
+
+    :param value: An integer.
+    :param multiple: A positive integer.
+    :return: The smallest multiple of `multiple` that is not less than value.
+    """
+    return -(-value // multiple) * multiple
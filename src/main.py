@@ -1,12 +1,14 @@
-import argparse
-import glob
 import os
+import argparse
+import itertools
+import threading
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from settings_manager import SettingsManager
-from image_processor import process_image
 import constants
 
+# Modules beyond settings are imported by the commands that need them, so that
+# settings commands and --help start without loading Pillow and the processing stack
+
 
 def parse_arguments():
     # Parse command-line arguments
@@ -15,12 +17,86 @@ def parse_arguments():
 
     # Process command
     process_parser = subparsers.add_parser("process", help="Process an image.")
-    process_parser.add_argument("input", nargs="+", help="Path to the input image.")
-    process_parser.add_argument("--profile", help="Processing profile to use.")
+    process_parser.add_argument("input", nargs="*", help="Path to the input image.")
+    process_parser.add_argument("--files-from", metavar="PATH",
+                                help="Also process the paths listed in this file, one per line (\"-\" for stdin).")
+    process_parser.add_argument("--shard", metavar="I/N",
+                                help="Process only the I-th of N shards, chosen by a stable hash of the relative path.")
+    process_parser.add_argument("--report", metavar="PATH",
+                                help="Write a JSON Lines result manifest (default with --shard: report-I-of-N.jsonl).")
+    process_parser.add_argument("--profile", action="append",
+                                help="Processing profile or profile group to use (repeatable, "
+                                     "every file is decoded once and saved once per profile).")
+    process_parser.add_argument("--executor", choices=constants.EXECUTOR_BACKENDS,
+                                help="Executor backend: threads, processes or auto.")
+    process_parser.add_argument("--force", action="store_true",
+                                help="Reprocess files even if their cached output is up to date.")
+    process_parser.add_argument("--metrics", metavar="PATH",
+                                help="Record per-stage timings and write the run summary as JSON to PATH.")
+    process_parser.add_argument("--archive", metavar="PATH",
+                                help="Write the results into one uncompressed .zip or .tar archive instead of "
+                                     "separate files.")
+    process_parser.add_argument("--eta", action="store_true",
+                                help="Count the inputs in the background to show the remaining time "
+                                     "(walks the input tree a second time).")
+    process_parser.add_argument("--pipeline", action="store_true",
+                                help="Overlap reading, processing and writing in separate stages.")
+    process_parser.add_argument("-r", "--recursive", action="store_true",
+                                help="Process directories recursively.")
+    process_parser.add_argument("--include", action="append",
+                                help="Only process files matching this glob pattern (repeatable).")
+    process_parser.add_argument("--exclude", action="append",
+                                help="Skip files and directories matching this glob pattern (repeatable).")
+
+    # Watch command
+    watch_parser = subparsers.add_parser("watch", help="Watch hot folders and process new images as they arrive.")
+    watch_parser.add_argument("folders", nargs="*",
+                              help="Folders to watch (default: the \"watch_folders\" of user settings).")
+    watch_parser.add_argument("--profile", action="append",
+                              help="Profile or profile group for the folders given on the command line (repeatable).")
+    watch_parser.add_argument("--executor", choices=constants.EXECUTOR_BACKENDS,
+                              help="Executor backend: threads, processes or auto.")
+    watch_parser.add_argument("--interval", type=float, default=constants.WATCH_POLL_INTERVAL,
+                              help="Seconds between scans of the watched folders.")
+
+    # Serve command
+    serve_parser = subparsers.add_parser("serve", help="Serve image framing over HTTP for other local services.")
+    serve_parser.add_argument("--host", default=constants.DEFAULT_SERVE_HOST, help="Host to listen on.")
+    serve_parser.add_argument("--port", type=int, default=constants.DEFAULT_SERVE_PORT, help="TCP port to listen on.")
+    serve_parser.add_argument("--socket", metavar="PATH", help="Listen on a Unix socket instead of TCP.")
+    serve_parser.add_argument("--executor", choices=constants.EXECUTOR_BACKENDS,
+                              help="Executor backend: threads, processes or auto.")
+    serve_parser.add_argument("--quiet", action="store_true", help="Do not log requests.")
+
+    # Benchmark command
+    benchmark_parser = subparsers.add_parser("benchmark", help="Benchmark the image pipeline.")
+    benchmark_parser.add_argument("--count", type=int, default=12,
+                                  help="Number of synthetic images, or of runs per command with --startup.")
+    benchmark_parser.add_argument("--startup", action="store_true",
+                                  help="Measure CLI cold-start time instead of image throughput.")
+    benchmark_parser.add_argument("--modes", nargs="+", choices=["border_size", "output_size"],
+                                  help="Modes to benchmark.")
+    benchmark_parser.add_argument("--workers", nargs="+", type=int, help="Worker counts to benchmark.")
+    benchmark_parser.add_argument("--executors", nargs="+", choices=["threads", "processes"],
+                                  help="Executor backends to benchmark.")
+    benchmark_parser.add_argument("--border-colors", nargs="+",
+                                  choices=["fixed", "auto"] + [f"auto:{m}" for m in constants.AUTO_BORDER_COLOR_METHODS],
+                                  help="Border colors to benchmark, to measure the cost of automatic colors.")
+    benchmark_parser.add_argument("--formats", nargs="+", choices=["jpeg", "png", "png16", "webp", "tiff"],
+                                  help="Input formats to benchmark, each on its own synthetic corpus.")
+    benchmark_parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+
+    # Merge command
+    merge_parser = subparsers.add_parser("merge", help="Combine the result manifests of shards and retry runs.")
+    merge_parser.add_argument("reports", nargs="+", help="Result manifests written with --report or --shard.")
+    merge_parser.add_argument("--failures", metavar="PATH",
+                              help="Write the failed files to PATH, for a retry run with --files-from.")
+    merge_parser.add_argument("--output", help="Write the merged summary as JSON to this file.")
 
     # Settings command
     settings_parser = subparsers.add_parser("settings", help="Manage settings and profiles.")
-    settings_parser.add_argument("action", choices=["list-profiles", "set-profile", "create-profile", "delete-profile"])
+    settings_parser.add_argument("action", choices=["list-profiles", "set-profile", "create-profile", "delete-profile",
+                                                     "clear-cache"])
     settings_parser.add_argument("--name", help="Profile name for create, set, or delete.")
 
     return parser
@@ -30,6 +106,7 @@ def process_file(file_path, profile_settings):
     """
     Processes a single file using the provided profile settings.
     """
+    from image_processor import process_image
     try:
         # Call the main image processing function
         process_image(file_path, **profile_settings)
@@ -38,53 +115,320 @@ def process_file(file_path, profile_settings):
         print(f"Error processing file '{file_path}': {e}")
 
 
-def process_command(input_paths, settings_manager, profile_name=constants.DEFAULT_PROFILE):
-    # Get profile settings from the profile manager
-    profile_settings = settings_manager.load_profile(profile_name)
-    if not profile_settings:
-        print(f"Error: Profile '{profile_name}' not found.")
+def load_profiles(settings_manager, profile_names):
+    """
+    Loads and compiles the profiles to process files with, expanding profile groups.
+
+    :param settings_manager: SettingsManager instance.
+    :param profile_names: Profile or profile group names.
+    :return: A tuple (profile names, profile settings list, ProfilePlan list), or None after printing an error.
+    """
+    from profile_plan import compile_profile
+
+    profile_names = settings_manager.expand_profile_names(profile_names)
+    profiles = []
+    for profile_name in profile_names:
+        profile_settings = settings_manager.load_profile(profile_name)
+        if not profile_settings:
+            print(f"Error: Profile '{profile_name}' not found.")
+            return None
+        profiles.append(profile_settings)
+
+    # Variants of one file must not overwrite each other
+    output_targets = [
+        "overwrite" if p.get("overwrite", constants.DEFAULT_ALLOW_OVERWRITE)
+        else p.get("output_pattern", constants.DEFAULT_OUTPUT_PATTERN)
+        for p in profiles
+    ]
+    if len(set(output_targets)) != len(output_targets):
+        print("Error: Profiles processed together must have different output patterns and at most one may overwrite.")
+        return None
+
+    # Invalid settings are reported once, before any file is touched, instead of failing every file
+    plans = []
+    for profile_name, profile_settings in zip(profile_names, profiles):
+        try:
+            plans.append(compile_profile(profile_settings))
+        except ValueError as e:
+            print(f"Error: Profile '{profile_name}' is invalid: {e}")
+            return None
+    return profile_names, profiles, plans
+
+
+def process_command(input_paths, settings_manager, profile_names=(constants.DEFAULT_PROFILE,), executor=None,
+                    force=False, recursive=False, include=None, exclude=None, metrics_path=None,
+                    pipeline=False, shard=None, report_path=None, archive_path=None, eta=False):
+    import logging
+    from image_processor import process_image_variants, reserve_output_paths, release_output_paths
+    from cache import ProcessingCache
+    from executors import run_batch, resolve_backend, BatchStats
+    from scanner import iter_input_files
+    from scheduler import MemoryBudgetScheduler
+    from instrumentation import RunMetrics, instrumented_process_image_variants
+    from pipeline import run_pipeline
+    from shards import parse_shard, ShardReport
+    from archive import ArchiveSink
+    from output_files import directory_sync
+    from logger import AppLogger, ProgressReporter
+
+    # Get profile settings from the profile manager, expanding profile groups
+    loaded = load_profiles(settings_manager, profile_names)
+    if not loaded:
         return
+    profile_names, profiles, plans = loaded
 
     # Get max_workers from profile settings or use a default value
     max_workers = settings_manager.user_settings.get("max_workers", constants.DEFAULT_MAX_WORKERS)
 
-    # Collect all files to process
-    files_to_process = []
-    for input_path in input_paths:
-        if not os.path.exists(input_path):
-            print(f"Error: Input path '{input_path}' does not exist.")
-            continue
-
-        if os.path.isdir(input_path):
-            # Collect supported files from the directory
-            files = [f for f in glob.glob(os.path.join(input_path, "*")) if
-                     f.split('.')[-1].lower() in constants.SUPPORTED_FORMATS]
-            if not files:
-                print(f"No supported files found in directory '{input_path}'.")
+    # The CLI option takes precedence over the executor from user settings
+    executor = executor or settings_manager.user_settings.get("executor", constants.DEFAULT_EXECUTOR)
+
+    # The CLI flag switches the pipeline on, the user setting makes it the default
+    pipeline = pipeline or settings_manager.user_settings.get("pipeline", False)
+
+    # Admit work by estimated memory cost when a budget is configured
+    memory_budget_mb = settings_manager.user_settings.get("memory_budget_mb", constants.DEFAULT_MEMORY_BUDGET_MB)
+    scheduler = MemoryBudgetScheduler(memory_budget_mb * 1024 * 1024, plans) if memory_budget_mb else None
+
+    # Split the batch between nodes by a stable hash, each node writes its own result manifest
+    if shard:
+        try:
+            shard = parse_shard(shard)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        report_path = report_path or f"report-{shard[0]}-of-{shard[1]}.jsonl"
+    # Results streamed into an archive are complete deliveries: every file is processed and nothing is cached
+    sink = None
+    if archive_path:
+        try:
+            sink = ArchiveSink(archive_path, archive_root(input_paths))
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        pipeline = force = True
+
+    report = ShardReport(report_path, shard, profile_names) if report_path else None
+
+    cache = ProcessingCache(profiles)
+    app_logger = AppLogger()
+    progress = ProgressReporter()
+    skipped_count = 0
+
+    # Results written next to their sources, by earlier runs or by other shards, are not inputs
+    output_patterns = [(plan.output_pattern, plan.overwrite) for plan in plans]
+
+    if eta and isinstance(input_paths, list):
+        # Count the inputs in the background, so the progress line can show an ETA once the count is known
+        def count_files():
+            progress.total = sum(1 for _ in iter_input_files(input_paths, recursive, include, exclude, shard,
+                                                              quiet=True, output_patterns=output_patterns))
+
+        threading.Thread(target=count_files, name="input-counter", daemon=True).start()
+
+    # Recorded results of earlier runs are not inputs, wherever they were written
+    recorded_outputs = cache.output_paths()
+
+    def files_to_process():
+        # Stream files from the scanner, skipping those whose output from a previous run is still valid
+        nonlocal skipped_count
+        for file in iter_input_files(input_paths, recursive, include, exclude, shard,
+                                     output_patterns=output_patterns):
+            if os.path.abspath(file) in recorded_outputs:
+                continue
+            if not force and cache.is_up_to_date(file):
+                skipped_count += 1
+                progress.skipped = skipped_count
+                app_logger.record("File skipped", logging.DEBUG, path=file, status="skipped")
+                if report:
+                    report.add(file, "skipped")
             else:
-                files_to_process.extend(files)
-        elif os.path.isfile(input_path):
-            files_to_process.append(input_path)
-        else:
-            print(f"Error: Input '{input_path}' is neither a valid file nor directory.")
+                yield file
+
+    files = files_to_process()
 
-    if not files_to_process:
+    # Peek at the first files, so an empty batch is reported and "auto" can tell a single file from a batch
+    first_files = list(itertools.islice(files, 2))
+    if not first_files:
+        if skipped_count:
+            print(f"Skipped {skipped_count} up-to-date file(s). Use --force to reprocess them.")
         print("No files to process.")
+        cache.save()
+        app_logger.stop()
+        if report:
+            report.close()
+        if sink:
+            sink.close()
+        return
+
+    try:
+        backend = resolve_backend(executor, len(first_files) if len(first_files) < 2 else None)
+    except ValueError as e:
+        print(f"Error: {e}")
+        app_logger.stop()
+        if sink:
+            sink.close()
+        return
+
+    # Per-stage instrumentation is only switched on when a metrics file or a result manifest is requested
+    run_metrics = RunMetrics() if metrics_path else None
+    instrument = bool(metrics_path or report)
+    task = instrumented_process_image_variants if instrument else process_image_variants
+
+    # Process files concurrently with the selected executor backend
+    files = itertools.chain(first_files, files)
+    if pipeline:
+        results = run_pipeline(files, plans, max_workers, backend, scheduler, instrument=instrument, sink=sink)
+    else:
+        # Names are reserved here, a process pool's workers do not see each other's names
+        results = run_batch(files, {"profiles": plans}, max_workers, backend, scheduler, task,
+                            reserve=lambda file: reserve_output_paths(file, plans), release=release_output_paths)
+    stats = BatchStats(backend, max_workers)
+    try:
+        for file, result, error in results:
+            stats.add(error)
+            progress.update(failed=error is not None)
+            if error is None:
+                seconds = None
+                if instrument:
+                    output_paths, file_metrics = result
+                    seconds = sum(file_metrics["stages"].values())
+                    if run_metrics:
+                        run_metrics.add(file_metrics)
+                else:
+                    output_paths = result
+                if not sink:
+                    cache.record(file, output_paths)
+                app_logger.record("File processed", path=file, status="processed", outputs=output_paths,
+                                  seconds=seconds)
+                if report:
+                    report.add(file, "processed", output_paths, seconds)
+            else:
+                app_logger.record(f"Error processing file '{file}': {error}", logging.ERROR, path=file,
+                                  status="failed", error=str(error))
+                if report:
+                    report.add(file, "failed", error=str(error))
+    finally:
+        # Keep the progress of an interrupted run, once the outputs it records are durable
+        directory_sync.flush()
+        cache.save()
+        progress.finish()
+        app_logger.stop()
+        if report:
+            report.close()
+        if sink:
+            results.close()  # Stops the writer thread before the archive is finalized
+            sink.close()
+    stats.finish()
+
+    if skipped_count:
+        print(f"Skipped {skipped_count} up-to-date file(s). Use --force to reprocess them.")
+    if scheduler:
+        print(scheduler.summary())
+    if run_metrics:
+        run_metrics.write(metrics_path)
+        print(run_metrics.summary())
+    print(stats.summary())
+    if report:
+        print(f"Result manifest written to '{report_path}'.")
+    if sink:
+        print(f"Results written to the archive '{archive_path}'.")
+    print(f"Image processing completed using profile(s) {', '.join(repr(name) for name in profile_names)}.")
+
+
+def archive_root(input_paths):
+    """
+    Returns the directory archive entry names are relative to: the common directory of the inputs.
+
+    :param input_paths: Input files and folders; None for an input stream such as --files-from.
+    """
+    if not isinstance(input_paths, list) or not input_paths:
+        return None
+    directories = [os.path.abspath(path if os.path.isdir(path) else os.path.dirname(path) or ".")
+                   for path in input_paths]
+    try:
+        return os.path.commonpath(directories)
+    except ValueError:
+        return None  # Inputs on different drives
+
+
+def merge_command(args):
+    import json
+    from shards import merge_reports
+
+    try:
+        summary = merge_reports(args.reports)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+
+    for run in summary["runs"]:
+        status = "" if run["complete"] else " (interrupted)"
+        print(f"{run['report']}: shard {run['shard'] or '-'} on {run['host']}, {run['files']} file(s){status}")
+    if summary["missing_shards"]:
+        print(f"Missing shard(s): {', '.join(summary['missing_shards'])}")
+    print(f"{summary['files']} file(s): {summary['processed']} processed, {summary['skipped']} skipped, "
+          f"{summary['failed']} failed.")
+
+    if args.failures:
+        with open(args.failures, "w", encoding="utf-8") as f:
+            f.writelines(f"{failure['path']}\n" for failure in summary["failures"])
+        print(f"Failed files written to '{args.failures}', retry with: process --files-from {args.failures}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+
+
+def watch_command(args, settings_manager, profile_name):
+    from executors import resolve_backend
+    from cache import ProcessingCache
+    from watcher import WatchedFolder, watch_folders
+
+    # Folders from the command line share the --profile option, otherwise each configured folder has its own
+    if args.folders:
+        folder_profiles = {folder: args.profile or [profile_name] for folder in args.folders}
+    else:
+        folder_profiles = settings_manager.user_settings.get("watch_folders", {})
+        if not folder_profiles:
+            print("Error: No folders to watch. Pass folders or set \"watch_folders\" in user settings.")
+            return
+
+    folders = []
+    for path, names in folder_profiles.items():
+        if not os.path.isdir(path):
+            print(f"Error: Watch folder '{path}' does not exist.")
+            return
+        loaded = load_profiles(settings_manager, [names] if isinstance(names, str) else names)
+        if not loaded:
+            return
+        folders.append(WatchedFolder(path, *loaded))
+
+    max_workers = settings_manager.user_settings.get("max_workers", constants.DEFAULT_MAX_WORKERS)
+    executor = args.executor or settings_manager.user_settings.get("executor", constants.DEFAULT_EXECUTOR)
+    try:
+        backend = resolve_backend(executor)
+    except ValueError as e:
+        print(f"Error: {e}")
         return
 
-    # Use ThreadPoolExecutor for concurrent file processing
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit tasks to the thread pool for concurrent processing
-        futures = [executor.submit(process_image, file, **profile_settings) for file in files_to_process]
+    watch_folders(folders, ProcessingCache(), max_workers, backend, args.interval)
+
 
-        # Wait for all futures to complete and process them as they finish
-        for future in as_completed(futures):
-            try:
-                future.result()  # Blocks until the file processing is done
-            except Exception as e:
-                print(f"Error processing file: {e}")
+def serve_command(args, settings_manager):
+    from executors import resolve_backend
+    from server import FramingService, serve
 
-    print(f"Image processing completed using profile '{profile_name}'.")
+    max_workers = settings_manager.user_settings.get("max_workers", constants.DEFAULT_MAX_WORKERS)
+    executor = args.executor or settings_manager.user_settings.get("executor", constants.DEFAULT_EXECUTOR)
+    try:
+        backend = resolve_backend(executor)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    service = FramingService(settings_manager, max_workers, backend)
+    service.warm_up()
+    serve(service, args.host, args.port, args.socket, args.quiet)
 
 
 def settings_command(args, settings_manager):
@@ -110,27 +454,59 @@ def settings_command(args, settings_manager):
         except ValueError as e:
             print(e)
 
+    elif args.action == "clear-cache":
+        from cache import ProcessingCache
+        ProcessingCache().clear()
+        print("Processing cache cleared.")
+
 
 def main():
     """
     Main entry point of the application.
     Handles both CLI and drag-and-drop/context menu execution.
     """
+    # Initialize argument parser
+    parser = parse_arguments()  # Correctly assign the parser object
+    args = parser.parse_args() if len(sys.argv) > 1 else None  # Parse the arguments from command-line input
+
+    # Settings are read after parsing, so --help and usage errors do not touch the settings directory
     settings_manager = SettingsManager()
     profile_name = settings_manager.user_settings.get("active_profile", constants.DEFAULT_PROFILE)
 
-    # Initialize argument parser
-    parser = parse_arguments()  # Correctly assign the parser object
-    if len(sys.argv) > 1:
-        args = parser.parse_args()  # Parse the arguments from command-line input
+    if args is not None:
 
         if args.command == "process":
             # Process command with files or folders
             input_paths = args.input or []
-            if not input_paths:
+            if not input_paths and not args.files_from:
                 print("Error: No input files or folders provided.")
                 return
-            process_command(input_paths, settings_manager, args.profile or profile_name)
+            if args.files_from:
+                from scanner import iter_file_list
+                input_paths = itertools.chain(input_paths, iter_file_list(args.files_from))
+            process_command(input_paths, settings_manager, args.profile or [profile_name], args.executor,
+                            force=args.force, recursive=args.recursive, include=args.include,
+                            exclude=args.exclude, metrics_path=args.metrics,
+                            pipeline=args.pipeline, shard=args.shard, report_path=args.report,
+                            archive_path=args.archive, eta=args.eta)
+
+        elif args.command == "merge":
+            merge_command(args)
+
+        elif args.command == "watch":
+            watch_command(args, settings_manager, profile_name)
+
+        elif args.command == "serve":
+            serve_command(args, settings_manager)
+
+        elif args.command == "benchmark":
+            from benchmark import run_benchmark, run_startup_benchmark, write_report
+            if args.startup:
+                report = run_startup_benchmark(args.count)
+            else:
+                report = run_benchmark(args.count, args.modes, args.workers, args.executors, args.border_colors,
+                                       args.formats)
+            write_report(report, args.output)
 
         elif args.command == "settings":
             # Settings-related command
@@ -143,7 +519,7 @@ def main():
         # If no command is specified, check for drag-and-drop files
         input_paths = sys.argv[1:]  # Collect paths passed via drag-and-drop
         if input_paths:
-            process_command(input_paths, settings_manager, profile_name)
+            process_command(input_paths, settings_manager, [profile_name])
         else:
             print("Error: No input files or folders provided. Use '--help' for usage details.")
 
@@ -0,0 +1,90 @@
+import io
+from functools import lru_cache
+from PIL import Image
+
+try:
+    from PIL import ImageCms
+except ImportError:  # Pillow built without LittleCMS
+    ImageCms = None
+
+# Modes whose alpha channel is flattened onto the border color when the image is pasted into its frame
+ALPHA_MODES = {"RGBA": "RGB", "LA": "L"}
+
+
+def normalize_mode(img):
+    """
+    Converts a decoded image to a mode the framing steps and the JPEG encoder accept.
+
+    RGB and grayscale images are returned as they are. Images with transparency keep their
+    alpha channel, which is flattened onto the border color while the image is pasted into its
+    frame, after any resize, so flattening costs no separate pass over the full-size image.
+    Other modes are converted once: palettes and bilevel images are expanded, CMYK is converted
+    to sRGB through its embedded ICC profile, and 16-bit grayscale is scaled down to 8 bits.
+
+    :param img: The decoded source image (PIL.Image).
+    :return: An image in RGB, L, RGBA or LA mode.
+    """
+    mode = img.mode
+    if mode in ("RGB", "L") or mode in ALPHA_MODES:
+        return img
+    if mode in ("RGBa", "La"):
+        return img.convert(mode[:-1] + "A")
+    if mode == "P":
+        return img.convert("RGBA" if "transparency" in img.info else "RGB")
+    if mode == "PA":
+        return img.convert("RGBA")
+    if mode == "1":
+        return img.convert("L")
+    if mode == "I" or mode.startswith("I;16"):
+        # 16-bit grayscale, also decoded as 32-bit integers with 16-bit values by some plugins;
+        # the values are scaled in place, converting to 8 bits alone would clip them
+        return img.point(lambda value: value / 256).convert("L")
+    if mode == "CMYK":
+        return cmyk_to_rgb(img)
+    return img.convert("RGB")
+
+
+def cmyk_to_rgb(img):
+    """
+    Converts a CMYK image to sRGB, through its embedded ICC profile if it has one.
+
+    :param img: A CMYK image (PIL.Image).
+    :return: An RGB image.
+    """
+    icc_profile = img.info.get("icc_profile")
+    if icc_profile and ImageCms is not None:
+        try:
+            return ImageCms.applyTransform(img, _cmyk_transform(icc_profile))
+        except ImageCms.PyCMSError:
+            pass  # A damaged or unsupported profile falls back to the naive conversion
+    return img.convert("RGB")
+
+
+@lru_cache(maxsize=8)
+def _cmyk_transform(icc_profile):
+    # Building a transform parses both profiles; batches usually share one profile
+    return ImageCms.buildTransform(ImageCms.ImageCmsProfile(io.BytesIO(icc_profile)),
+                                   ImageCms.createProfile("sRGB"), "CMYK", "RGB")
+
+
+def canvas_mode(mode):
+    """
+    Returns the mode of the border canvas of an image of a given mode.
+
+    :param mode: Mode returned by normalize_mode().
+    :return: "RGB" or "L".
+    """
+    return ALPHA_MODES.get(mode, mode)
+
+
+def canvas_color(mode, border_color):
+    """
+    Converts a border color to a canvas mode.
+
+    :param mode: Canvas mode, "RGB" or "L".
+    :param border_color: The color of the border (RGB tuple).
+    :return: A color value for Image.new() in that mode.
+    """
+    if mode == "RGB":
+        return tuple(border_color)
+    return Image.new("RGB", (1, 1), tuple(border_color)).convert(mode).getpixel((0, 0))
@@ -0,0 +1,168 @@
+import os
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from multiprocessing import util
+import constants
+
+# Marks an output path nobody has reserved
+_FREE = object()
+
+# Permissions of new files under the process umask; mkstemp() creates files readable by the owner only
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+class OutputNames:
+    """
+    Output paths reserved by the files of this process.
+
+    Two different sources that resolve to the same output path, for example through a
+    {timestamp} pattern or an absolute output folder, get distinct names ("name_1.jpg", ...)
+    instead of overwriting each other. A source written again keeps its name.
+
+    A name is held until release() is called once its write committed or failed; the last
+    constants.OUTPUT_NAMES_RECENT released names stay taken by their source, so a file of the
+    same batch written a moment later does not replace them, while a long-running process does
+    not keep every name it ever wrote.
+
+    Worker processes of a pool do not share the reservations, so names are reserved by the
+    process that submits the work (see image_processor.reserve_output_paths()).
+    """
+
+    def __init__(self, recent=constants.OUTPUT_NAMES_RECENT):
+        self._owners = {}  # output path -> [source path, reservations not released yet]
+        self._released = OrderedDict()  # recently released output path -> source path
+        self._recent = recent
+        self._lock = threading.Lock()
+
+    def reserve(self, output_path, source=None):
+        """
+        Reserves an output path for a source.
+
+        :param output_path: Path returned by generate_output_path().
+        :param source: Path to the source image; None reserves a new name every time.
+        :return: The reserved path, output_path or a numbered variant of it.
+        """
+        base, ext = os.path.splitext(output_path)
+        candidate = output_path
+        number = 0
+        with self._lock:
+            while True:
+                owner = self._owners.get(candidate)
+                if owner is None:
+                    owner_source = self._released.get(candidate, _FREE)
+                    if owner_source is _FREE or (source is not None and owner_source == source):
+                        self._released.pop(candidate, None)
+                        self._owners[candidate] = [source, 1]
+                        return candidate
+                elif source is not None and owner[0] == source:
+                    owner[1] += 1
+                    return candidate
+                number += 1
+                candidate = f"{base}_{number}{ext}"
+
+    def release(self, output_path):
+        """
+        Releases a reserved path once its file is written or the write failed.
+
+        :param output_path: Path returned by reserve().
+        """
+        with self._lock:
+            owner = self._owners.get(output_path)
+            if owner is None:
+                return
+            owner[1] -= 1
+            if owner[1]:
+                return  # Reserved again for the same source, still being written
+            del self._owners[output_path]
+            self._released[output_path] = owner[0]
+            if len(self._released) > self._recent:
+                self._released.popitem(last=False)
+
+
+class DirectorySync:
+    """
+    Flushes the directory entries of renamed files in batches.
+
+    A rename is only durable once its directory is flushed. Flushing once per
+    constants.OUTPUT_DIR_FSYNC_BATCH renames or constants.OUTPUT_DIR_FSYNC_INTERVAL seconds
+    costs one fsync per directory and batch instead of one per file.
+    """
+
+    def __init__(self):
+        self._pending = set()
+        self._renames = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, directory):
+        """Marks a directory as changed and flushes the batch if it is due."""
+        with self._lock:
+            self._pending.add(directory)
+            self._renames += 1
+            due = (self._renames >= constants.OUTPUT_DIR_FSYNC_BATCH
+                   or time.monotonic() - self._last_flush >= constants.OUTPUT_DIR_FSYNC_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Flushes the changed directories."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self._renames = 0
+            self._last_flush = time.monotonic()
+        for directory in pending:
+            _fsync_directory(directory)
+
+
+def _fsync_directory(directory):
+    if os.name == "nt":
+        return  # Windows cannot open a directory; NTFS renames are journaled
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # Some network file systems do not support flushing a directory
+    finally:
+        os.close(fd)
+
+
+output_names = OutputNames()
+directory_sync = DirectorySync()
+
+# Flush the last batch when the process exits, including the workers of a process pool
+util.Finalize(None, directory_sync.flush, exitpriority=10)
+
+
+def write_atomic(path, data):
+    """
+    Writes a file so that readers only ever see the old file or the complete new one.
+
+    The data goes to a temporary file in the same directory, which is renamed over the
+    final path; a crash leaves at most a hidden ".tmp" file, never a truncated output.
+
+    :param path: Path of the file.
+    :param data: Bytes to write.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), FILE_MODE)
+            f.write(data)
+            if constants.OUTPUT_FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if constants.OUTPUT_FSYNC:
+        directory_sync.add(directory)
@@ -0,0 +1,173 @@
+import time
+import queue
+import threading
+from executors import run_batch
+from image_processor import render_image_variants, write_output
+from instrumentation import instrumented_render_image_variants
+from output_files import directory_sync
+import constants
+
+# Marks the end of a stage's queue
+_END = object()
+
+
+def prefetch_files(files, depth=constants.PIPELINE_PREFETCH_DEPTH):
+    """
+    Reads files ahead of processing in a background I/O thread.
+
+    The bounded queue keeps at most `depth` files in memory, so a slow consumer stops the reader.
+
+    :param files: Iterable of file paths.
+    :param depth: Maximum number of files read ahead.
+    :return: A generator of (file_path, content) tuples; content is the OSError if reading failed.
+             An exception raised by the files iterable is raised again by the generator.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    failure = []  # An exception of the files iterable, handed over to the consumer
+
+    def reader():
+        try:
+            for file in files:
+                try:
+                    with open(file, "rb") as f:
+                        item = (file, f.read())
+                except OSError as e:
+                    item = (file, e)
+                while not stop.is_set():
+                    try:
+                        buffer.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            buffer.put(_END)
+
+    thread = threading.Thread(target=reader, name="prefetch-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                if failure:
+                    raise failure[0]  # Ending quietly would report a cut-short batch as complete
+                break
+            yield item
+    finally:
+        # Let the reader finish if the consumer stops early
+        stop.set()
+        while thread.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class OutputWriter:
+    """
+    Writes encoded results in a background thread.
+
+    submit() blocks while the queue is full, which gives backpressure to the compute stage.
+    Finished files are collected and handed back to the submitting thread by completed().
+    """
+
+    def __init__(self, depth=constants.PIPELINE_WRITE_QUEUE_DEPTH, write=write_output):
+        """
+        :param depth: Maximum number of files queued for writing.
+        :param write: Function called as write(output_path, encoded, source) that returns the
+                      location written, write_output() or ArchiveSink.write().
+        """
+        self._write = write
+        self._queue = queue.Queue(maxsize=depth)
+        self._completed = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, file, rendered, file_metrics=None):
+        """
+        Queues the results of one input file for writing.
+
+        :param file: Path to the source image.
+        :param rendered: A list of (output_path, encoded bytes).
+        :param file_metrics: Optional metrics dict of the file, completed with the write stage.
+        """
+        self._queue.put((file, rendered, file_metrics))
+
+    def completed(self):
+        """
+        Returns the files written since the last call.
+
+        :return: A list of (file_path, output_paths, file_metrics, error) tuples.
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._completed.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def close(self):
+        """Waits until all queued results are written."""
+        self._queue.put(_END)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            file, rendered, file_metrics = item
+            start_time = time.perf_counter()
+            try:
+                output_paths = [self._write(output_path, encoded, file) for output_path, encoded in rendered]
+            except Exception as e:
+                self._completed.put((file, None, file_metrics, e))
+                continue
+            if file_metrics is not None:
+                file_metrics["stages"]["write"] = time.perf_counter() - start_time
+            self._completed.put((file, output_paths, file_metrics, None))
+
+
+def run_pipeline(files, profiles, max_workers=constants.DEFAULT_MAX_WORKERS, backend=constants.DEFAULT_EXECUTOR,
+                 scheduler=None, instrument=False, sink=None):
+    """
+    Processes files in overlapping stages: a reader thread prefetches file content, the executor
+    decodes, frames and encodes in memory, and a writer thread saves the results. Bounded queues
+    between the stages give backpressure, so CPU work overlaps with slow storage.
+
+    :param files: Iterable of paths to the source images, consumed lazily.
+    :param profiles: List of profile settings or compiled ProfilePlan objects, one per output.
+    :param max_workers: Number of worker threads or processes.
+    :param backend: Executor backend, one of constants.EXECUTOR_BACKENDS.
+    :param scheduler: Optional MemoryBudgetScheduler that admits tasks by estimated memory cost.
+    :param instrument: Whether to record per-stage metrics.
+    :param sink: Optional ArchiveSink the results are written into instead of separate files.
+    :return: A generator of (file_path, result, error) tuples shaped like those of run_batch
+             with process_image_variants (or its instrumented variant).
+    """
+    task = instrumented_render_image_variants if instrument else render_image_variants
+    writer = OutputWriter(write=sink.write if sink else write_output)
+
+    def finished():
+        for file, output_paths, file_metrics, error in writer.completed():
+            yield file, (output_paths, file_metrics) if instrument else output_paths, error
+
+    try:
+        for file, result, error in run_batch(prefetch_files(files), {"profiles": profiles}, max_workers, backend,
+                                             scheduler, task, prefetched=True):
+            if error is not None:
+                yield file, None, error
+            elif instrument:
+                rendered, file_metrics = result
+                writer.submit(file, rendered, file_metrics)
+            else:
+                writer.submit(file, result)
+            yield from finished()
+    finally:
+        writer.close()
+        directory_sync.flush()
+    yield from finished()
@@ -0,0 +1,326 @@
+import constants
+from autocolor import parse_auto_color
+
+# JPEG encoder options of the modes that re-encode the image
+ENCODE_ARGS = ["quality", "subsampling", "progressive", "optimize", "max_bytes"]
+
+# Chroma subsampling values accepted by the JPEG encoder
+JPEG_SUBSAMPLINGS = (0, 1, 2, "4:4:4", "4:2:2", "4:2:0")
+
+# Define valid modes and their required/optional arguments
+MODE_ARGS = {
+    "output_size": {
+        "required": ["output_size"],
+        "optional": ["min_border", "resample_preset"] + ENCODE_ARGS
+    },
+    "border_size": {
+        "required": ["border_size"],
+        "optional": ["streaming"] + ENCODE_ARGS
+    },
+    "lossless_border": {
+        "required": ["border_size"],
+        "optional": []
+    }
+}
+
+
+class ProfilePlan:
+    """
+    A validated, immutable profile, compiled once by compile_profile() and shared by every file
+    of a batch.
+
+    The geometry of a source size is computed on first use and memoized, so a batch of
+    same-size camera images calculates its borders and resize dimensions once.
+    """
+
+    __slots__ = ("mode", "overwrite", "output_pattern", "border_color", "auto_color", "output_size", "min_border",
+                 "preset", "reducing_gap", "border_size", "streaming", "encode_options", "max_bytes", "_geometry")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name))
+        object.__setattr__(self, "_geometry", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # Process pool workers receive the plan without its memoized geometry
+        return _restore_plan, ({name: getattr(self, name) for name in self.__slots__ if name != "_geometry"},)
+
+    def __repr__(self):
+        return f"ProfilePlan(mode={self.mode!r}, output_pattern={self.output_pattern!r})"
+
+    def geometry(self, size):
+        """
+        Returns the geometry of the profile for a source size.
+
+        :param size: The source image size (width, height).
+        :return: A tuple (new_size, borders); new_size is None for modes that do not resize.
+        """
+        geometry = self._geometry.get(size)
+        if geometry is None:
+            if self.mode == "output_size":
+                new_size = calculate_resize_dimensions(size, self.output_size, self.min_border)
+                geometry = (new_size, calculate_borders_for_output_size(new_size, self.output_size))
+            else:
+                geometry = (None, border_size_to_pixels(self.border_size, size))
+            if len(self._geometry) >= constants.PROFILE_GEOMETRY_CACHE_SIZE:
+                self._geometry.clear()
+            self._geometry[size] = geometry
+        return geometry
+
+
+def _restore_plan(fields):
+    return ProfilePlan(**fields)
+
+
+def compile_profile(profile_settings):
+    """
+    Validates a profile and compiles it into a plan.
+
+    :param profile_settings: Profile parameters, or an already compiled ProfilePlan.
+    :return: A ProfilePlan.
+    :raises ValueError: If the profile is invalid.
+    """
+    if isinstance(profile_settings, ProfilePlan):
+        return profile_settings
+
+    # Extract parameters from the profile
+    mode = profile_settings.get("mode", constants.DEFAULT_MODE)
+
+    # Validate the mode
+    if mode not in MODE_ARGS:
+        raise ValueError(f"Invalid mode: {mode}. Supported modes are: {', '.join(MODE_ARGS.keys())}")
+
+    # Filter arguments based on the mode
+    filtered_profile_settings = filter_profile_settings(
+        profile_settings,
+        required_keys=MODE_ARGS[mode]["required"],
+        optional_keys=MODE_ARGS[mode]["optional"]
+    )
+
+    # An automatic border color is picked from the image content once it is decoded
+    border_color = profile_settings.get("border_color", constants.DEFAULT_BORDER_COLOR)
+    auto_color = parse_auto_color(border_color)
+    if not auto_color:
+        if not isinstance(border_color, (tuple, list)) or len(border_color) != 3 \
+                or not all(isinstance(value, int) and 0 <= value <= 255 for value in border_color):
+            raise ValueError(f"Invalid border_color: {border_color}. Use three values from 0 to 255.")
+        border_color = tuple(border_color)
+
+    fields = {
+        "mode": mode,
+        "overwrite": profile_settings.get("overwrite", constants.DEFAULT_ALLOW_OVERWRITE),
+        "output_pattern": profile_settings.get("output_pattern", constants.DEFAULT_OUTPUT_PATTERN),
+        "border_color": None if auto_color else border_color,
+        "auto_color": auto_color,
+    }
+
+    if mode == "output_size":
+        output_size = filtered_profile_settings["output_size"]
+        if _is_int(output_size):
+            output_size = (output_size, output_size)  # A single value is a square output
+        elif isinstance(output_size, (tuple, list)):
+            output_size = tuple(output_size)
+        if not (isinstance(output_size, tuple) and len(output_size) == 2
+                and all(_is_int(value) and value > 0 for value in output_size)):
+            raise ValueError("output_size must be a positive int or a tuple (width, height)")
+        min_border = filtered_profile_settings.get("min_border", constants.DEFAULT_MIN_BORDER)
+        if not _is_int(min_border) or min_border < 0:
+            raise ValueError("min_border must be a non-negative number of pixels")
+        preset = filtered_profile_settings.get("resample_preset", constants.DEFAULT_RESAMPLE_PRESET)
+        if preset not in constants.RESAMPLE_PRESETS:
+            raise ValueError(
+                f"Invalid resample preset: {preset}. Supported presets are: {', '.join(constants.RESAMPLE_PRESETS)}")
+        fields.update(
+            output_size=output_size,
+            min_border=min_border,
+            preset=preset,
+            reducing_gap=constants.RESAMPLE_PRESETS[preset][1],
+        )
+    else:
+        fields.update(
+            border_size=parse_border_size(filtered_profile_settings["border_size"]),
+            streaming=filtered_profile_settings.get("streaming", constants.DEFAULT_STREAMING),
+        )
+
+    if mode != "lossless_border":
+        encode_options = (
+            ("quality", filtered_profile_settings.get("quality", constants.DEFAULT_JPEG_QUALITY)),
+            ("subsampling", filtered_profile_settings.get("subsampling", constants.DEFAULT_JPEG_SUBSAMPLING)),
+            ("progressive", filtered_profile_settings.get("progressive", constants.DEFAULT_JPEG_PROGRESSIVE)),
+            ("optimize", filtered_profile_settings.get("optimize", constants.DEFAULT_JPEG_OPTIMIZE)),
+        )
+        quality, subsampling = encode_options[0][1], encode_options[1][1]
+        if not _is_int(quality) or not 1 <= quality <= 100:
+            raise ValueError("quality must be a number between 1 and 100")
+        if subsampling not in JPEG_SUBSAMPLINGS or isinstance(subsampling, bool):
+            raise ValueError(f"Invalid subsampling: {subsampling}. Use 0 (4:4:4), 1 (4:2:2) or 2 (4:2:0).")
+        max_bytes = filtered_profile_settings.get("max_bytes", constants.DEFAULT_MAX_BYTES)
+        if not _is_int(max_bytes) or max_bytes < 0:
+            raise ValueError("max_bytes must be a non-negative number of bytes")
+        fields.update(encode_options=encode_options, max_bytes=max_bytes)
+
+    return ProfilePlan(**fields)
+
+
+def _is_int(value):
+    # JSON true and false load as bool, which is a subclass of int
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def calculate_resize_dimensions(img_size, target_size, min_border=0):
+    """
+    Calculates the size of the image fitted within the target size.
+
+    :param img_size: The source image size (width, height).
+    :param target_size: The target size (width, height); compile_profile() turns a single value into a square.
+    :param min_border: Minimum border width.
+    :return: The new dimensions (width, height).
+    """
+    img_width, img_height = img_size
+    target_width, target_height = map(make_even, target_size)
+    scale = min(
+        (target_width - 2 * min_border) / img_width,
+        (target_height - 2 * min_border) / img_height
+    )
+    return tuple(map(make_even, (int(img_width * scale), int(img_height * scale))))
+
+
+def calculate_borders_for_output_size(new_size, output_size):
+    """
+    Calculates the border dimensions for the output size mode.
+
+    :param new_size: The size of the resized image (width, height).
+    :param output_size: The target image size (including the border), tuple (width, height).
+    :return: A tuple of borders (left, top, right, bottom).
+    """
+    new_width, new_height = new_size
+    output_width, output_height = output_size
+
+    # Calculate the border dimensions
+    left_border = (output_width - new_width) // 2
+    top_border = (output_height - new_height) // 2
+    right_border = output_width - new_width - left_border
+    bottom_border = output_height - new_height - top_border
+
+    return left_border, top_border, right_border, bottom_border
+
+
+def calculate_borders_for_border_size(img, border_size):
+    """
+    Calculates the border dimensions for the border-size border mode.
+
+    :param img: The source image (PIL.Image).
+    :param border_size: The size of the border, which can be:
+                        - A single value (int or percentage, e.g., "10" or "10%").
+                        - Two values (horizontal, vertical, e.g., "10,20" or "10%,20").
+                        - Four values (left, top, right, bottom, e.g., "10,20,30,40" or combinations like "10,10%,20,20%").
+    :return: A tuple of borders (left, top, right, bottom).
+    """
+    return border_size_to_pixels(parse_border_size(border_size), img.size)
+
+
+def parse_border_size(border_size):
+    """
+    Parses a border_size setting, see calculate_borders_for_border_size().
+
+    :param border_size: The size of the border: a string, a number, or a list of 1, 2 or 4 values.
+    :return: A tuple of 1, 2 or 4 values (number, is_percentage).
+    """
+    # Split and process border_size
+    if isinstance(border_size, str):
+        parts = border_size.split(',')
+    elif isinstance(border_size, (tuple, list)):
+        parts = [str(p) for p in border_size]
+    else:
+        parts = [str(border_size)]
+
+    if len(parts) not in (1, 2, 4):
+        raise ValueError("border_size must contain 1, 2, or 4 values (pixels or percentages).")
+
+    parsed = []
+    for value in parts:
+        if value.endswith('%'):
+            try:
+                parsed.append((float(value.strip('%')), True))
+            except ValueError:
+                raise ValueError(f"Invalid border size value: {value}") from None
+        elif value.isdigit():
+            parsed.append((int(value), False))
+        else:
+            raise ValueError(f"Invalid border size value: {value}")
+    return tuple(parsed)
+
+
+def border_size_to_pixels(parsed_border_size, img_size):
+    """
+    Converts a parsed border_size to pixels for an image size.
+
+    :param parsed_border_size: Values returned by parse_border_size().
+    :param img_size: The source image size (width, height).
+    :return: A tuple of borders (left, top, right, bottom).
+    """
+    img_width, img_height = img_size
+
+    def to_pixels(part, reference):
+        """Converts a value to pixels. Percentages are relative to the reference size."""
+        value, is_percentage = part
+        return make_even(int(value / 100 * reference)) if is_percentage else make_even(value)
+
+    # Handle different lengths of parts
+    if len(parsed_border_size) == 1:
+        border = to_pixels(parsed_border_size[0], max(img_width, img_height))
+        return border, border, border, border
+    if len(parsed_border_size) == 2:
+        horizontal = to_pixels(parsed_border_size[0], img_width)
+        vertical = to_pixels(parsed_border_size[1], img_height)
+        return horizontal, vertical, horizontal, vertical
+    return (
+        to_pixels(parsed_border_size[0], img_width),
+        to_pixels(parsed_border_size[1], img_height),
+        to_pixels(parsed_border_size[2], img_width),
+        to_pixels(parsed_border_size[3], img_height),
+    )
+
+
+def filter_profile_settings(profile_settings, required_keys=None, optional_keys=None, required=True):
+    """
+    Filters a dictionary of keyword arguments, validating required and optional keys.
+
+    :param profile_settings: Dictionary of keyword arguments to filter.
+    :param required_keys: List of keys that are required.
+    :param optional_keys: List of keys that are optional.
+    :param required: Whether to enforce the presence of required keys.
+    :return: A dictionary containing only the allowed keys.
+    """
+    required_keys = required_keys or []
+    optional_keys = optional_keys or []
+
+    # Check for missing required keys
+    if required:
+        missing_keys = [key for key in required_keys if key not in profile_settings]
+        if missing_keys:
+            raise ValueError(f"Missing required keys: {', '.join(missing_keys)}")
+
+    # Filter and include only valid keys
+    filtered_profile_settings = {
+        key: value for key, value in profile_settings.items()
+        if key in required_keys or key in optional_keys
+    }
+
+    return filtered_profile_settings
+
+
+def make_even(value):
+    """
+    Rounds the value to the nearest even number.
+
+    :param value: An integer.
+    :return: The nearest even number.
+    """
+    return value if value % 2 == 0 else value + 1
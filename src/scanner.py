@@ -0,0 +1,146 @@
+import os
+import sys
+from fnmatch import fnmatch
+from shards import in_shard
+from utils import generate_output_path
+import constants
+
+
+def iter_input_files(input_paths, recursive=False, include=None, exclude=None, shard=None, quiet=False,
+                     output_patterns=None):
+    """
+    Lazily yields the files to process from a list of files and directories.
+
+    Directories are walked with os.scandir one at a time, so the first file is available
+    immediately and memory use does not depend on the size of the tree.
+
+    :param input_paths: Paths to input files or directories.
+    :param recursive: Whether to descend into subdirectories.
+    :param include: Glob patterns; when given, only matching files are yielded.
+    :param exclude: Glob patterns of files and directories to skip.
+    :param shard: Optional (i, N) tuple; only files of the i-th of N shards are yielded, chosen by
+                  their path relative to the input directory. Files given directly are placed by
+                  their path relative to the working directory, so nodes that start from the same
+                  directory of a share agree wherever it is mounted.
+    :param quiet: Do not print messages about missing inputs and unreadable directories.
+    :param output_patterns: Optional (output_pattern, overwrite) pairs of the profiles; files of a
+                            directory named like the output of another file in it are skipped, so
+                            results written by earlier runs or other nodes are not processed again.
+    :return: A generator of file paths.
+    """
+    for input_path in input_paths:
+        if not os.path.exists(input_path):
+            if not quiet:
+                print(f"Error: Input path '{input_path}' does not exist.")
+            continue
+
+        if os.path.isdir(input_path):
+            found = False
+            for file_path in _walk_directory(input_path, input_path, recursive, include or [], exclude or [], quiet,
+                                             output_patterns):
+                found = True
+                if shard and not in_shard(os.path.relpath(file_path, input_path).replace(os.sep, "/"), shard):
+                    continue
+                yield file_path
+            if not found and not quiet:
+                print(f"No supported files found in directory '{input_path}'.")
+        elif os.path.isfile(input_path):
+            if shard and not in_shard(_working_directory_path(input_path), shard):
+                continue
+            yield input_path
+        elif not quiet:
+            print(f"Error: Input '{input_path}' is neither a valid file nor directory.")
+
+
+def iter_file_list(list_path):
+    """
+    Lazily yields the paths listed in a text file, one per line, for example the failures of a merged run.
+
+    :param list_path: Path to the list, or "-" for standard input.
+    :return: A generator of paths.
+    """
+    f = sys.stdin if list_path == "-" else open(list_path, "r", encoding="utf-8")
+    try:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def is_supported_file(file_name):
+    """
+    Checks whether the file has a supported extension.
+
+    :param file_name: Name or path of the file.
+    :return: True if the file can be processed.
+    """
+    return file_name.split('.')[-1].lower() in constants.SUPPORTED_FORMATS
+
+
+def _working_directory_path(path):
+    # The path relative to the working directory with "/" separators, whether it was given absolute or not
+    try:
+        path = os.path.relpath(path)
+    except ValueError:
+        path = os.path.abspath(path)  # On another drive than the working directory
+    return path.replace(os.sep, "/")
+
+
+def _walk_directory(root, directory, recursive, include, exclude, quiet=False, output_patterns=None):
+    try:
+        entries = os.scandir(directory)
+    except OSError as e:
+        if not quiet:
+            print(f"Error: Cannot read directory '{directory}': {e}")
+        return
+
+    # The listing of one directory is taken before yielding, so outputs written next to
+    # the inputs while the batch runs are never picked up as new inputs
+    files = []
+    subdirectories = []
+    with entries:
+        for entry in entries:
+            relative_path = os.path.relpath(entry.path, root).replace(os.sep, "/")
+            if _matches(entry.name, relative_path, exclude):
+                continue
+
+            try:
+                if entry.is_dir():
+                    if recursive:
+                        subdirectories.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            if not is_supported_file(entry.name):
+                continue
+            if include and not _matches(entry.name, relative_path, include):
+                continue
+            files.append(entry.path)
+
+    if output_patterns:
+        files = _without_outputs(files, output_patterns)
+    yield from files
+
+    # Descend after closing the directory handle to keep the number of open descriptors flat
+    for subdirectory in subdirectories:
+        yield from _walk_directory(root, subdirectory, recursive, include, exclude, quiet, output_patterns)
+
+
+def _without_outputs(files, output_patterns):
+    outputs = set()
+    for file_path in files:
+        for output_pattern, overwrite in output_patterns:
+            output_path = generate_output_path(file_path, output_pattern, overwrite)
+            if output_path != file_path:
+                outputs.add(output_path)
+    return [file_path for file_path in files if file_path not in outputs]
+
+
+def _matches(name, relative_path, patterns):
+    return any(fnmatch(name, pattern) or fnmatch(relative_path, pattern) for pattern in patterns)
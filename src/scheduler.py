@@ -0,0 +1,135 @@
+import io
+from PIL import Image
+import constants
+from profile_plan import compile_profile
+from streaming import should_stream
+
+# Bytes per pixel of Pillow's in-memory image storage; multi-band 8-bit modes are stored as 32-bit pixels
+_BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "I;16": 2, "LA": 4, "RGB": 4, "RGBA": 4, "CMYK": 4, "YCbCr": 4}
+
+
+def estimate_memory_cost(input_path, profile_settings):
+    """
+    Estimates the peak memory needed to process an image, reading only its header.
+
+    :param input_path: Path to the source image, or a file object with its content.
+    :param profile_settings: A ProfilePlan, or profile parameters.
+    :return: Estimated peak memory in bytes.
+    """
+    plan = compile_profile(profile_settings)
+
+    with Image.open(input_path) as img:
+        width, height = img.size
+        bytes_per_pixel = _BYTES_PER_PIXEL.get(img.mode, 4)
+        new_size, (left, top, right, bottom) = plan.geometry(img.size)
+
+        if plan.mode == "output_size":
+            new_width, new_height = new_size
+            output_width, output_height = plan.output_size
+
+            # Reduced-scale decoding shrinks the decoded buffer by the draft scale
+            draft_factor, _ = constants.RESAMPLE_PRESETS[plan.preset]
+            scale = 1
+            if draft_factor and img.format == "JPEG":
+                scale = _draft_scale(img.size, (new_width * draft_factor, new_height * draft_factor))
+
+            decoded = -(-width // scale) * -(-height // scale)
+            return (decoded + new_width * new_height + output_width * output_height) * bytes_per_pixel
+
+        framed = (width + left + right) * (height + top + bottom)
+        if plan.mode == "lossless_border":
+            # Only the solid-color canvas is held in memory, the photo is never decoded
+            return framed * bytes_per_pixel
+        if should_stream(img, plan.streaming):
+            # The photo is decoded straight into the canvas
+            return framed * bytes_per_pixel
+        return (width * height + framed) * bytes_per_pixel
+
+
+def _draft_scale(size, requested_size):
+    # Largest libjpeg DCT scale denominator that keeps the image at least the requested size
+    width, height = size
+    requested_width, requested_height = requested_size
+    for scale in (8, 4, 2):
+        if -(-width // scale) >= requested_width and -(-height // scale) >= requested_height:
+            return scale
+    return 1
+
+
+class MemoryBudgetScheduler:
+    """
+    Admits tasks against a memory budget.
+
+    Images that need more than constants.LARGE_IMAGE_BUDGET_SHARE of the budget go to a
+    separate lane that runs one image at a time; an image larger than the whole budget is
+    admitted only when nothing else is running.
+    """
+
+    def __init__(self, budget_bytes, profiles):
+        self.budget = budget_bytes
+        self.profiles = profiles
+        self.in_use = 0
+        self.large_in_flight = False
+        self.task_count = 0
+        self.large_count = 0
+        self.planned_total = 0
+        self.peak = 0
+
+    def estimate(self, input_path, data=None):
+        """
+        Estimates the memory cost of processing a file with all profiles of the batch.
+
+        The variants of one file are summed, which over-estimates the shared decode but
+        accounts for the resized images kept for reuse between profiles.
+
+        :param input_path: Path to the source image.
+        :param data: Optional content of the file, already read by the caller.
+        :return: Estimated peak memory in bytes, or 0 if the header cannot be read.
+        """
+        try:
+            return sum(
+                estimate_memory_cost(io.BytesIO(data) if data is not None else input_path, profile_settings)
+                for profile_settings in self.profiles
+            )
+        except Exception:
+            return 0  # Unreadable files fail in the worker, where the error is reported
+
+    def is_large(self, cost):
+        """Whether the task goes to the large image lane."""
+        return cost > self.budget * constants.LARGE_IMAGE_BUDGET_SHARE
+
+    def can_admit(self, cost):
+        """
+        Checks whether a task of the given cost fits into the budget now.
+
+        :param cost: Estimated memory cost in bytes.
+        :return: True if the task can be started.
+        """
+        if self.in_use == 0:
+            return True
+        if self.is_large(cost) and self.large_in_flight:
+            return False
+        return self.in_use + cost <= self.budget
+
+    def admit(self, cost):
+        """Reserves memory for a started task."""
+        if self.is_large(cost):
+            self.large_in_flight = True
+            self.large_count += 1
+        self.in_use += cost
+        self.task_count += 1
+        self.planned_total += cost
+        self.peak = max(self.peak, self.in_use)
+
+    def release(self, cost):
+        """Releases memory of a finished task."""
+        if self.is_large(cost):
+            self.large_in_flight = False
+        self.in_use -= cost
+
+    def summary(self):
+        """Return the planned cost of the batch."""
+        mb = 1024 * 1024
+        return (f"Memory plan: {self.task_count} task(s), {self.planned_total / mb:.1f} MB planned in total, "
+                f"peak {self.peak / mb:.1f} MB of {self.budget / mb:.1f} MB budget, "
+                f"{self.large_count} large image(s).")
@@ -0,0 +1,334 @@
+import io
+import os
+import json
+import stat
+import time
+import signal
+import socketserver
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from PIL import Image
+from image_processor import frame_image
+from profile_plan import compile_profile
+import constants
+
+
+class ServiceMetrics:
+    """
+    Request counters and a sliding window of latencies of the framing service.
+    """
+
+    def __init__(self, window=constants.SERVE_LATENCY_WINDOW):
+        self.start_time = time.perf_counter()
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, elapsed, bytes_in, bytes_out, error=False):
+        with self._lock:
+            self.in_flight -= 1
+            if error:
+                self.failed += 1
+                return
+            self.processed += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self._latencies.append(elapsed)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def to_dict(self):
+        """Return a machine-readable snapshot of the metrics."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            uptime = time.perf_counter() - self.start_time
+            return {
+                "uptime_s": round(uptime, 3),
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "in_flight": self.in_flight,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "images_per_s": round(self.processed / uptime, 3) if uptime > 0 else 0.0,
+                "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+                "latency_p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+                "latency_p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+            }
+
+
+def _percentile(ordered, percent):
+    # Nearest-rank percentile of a sorted list
+    if not ordered:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class FramingService:
+    """
+    Frames images posted over HTTP with a worker pool that stays warm between requests.
+
+    At most max_workers * constants.TASKS_IN_FLIGHT_PER_WORKER requests are processed or queued
+    for a worker at a time; a request that cannot get a slot within constants.SERVE_QUEUE_TIMEOUT
+    seconds is rejected with 503, so clients back off instead of piling up memory in the server.
+    The slot is taken before the request body is read, so waiting uploads are not held in memory.
+    """
+
+    def __init__(self, settings_manager, max_workers=constants.DEFAULT_MAX_WORKERS, backend="threads"):
+        self.settings_manager = settings_manager
+        self.max_workers = max_workers
+        self.backend = backend
+        self.metrics = ServiceMetrics()
+        self._slots = threading.BoundedSemaphore(max_workers * constants.TASKS_IN_FLIGHT_PER_WORKER)
+        self._plans = {}  # profile name -> (mtime_ns of the profile file, ProfilePlan)
+        pool_class = ProcessPoolExecutor if backend == "processes" else ThreadPoolExecutor
+        self.executor = pool_class(max_workers=max_workers)
+
+    def warm_up(self):
+        """Starts every worker and runs a small image through it, so the first requests are not slower."""
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64)).save(buffer, format="JPEG")
+        futures = [self.executor.submit(frame_image, buffer.getvalue(), border_size=4)
+                   for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    @contextmanager
+    def slot(self):
+        """
+        Waits for a worker slot for one request.
+
+        :return: A context manager yielding True while the slot is held, or False if no slot
+                 became free within constants.SERVE_QUEUE_TIMEOUT seconds.
+        """
+        if not self._slots.acquire(timeout=constants.SERVE_QUEUE_TIMEOUT):
+            self.metrics.reject()
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._slots.release()
+
+    def frame(self, data, plan):
+        """
+        Frames an image in a worker; the caller holds a slot().
+
+        :param data: The source image bytes.
+        :param plan: A ProfilePlan returned by load_plan().
+        :return: The encoded JPEG bytes.
+        """
+        self.metrics.started()
+        start_time = time.perf_counter()
+        try:
+            encoded = self.executor.submit(frame_image, data, plan).result()
+        except Exception:
+            self.metrics.finished(time.perf_counter() - start_time, len(data), 0, error=True)
+            raise
+        self.metrics.finished(time.perf_counter() - start_time, len(data), len(encoded))
+        return encoded
+
+    def load_plan(self, profile_name=None):
+        """
+        Returns the compiled plan of a profile, compiling it again only when its file changed.
+
+        :param profile_name: Profile name, the active profile by default.
+        :return: A ProfilePlan.
+        :raises LookupError: If the profile does not exist.
+        :raises ValueError: If the name is not a plain profile name or the profile is invalid.
+        """
+        profile_name = profile_name or self.settings_manager.user_settings.get(
+            "active_profile", constants.DEFAULT_PROFILE)
+        # The name comes from the request, it must not reach files outside the profiles directory
+        if profile_name in (".", "..") or any(separator in profile_name for separator in ("/", "\\")):
+            raise ValueError(f"Invalid profile name: {profile_name}")
+        try:
+            mtime_ns = os.stat(self.settings_manager.profile_path(profile_name)).st_mtime_ns
+        except (OSError, ValueError):
+            raise LookupError(f"Profile '{profile_name}' not found.") from None
+
+        cached = self._plans.get(profile_name)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        profile_settings = self.settings_manager.load_profile(profile_name)
+        if not profile_settings:
+            raise LookupError(f"Profile '{profile_name}' not found.")
+        plan = compile_profile(profile_settings)
+        self._plans[profile_name] = (mtime_ns, plan)
+        return plan
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class FramingRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /frame?profile=NAME with the image as the request body returns the framed JPEG.
+    GET /metrics returns the service metrics as JSON, GET /health returns 200 while serving.
+    """
+
+    server_version = f"{constants.APP_NAME}/{constants.VERSION}"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/metrics":
+            self._send_json(200, self.server.service.metrics.to_dict())
+        elif path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/frame":
+            self._send_json(404, {"error": f"Unknown path: {url.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send_json(411, {"error": "Content-Length is required."})
+            return
+        if length < 0:
+            self.close_connection = True  # A body of unknown length cannot be read
+            self._send_json(400, {"error": "Content-Length must not be negative."})
+            return
+        if length > constants.SERVE_MAX_REQUEST_MB * 1024 * 1024:
+            self.close_connection = True  # The body is not read
+            self._send_json(413, {"error": f"Images larger than {constants.SERVE_MAX_REQUEST_MB} MB are not accepted."})
+            return
+
+        # Errors before the body is read close the connection, the unread body cannot be skipped
+        service = self.server.service
+        try:
+            plan = service.load_plan(parse_qs(url.query).get("profile", [None])[0])
+        except LookupError as e:
+            self.close_connection = True
+            self._send_json(404, {"error": str(e)})
+            return
+        except ValueError as e:
+            self.close_connection = True
+            self._send_json(400, {"error": str(e)})  # An invalid profile name or profile values
+            return
+
+        with service.slot() as acquired:
+            if not acquired:
+                self.close_connection = True
+                self._send_json(503, {"error": "The service is busy, retry later."}, {"Retry-After": "1"})
+                return
+            data = self.rfile.read(length)
+            try:
+                encoded = service.frame(data, plan)
+            except (ValueError, OSError) as e:
+                error = (400, str(e))  # An unreadable image
+            except Exception as e:
+                error = (500, str(e))
+            else:
+                error = None
+
+        if error:
+            self._send_json(error[0], {"error": error[1]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def serve(service, host=constants.DEFAULT_SERVE_HOST, port=constants.DEFAULT_SERVE_PORT, socket_path=None,
+          quiet=False):
+    """
+    Serves the framing service until SIGINT or SIGTERM.
+
+    :param service: FramingService to serve.
+    :param host: Host to listen on, localhost by default.
+    :param port: TCP port to listen on.
+    :param socket_path: Listen on this Unix socket instead of TCP.
+    :param quiet: Do not log requests.
+    """
+    if socket_path:
+        if not _remove_socket(socket_path):  # A stale socket of a previous run
+            print(f"Error: '{socket_path}' exists and is not a socket.")
+            service.close()
+            return
+        httpd = ThreadingUnixHTTPServer(socket_path, FramingRequestHandler)
+        address = socket_path
+    else:
+        httpd = ThreadingHTTPServer((host, port), FramingRequestHandler)
+        address = f"http://{host}:{httpd.server_port}"
+    httpd.service = service
+    httpd.quiet = quiet
+
+    def handle_signal(signum, frame):
+        raise KeyboardInterrupt
+
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_signal)
+
+    print(f"Serving on {address} with {service.max_workers} {service.backend} worker(s). Press Ctrl+C to stop.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.close()
+        if socket_path:
+            _remove_socket(socket_path)
+    print("Server stopped.")
+
+
+def _remove_socket(socket_path):
+    # Removes a Unix socket; any other file at the path is left alone and reported with False
+    try:
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            return False
+        os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+    return True
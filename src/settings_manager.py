@@ -11,29 +11,46 @@ class SettingsManager:
         self.user_config_path = os.path.join(self.base_dir, constants.USER_CONFIG_FILENAME)
         self.profiles_dir = str(os.path.join(self.base_dir, constants.PROFILES_DIR_NAME))
 
-        # Ensure directories exist
-        os.makedirs(self.base_dir, exist_ok=True)
-        os.makedirs(self.profiles_dir, exist_ok=True)
-
-        # Initialize files
+        # Initialize files; when they already exist this only reads, so launches do not write to disk
         self._initialize_files()
 
-        # Load user settings and active profile
+        # Load user settings; the active profile is loaded on first use
         self.user_settings = self._load_json(self.user_config_path)
-        active_profile_name = self.user_settings.get("active_profile", constants.DEFAULT_PROFILE)
-        self.active_profile = self.load_profile(active_profile_name)
+        self._active_profile = None
+
+    @property
+    def active_profile(self):
+        """Settings of the active profile, loaded on first access."""
+        if self._active_profile is None:
+            active_profile_name = self.user_settings.get("active_profile", constants.DEFAULT_PROFILE)
+            self._active_profile = self.load_profile(active_profile_name)
+        return self._active_profile
 
     def list_profiles(self):
         """Return a list of available profiles."""
         return [os.path.splitext(p)[0] for p in os.listdir(self.profiles_dir) if p.endswith(".json")]
 
+    def profile_path(self, profile_name):
+        """Return the path of a profile file."""
+        return os.path.join(self.profiles_dir, f"{profile_name}.json")
+
     def load_profile(self, profile_name):
         """Public method to load a profile."""
-        profile_path = os.path.join(self.profiles_dir, f"{profile_name}.json")
+        profile_path = self.profile_path(profile_name)
         if os.path.exists(profile_path):
             return self._load_json(profile_path)
         return None
 
+    def expand_profile_names(self, names):
+        """Expand profile group names from user settings into the profile names they contain."""
+        groups = self.user_settings.get("profile_groups", {})
+        expanded = []
+        for name in names:
+            for profile_name in groups.get(name, [name]):
+                if profile_name not in expanded:
+                    expanded.append(profile_name)
+        return expanded
+
     def create_profile(self, profile_name, default_data=None):
         """Create a new profile with optional default data."""
         profile_path = os.path.join(self.profiles_dir, f"{profile_name}.json")
@@ -45,6 +62,12 @@ class SettingsManager:
             "border_size": constants.DEFAULT_BORDER_SIZE,
             "output_size": constants.DEFAULT_OUTPUT_SIZE,
             "min_border": constants.DEFAULT_MIN_BORDER,
+            "resample_preset": constants.DEFAULT_RESAMPLE_PRESET,
+            "quality": constants.DEFAULT_JPEG_QUALITY,
+            "subsampling": constants.DEFAULT_JPEG_SUBSAMPLING,
+            "progressive": constants.DEFAULT_JPEG_PROGRESSIVE,
+            "optimize": constants.DEFAULT_JPEG_OPTIMIZE,
+            "max_bytes": constants.DEFAULT_MAX_BYTES,
             "output_pattern": constants.DEFAULT_OUTPUT_PATTERN,
             "allow_overwrite": constants.DEFAULT_ALLOW_OVERWRITE,
         }
@@ -69,11 +92,14 @@ class SettingsManager:
                 raise ValueError(f"Profile '{profile_name}' does not exist.")
             self.user_settings["active_profile"] = profile_name
             self._save_json(self.user_config_path, self.user_settings)
-            self.active_profile = self.load_profile(profile_name)
+            self._active_profile = self.load_profile(profile_name)
 
     # Private methods remain unchanged (_load_json, _save_json, _initialize_files)
     def _initialize_files(self):
         """Initialize user settings and the default profile."""
+        if not os.path.isdir(self.profiles_dir):
+            os.makedirs(self.profiles_dir, exist_ok=True)
+
         if not os.path.exists(self.user_config_path):
             self._save_json(self.user_config_path, {
                 "active_profile": constants.DEFAULT_PROFILE,
@@ -89,6 +115,12 @@ class SettingsManager:
                 "border_size": constants.DEFAULT_BORDER_SIZE,
                 "output_size": constants.DEFAULT_OUTPUT_SIZE,
                 "min_border": constants.DEFAULT_MIN_BORDER,
+                "resample_preset": constants.DEFAULT_RESAMPLE_PRESET,
+                "quality": constants.DEFAULT_JPEG_QUALITY,
+                "subsampling": constants.DEFAULT_JPEG_SUBSAMPLING,
+                "progressive": constants.DEFAULT_JPEG_PROGRESSIVE,
+                "optimize": constants.DEFAULT_JPEG_OPTIMIZE,
+                "max_bytes": constants.DEFAULT_MAX_BYTES,
                 "overwrite": constants.DEFAULT_ALLOW_OVERWRITE,
                 "output_pattern": constants.DEFAULT_OUTPUT_PATTERN,
             })
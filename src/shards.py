@@ -0,0 +1,144 @@
+import json
+import time
+import socket
+import threading
+import hashlib
+
+
+def parse_shard(text):
+    """
+    Parses a shard specification.
+
+    :param text: "i/N", the i-th of N shards, 1 <= i <= N.
+    :return: A tuple (i, N).
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard: {text}. Use i/N, for example 1/4.") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard: {text}. The shard number must be between 1 and {count}.")
+    return index, count
+
+
+def in_shard(relative_path, shard):
+    """
+    Checks whether a file belongs to a shard.
+
+    The shard is chosen by a stable hash of the path relative to the input directory, so every
+    node assigns every file to the same shard regardless of where the share is mounted.
+
+    :param relative_path: Path relative to the input directory, with "/" separators.
+    :param shard: A tuple (i, N) returned by parse_shard().
+    :return: True if the file is processed by this shard.
+    """
+    index, count = shard
+    digest = hashlib.blake2b(relative_path.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count == index - 1
+
+
+class ShardReport:
+    """
+    A JSON Lines result manifest of one run: a "run" record, one "file" record per input
+    (status, seconds, outputs, error) and an "end" record written when the run finishes.
+    """
+
+    def __init__(self, path, shard=None, profile_names=()):
+        self._file = open(path, "w", encoding="utf-8")
+        # Skipped files are reported from the pipeline reader thread
+        self._lock = threading.Lock()
+        self._write({
+            "type": "run",
+            "shard": f"{shard[0]}/{shard[1]}" if shard else None,
+            "host": socket.gethostname(),
+            "started": time.time(),
+            "profiles": list(profile_names),
+        })
+
+    def add(self, path, status, output_paths=None, seconds=None, error=None):
+        """
+        Records the result of one file.
+
+        :param path: Path to the source image.
+        :param status: "processed", "failed" or "skipped".
+        :param output_paths: Paths of the saved results.
+        :param seconds: Processing time of the file.
+        :param error: Error message of a failed file.
+        """
+        record = {"type": "file", "path": path, "status": status}
+        if output_paths is not None:
+            record["outputs"] = output_paths
+        if seconds is not None:
+            record["seconds"] = round(seconds, 6)
+        if error is not None:
+            record["error"] = error
+        self._write(record)
+
+    def close(self):
+        """Marks the run as finished and closes the file."""
+        self._write({"type": "end", "finished": time.time()})
+        self._file.close()
+
+    def _write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+
+def merge_reports(report_paths):
+    """
+    Combines the reports of several shards and retry runs.
+
+    Runs are applied in the order they started, so a file that failed in a shard and was
+    processed by a later retry run counts as processed.
+
+    :param report_paths: Paths of reports written by ShardReport.
+    :return: A JSON-serializable summary with the failed files.
+    """
+    runs = []
+    for report_path in report_paths:
+        records = []
+        with open(report_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break  # The last line of a run that was killed while writing
+        if not records or records[0].get("type") != "run":
+            raise ValueError(f"'{report_path}' is not a shard report.")
+        run = records[0]
+        run.update(report=report_path, files=[r for r in records if r["type"] == "file"],
+                   complete=records[-1]["type"] == "end")
+        runs.append(run)
+    runs.sort(key=lambda run: run["started"])
+
+    results = {}
+    seconds = 0.0
+    for run in runs:
+        for record in run["files"]:
+            results[record["path"]] = record
+            seconds += record.get("seconds", 0.0)
+
+    # Shards of the same job that never reported
+    shard_counts = {int(run["shard"].split("/")[1]) for run in runs if run["shard"]}
+    seen_shards = {run["shard"] for run in runs if run["shard"]}
+    missing_shards = sorted(
+        f"{index}/{count}" for count in shard_counts for index in range(1, count + 1)
+        if f"{index}/{count}" not in seen_shards
+    )
+
+    statuses = [record["status"] for record in results.values()]
+    failures = [{"path": path, "error": record.get("error")}
+                for path, record in results.items() if record["status"] == "failed"]
+    return {
+        "runs": [{"report": run["report"], "shard": run["shard"], "host": run["host"],
+                  "files": len(run["files"]), "complete": run["complete"]} for run in runs],
+        "missing_shards": missing_shards,
+        "incomplete_runs": [run["report"] for run in runs if not run["complete"]],
+        "files": len(results),
+        "processed": statuses.count("processed"),
+        "skipped": statuses.count("skipped"),
+        "failed": len(failures),
+        "processing_seconds": round(seconds, 3),
+        "failures": failures,
+    }
@@ -0,0 +1,87 @@
+from functools import lru_cache
+from PIL import Image, ImageFile
+from normalize import canvas_color
+import constants
+
+
+def can_stream(img):
+    """
+    Checks whether an image can be decoded straight into a border canvas.
+
+    :param img: The source image (PIL.Image), opened but not loaded.
+    :return: True for baseline-decodable RGB and grayscale JPEG files, if this Pillow release
+             has the internal decoder API decode_into_frame() relies on.
+    """
+    return img.format == "JPEG" and img.mode in ("RGB", "L") and len(img.tile) == 1 and img.tile[0][0] == "jpeg" \
+        and hasattr(img, "decoderconfig") and hasattr(img, "decodermaxblock") and _has_decoder_api()
+
+
+@lru_cache(maxsize=None)
+def _has_decoder_api():
+    # Image._getdecoder() and the decoder methods are internal to Pillow and may change between releases
+    try:
+        decoder = Image._getdecoder("RGB", "jpeg", ("RGB", ""))
+    except Exception:
+        return False
+    try:
+        return all(callable(getattr(decoder, name, None)) for name in ("setimage", "decode", "cleanup"))
+    finally:
+        if callable(getattr(decoder, "cleanup", None)):
+            decoder.cleanup()
+
+
+def should_stream(img, streaming=None):
+    """
+    Decides whether a border_size variant is framed by streaming.
+
+    :param img: The source image (PIL.Image), opened but not loaded.
+    :param streaming: The profile setting: True or False, or None to stream images of at least
+                      constants.STREAMING_MIN_MEGAPIXELS.
+    :return: True if the image should be decoded straight into its border canvas.
+    """
+    if streaming is None:
+        streaming = img.width * img.height >= constants.STREAMING_MIN_MEGAPIXELS * 1_000_000
+    return bool(streaming) and can_stream(img)
+
+
+def decode_into_frame(img, borders, border_color):
+    """
+    Decodes a JPEG directly into the photo area of a new border canvas.
+
+    libjpeg writes the decoded scanlines into the canvas as they are read, in blocks of
+    img.decodermaxblock bytes of input, so the full-size photo is never held next to the
+    framed copy and peak memory is one framed image instead of two.
+
+    :param img: The source image (PIL.Image), opened but not loaded; see can_stream().
+    :param borders: A tuple of borders (left, top, right, bottom).
+    :param border_color: The color of the border (RGB tuple).
+    :return: The framed image (PIL.Image).
+    """
+    left_border, top_border, right_border, bottom_border = borders
+    canvas = Image.new(img.mode, (img.width + left_border + right_border, img.height + top_border + bottom_border),
+                       canvas_color(img.mode, border_color))
+
+    decoder_name, _, offset, args = img.tile[0]
+    decoder = Image._getdecoder(img.mode, decoder_name, args, img.decoderconfig)
+    try:
+        decoder.setimage(canvas.im, (left_border, top_border, left_border + img.width, top_border + img.height))
+        img.fp.seek(offset)
+        pending = b""
+        ended = False
+        while True:
+            chunk = img.fp.read(img.decodermaxblock)
+            if not chunk:
+                if ended or not ImageFile.LOAD_TRUNCATED_IMAGES:
+                    raise OSError("image file is truncated")
+                chunk, ended = b"\xff\xd9", True  # Let libjpeg finish a file without an end marker
+            pending += chunk
+            consumed, error_code = decoder.decode(pending)
+            if consumed < 0:
+                break
+            pending = pending[consumed:]
+    finally:
+        decoder.cleanup()
+
+    if error_code < 0:
+        raise OSError(f"decoder error {error_code} when reading image file")
+    return canvas
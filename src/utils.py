@@ -1,7 +1,7 @@
 import os
 import platform
 from datetime import datetime
-from constants import APP_NAME, DEFAULT_OUTPUT_PATTERN
+from constants import APP_NAME, DEFAULT_OUTPUT_PATTERN, JPEG_EXTENSIONS
 
 def get_settings_directory():
     system = platform.system()
@@ -21,20 +21,25 @@ def generate_output_path(input_path, output_pattern=DEFAULT_OUTPUT_PATTERN, over
     :param output_pattern: Naming pattern for the output file.
                            Supports placeholders:
                            - {filename}: Original file name without extension.
-                           - {ext}: Original file extension.
+                           - {ext}: Original file extension; for sources in other formats the original
+                             extension followed by ".jpg", e.g. "png.jpg".
                            - {timestamp}: Current timestamp in YYYYMMDD_HHMMSS format.
-    :param overwrite: Whether to overwrite the input file.
+    :param overwrite: Whether to overwrite the input file; a source in another format is never
+                      replaced, its JPEG is written next to it as "<name>.<ext>.jpg".
     :return: The output file path.
     """
     dir_name, file_name = os.path.split(input_path)
     filename, ext = os.path.splitext(file_name)
     ext = ext.lstrip(".")  # Remove the dot for consistency
+    if ext.lower() not in JPEG_EXTENSIONS:
+        # The result is a JPEG, it must not get a .png or .tiff name, nor replace the source; the
+        # source extension stays in the name, so "x.png" never targets "x.jpg" or the output of "x.jpg"
+        ext = f"{ext}.jpg" if ext else "jpg"
+        input_path = os.path.join(dir_name, f"{filename}.{ext}")
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     formatted_name = output_pattern.format(filename=filename, ext=ext, timestamp=timestamp)
 
-    print(formatted_name)
-
     if overwrite:
         return input_path
     elif os.path.isabs(output_pattern):
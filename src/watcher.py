@@ -0,0 +1,210 @@
+import os
+import time
+import signal
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from cache import hash_profile
+from image_processor import process_image_variants, reserve_output_paths, release_output_paths
+from scanner import is_supported_file
+from output_files import directory_sync
+import constants
+
+# End markers of formats whose files can be recognized as written completely:
+# the JPEG end-of-image marker and the PNG IEND chunk with its CRC
+_END_MARKERS = (b"\xff\xd9", b"IEND\xaeB`\x82")
+
+
+class WatchedFolder:
+    """
+    A hot folder with the profiles its files are processed with.
+
+    Tracks files that are still being written: a file is ready once its size and mtime did not
+    change between two scans and it either ends with a JPEG or PNG end marker or has not changed
+    for constants.WATCH_SETTLE_SECONDS.
+    """
+
+    def __init__(self, path, profile_names, profiles, plans):
+        self.path = os.path.abspath(path)
+        self.profile_names = profile_names
+        self.profiles = profiles
+        self.plans = plans  # Compiled once, shared by every file of the folder
+        self.profile_hash = hash_profile(profiles)
+        self._candidates = {}  # path -> ((size, mtime_ns), time the signature was first seen)
+        self._finished = {}  # path -> (size, mtime_ns) of the file when it was handled
+
+    def scan(self, ignored, settle_seconds=constants.WATCH_SETTLE_SECONDS):
+        """
+        Scans the folder once.
+
+        :param ignored: Paths that must not be processed (outputs and files in flight).
+        :param settle_seconds: How long a file without the JPEG end marker must stay unchanged.
+        :return: A list of files ready to be processed.
+        """
+        now = time.monotonic()
+        ready = []
+        present = set()
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if not is_supported_file(entry.name) or entry.path in ignored:
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+
+                    present.add(entry.path)
+                    signature = (stat.st_size, stat.st_mtime_ns)
+                    if self._finished.get(entry.path) == signature:
+                        continue
+
+                    previous = self._candidates.get(entry.path)
+                    if previous is None or previous[0] != signature:
+                        self._candidates[entry.path] = (signature, now)
+                        continue
+
+                    if now - previous[1] >= settle_seconds or _has_end_marker(entry.path):
+                        del self._candidates[entry.path]
+                        ready.append(entry.path)
+        except OSError as e:
+            print(f"Error: Cannot read directory '{self.path}': {e}")
+
+        # Forget deleted files
+        for path in list(self._candidates):
+            if path not in present:
+                del self._candidates[path]
+        for path in list(self._finished):
+            if path not in present:
+                del self._finished[path]
+        return ready
+
+    def finish(self, path):
+        """Remembers the current state of a handled file, so it is only picked up again when it changes."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self._finished[path] = (stat.st_size, stat.st_mtime_ns)
+
+
+def _has_end_marker(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(-max(len(marker) for marker in _END_MARKERS), os.SEEK_END)
+            tail = f.read()
+    except OSError:
+        return False
+    return tail.endswith(_END_MARKERS)
+
+
+def watch_folders(folders, cache, max_workers=constants.DEFAULT_MAX_WORKERS, backend="threads",
+                  poll_interval=constants.WATCH_POLL_INTERVAL, stop_event=None):
+    """
+    Watches hot folders and processes new files with a worker pool that stays warm between files.
+
+    Files whose output is recorded in the cache are skipped, so after a restart only the files
+    that arrived or changed in the meantime are processed. The cache is saved periodically and
+    on shutdown; SIGINT and SIGTERM stop the scans and let the files in flight finish.
+
+    :param folders: List of WatchedFolder.
+    :param cache: ProcessingCache shared by all folders.
+    :param max_workers: Number of worker threads or processes.
+    :param backend: "threads" or "processes".
+    :param poll_interval: Seconds between scans.
+    :param stop_event: Optional threading.Event that stops the daemon, installed as the signal handler target.
+    """
+    stop_event = stop_event or threading.Event()
+    _install_signal_handlers(stop_event)
+
+    pool_class = ProcessPoolExecutor if backend == "processes" else ThreadPoolExecutor
+    max_in_flight = max_workers * constants.TASKS_IN_FLIGHT_PER_WORKER
+    outputs = cache.output_paths()
+    checking = {}  # future of the cache check -> (folder, path)
+    queued = deque()  # (folder, path) waiting for a free slot
+    pending = {}  # future -> (folder, path, reserved output paths)
+    processed_count = failed_count = 0
+    last_save = time.monotonic()
+
+    print(f"Watching {len(folders)} folder(s) with {max_workers} {backend} worker(s). Press Ctrl+C to stop.")
+    # Cache checks may hash a changed file, so they run on their own threads instead of this loop
+    with pool_class(max_workers=max_workers) as executor, \
+            ThreadPoolExecutor(max_workers=constants.CACHE_HASH_WORKERS, thread_name_prefix="watch-check") as checker:
+        try:
+            while not stop_event.is_set() or pending:
+                if not stop_event.is_set():
+                    in_flight = {path for _, path, _ in pending.values()} | {path for _, path in queued} | \
+                        {path for _, path in checking.values()}
+                    for folder in folders:
+                        for path in folder.scan(outputs | in_flight):
+                            checking[checker.submit(cache.is_up_to_date, path, folder.profile_hash)] = (folder, path)
+
+                # Finished checks are collected after a stop too, so waiting on them does not return at once
+                for future in [future for future in checking if future.done()]:
+                    folder, path = checking.pop(future)
+                    if stop_event.is_set():
+                        continue  # Not started; picked up again by the next run
+                    if future.exception() is None and future.result():
+                        folder.finish(path)  # Processed before a restart
+                    else:
+                        queued.append((folder, path))
+
+                if not stop_event.is_set():
+                    while queued and len(pending) < max_in_flight:
+                        folder, path = queued.popleft()
+                        # Names are reserved here, a process pool's workers do not see each other's names
+                        output_paths = reserve_output_paths(path, folder.plans)
+                        pending[executor.submit(process_image_variants, path, folder.plans,
+                                                output_paths=output_paths)] = (folder, path, output_paths)
+
+                if pending or checking:
+                    done, _ = wait(list(pending) + list(checking), timeout=poll_interval,
+                                   return_when=FIRST_COMPLETED)
+                else:
+                    done = ()
+                    stop_event.wait(poll_interval)
+
+                for future in done:
+                    if future not in pending:
+                        continue  # A finished cache check, queued on the next pass
+                    folder, path, output_paths = pending.pop(future)
+                    release_output_paths(output_paths)
+                    error = future.exception()
+                    if error is None:
+                        output_paths = future.result()
+                        outputs.update(os.path.abspath(output_path) for output_path in output_paths)
+                        cache.record(path, output_paths, folder.profile_hash)
+                        processed_count += 1
+                        print(f"Processed file: {path}")
+                    else:
+                        failed_count += 1
+                        print(f"Error processing file '{path}': {error}")
+                    folder.finish(path)
+
+                if time.monotonic() - last_save >= constants.WATCH_CACHE_SAVE_INTERVAL:
+                    directory_sync.flush()  # The outputs the manifest records are durable first
+                    cache.save()
+                    last_save = time.monotonic()
+        finally:
+            directory_sync.flush()
+            cache.save()
+
+    print(f"Watch stopped: {processed_count} file(s) processed, {failed_count} failed.")
+
+
+def _install_signal_handlers(stop_event):
+    # Signal handlers can only be installed from the main thread
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    def handle_signal(signum, frame):
+        if stop_event.is_set():
+            raise KeyboardInterrupt  # A second signal stops without waiting for files in flight
+        print("Stopping, waiting for files in flight...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_signal)
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The application modules live flat in src/ and import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture
+def settings_home(tmp_path, monkeypatch):
+    """Points the settings directory (cache manifest, logs, profiles) to a temporary home."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("APPDATA", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,59 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+from PIL import Image
+
+from archive import ArchiveSink
+from pipeline import run_pipeline
+
+
+def entries(path):
+    if str(path).endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+    with tarfile.open(path) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+
+@pytest.mark.parametrize("extension", [".zip", ".tar"])
+def test_entries_are_named_relative_to_the_root(tmp_path, extension):
+    path = tmp_path / f"results{extension}"
+    sink = ArchiveSink(str(path), str(tmp_path / "photos"))
+    assert sink.write(str(tmp_path / "photos" / "day1" / "a_processed.jpg"), b"a") == f"{path}/day1/a_processed.jpg"
+    sink.write(str(tmp_path / "elsewhere" / "b_processed.jpg"), b"b")
+    sink.close()
+    assert entries(path) == {"day1/a_processed.jpg": b"a", "b_processed.jpg": b"b"}
+
+
+def test_repeated_names_get_numbered_entries(tmp_path):
+    path = tmp_path / "results.zip"
+    sink = ArchiveSink(str(path), str(tmp_path))
+    for content in (b"1", b"2"):
+        sink.write(str(tmp_path / "a_processed.jpg"), content, str(tmp_path / "a.jpg"))
+    sink.close()
+    assert entries(path) == {"a_processed.jpg": b"1", "a_processed_1.jpg": b"2"}
+
+
+def test_unsupported_archive_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ArchiveSink(str(tmp_path / "results.7z"))
+
+
+def test_pipeline_writes_into_the_archive_only(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    paths = []
+    for i in range(3):
+        paths.append(str(photos / f"{i}.jpg"))
+        Image.new("RGB", (20, 10)).save(paths[-1], format="JPEG")
+
+    path = tmp_path / "results.tar"
+    sink = ArchiveSink(str(path), str(photos))
+    results = list(run_pipeline(paths, [{"border_size": 2}], max_workers=2, backend="threads", sink=sink))
+    sink.close()
+
+    assert all(error is None for _, _, error in results)
+    assert sorted(os.listdir(photos)) == ["0.jpg", "1.jpg", "2.jpg"]
+    assert sorted(entries(path)) == ["0_processed.jpg", "1_processed.jpg", "2_processed.jpg"]
@@ -0,0 +1,66 @@
+import io
+
+import pytest
+from PIL import Image
+
+import constants
+from autocolor import parse_auto_color, pick_border_color, sample_decoded, sample_unloaded
+from image_processor import frame_image
+
+
+def framed_photo(size=(1200, 800), edge=(20, 40, 200), center=(250, 250, 0)):
+    """A photo with a solid outer band around a differently colored center that covers most of it."""
+    img = Image.new("RGB", size, edge)
+    width, height = size
+    img.paste(center, (width // 8, height // 8, width - width // 8, height - height // 8))
+    return img
+
+
+def test_parse_auto_color():
+    assert parse_auto_color([255, 255, 255]) is None
+    assert parse_auto_color("auto") == constants.DEFAULT_AUTO_BORDER_COLOR_METHOD
+    assert parse_auto_color("auto:palette") == "palette"
+    for border_color in ("auto:median", "white"):
+        with pytest.raises(ValueError):
+            parse_auto_color(border_color)
+
+
+def test_sample_is_small_rgb():
+    sample = sample_decoded(Image.new("L", (6000, 4000), 128))
+    assert sample.mode == "RGB"
+    assert max(sample.size) == constants.AUTO_COLOR_SAMPLE_SIZE
+    assert sample.getpixel((10, 10)) == (128, 128, 128)
+
+
+def test_small_images_are_sampled_as_they_are():
+    assert sample_decoded(Image.new("RGB", (40, 30))).size == (40, 30)
+
+
+def test_unloaded_sample_leaves_the_file_position():
+    source = io.BytesIO()
+    framed_photo().save(source, format="JPEG")
+    source.seek(0)
+    with Image.open(source) as img:
+        position = img.fp.tell()
+        sample = sample_unloaded(img)
+        assert img.fp.tell() == position
+    assert max(sample.size) <= constants.AUTO_COLOR_SAMPLE_SIZE
+
+
+def close(color, expected, tolerance=8):
+    return all(abs(a - b) <= tolerance for a, b in zip(color, expected))
+
+
+def test_methods():
+    sample = sample_decoded(framed_photo())
+    assert close(pick_border_color(sample, "edge"), (20, 40, 200))
+    assert close(pick_border_color(sample, "palette"), (250, 250, 0))
+    red, green, blue = pick_border_color(sample, "average")
+    assert 20 < red < 250 and 40 < blue < 200
+
+
+def test_auto_border_matches_the_edge_of_the_photo():
+    source = io.BytesIO()
+    framed_photo().save(source, format="PNG")
+    result = Image.open(io.BytesIO(frame_image(source.getvalue(), border_size=20, border_color="auto")))
+    assert close(result.getpixel((5, 5)), (20, 40, 200))
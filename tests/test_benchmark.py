@@ -0,0 +1,45 @@
+import os
+
+import pytest
+from PIL import Image
+
+from benchmark import CORPUS_FORMATS, benchmark_profile, generate_corpus, parse_import_time, percentile, run_scenario
+
+
+def test_percentile():
+    assert percentile([], 95) == 0.0
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+
+
+def test_parse_import_time():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   _io",
+        "import time:       200 |        300 | io",
+        "import time:        50 |         50 | constants",
+    ])
+    assert parse_import_time(output) == (["_io", "io", "constants"], 350)
+
+
+@pytest.mark.parametrize("image_format", sorted(CORPUS_FORMATS))
+def test_corpus_is_deterministic_and_in_the_requested_format(tmp_path, image_format):
+    first = generate_corpus(str(tmp_path / "a"), 2, image_format)
+    second = generate_corpus(str(tmp_path / "b"), 2, image_format)
+    extension, _ = CORPUS_FORMATS[image_format]
+    for a, b in zip(first, second):
+        assert a["path"].endswith(extension)
+        with open(a["path"], "rb") as fa, open(b["path"], "rb") as fb:
+            assert fa.read() == fb.read()
+        with Image.open(a["path"]) as img:
+            assert img.size == (a["width"], a["height"])
+
+
+def test_scenario_processes_the_corpus(tmp_path):
+    corpus = generate_corpus(str(tmp_path / "corpus"), 2)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    result = run_scenario(corpus, benchmark_profile("output_size", str(output_dir)), 2, "threads")
+    assert (result["images"], result["failed"], result["executor"]) == (2, 0, "threads")
+    assert result["images_per_s"] > 0
+    assert len(os.listdir(output_dir)) == 2
@@ -0,0 +1,147 @@
+import os
+import time
+
+import pytest
+
+import constants
+from cache import ProcessingCache
+
+PROFILES = [{"border_size": "5%"}]
+
+
+@pytest.fixture
+def files(settings_home, tmp_path):
+    """An input file with its output, processed and recorded in a saved manifest."""
+    source = tmp_path / "photos" / "a.jpg"
+    source.parent.mkdir()
+    source.write_bytes(b"source content")
+    output = tmp_path / "photos" / "a_processed.jpg"
+
+    cache = ProcessingCache(PROFILES)
+    assert not cache.is_up_to_date(str(source))
+    output.write_bytes(b"framed")
+    cache.record(str(source), [str(output)])
+    cache.save()
+    return source, output
+
+
+def test_recorded_file_is_up_to_date(files):
+    source, _ = files
+    assert ProcessingCache(PROFILES).is_up_to_date(str(source))
+
+
+def test_other_profile_is_a_miss(files):
+    source, _ = files
+    assert not ProcessingCache([{"border_size": "10%"}]).is_up_to_date(str(source))
+
+
+def test_changed_content_is_a_miss(files):
+    source, _ = files
+    source.write_bytes(b"other content")
+    assert not ProcessingCache(PROFILES).is_up_to_date(str(source))
+
+
+def test_touched_identical_content_is_a_hit(files):
+    source, _ = files
+    os.utime(source, ns=(1, 1))
+    assert ProcessingCache(PROFILES).is_up_to_date(str(source))
+
+
+def test_changed_output_is_a_miss(files):
+    source, output = files
+    output.write_bytes(b"edited by hand")
+    assert not ProcessingCache(PROFILES).is_up_to_date(str(source))
+
+
+def test_missing_input_is_not_up_to_date(settings_home, tmp_path):
+    assert not ProcessingCache(PROFILES).is_up_to_date(str(tmp_path / "missing.jpg"))
+
+
+def test_unreadable_input_is_not_up_to_date(files, monkeypatch):
+    source, _ = files
+    os.utime(source, ns=(1, 1))  # Leaves the fast path, so the content is hashed
+
+    def hash_file(path):
+        raise PermissionError(13, "Permission denied", path)
+
+    monkeypatch.setattr("cache.hash_file", hash_file)
+    assert not ProcessingCache(PROFILES).is_up_to_date(str(source))
+
+
+def test_file_changed_while_processed_is_not_recorded(settings_home, tmp_path):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"before")
+    output = tmp_path / "a_processed.jpg"
+    output.write_bytes(b"framed")
+
+    cache = ProcessingCache(PROFILES)
+    assert not cache.is_up_to_date(str(source))
+    source.write_bytes(b"after, and longer")
+    cache.record(str(source), [str(output)])
+    cache.save()
+    assert str(source) not in ProcessingCache(PROFILES).entries
+
+
+def test_output_paths_exclude_inputs_overwritten_in_place(files, tmp_path):
+    source, output = files
+    other = tmp_path / "photos" / "b.jpg"
+    other.write_bytes(b"overwritten")
+    cache = ProcessingCache(PROFILES)
+    cache.record(str(other), [str(other)])
+    cache.save()
+    assert ProcessingCache(PROFILES).output_paths() == {str(output)}
+
+
+def test_gc_evicts_deleted_inputs_but_keeps_unreachable_ones(files, tmp_path):
+    source, _ = files
+    cache = ProcessingCache(PROFILES)
+    unreachable = os.path.join(str(tmp_path), "unmounted", "share", "b.jpg")
+    cache.entries[unreachable] = dict(cache.entries[str(source)])
+    cache._gc_position = 0
+    source.unlink()
+
+    assert cache.collect_garbage() == 1
+    assert list(cache.entries) == [unreachable]
+
+
+def test_gc_evicts_entries_not_seen_for_too_long(files):
+    source, _ = files
+    cache = ProcessingCache(PROFILES)
+    cache.entries[str(source)]["last_seen"] = time.time() - (constants.CACHE_MAX_AGE_DAYS + 1) * 24 * 60 * 60
+    assert cache.collect_garbage() == 1
+
+
+def test_gc_checks_a_bounded_slice_per_call(files, tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "CACHE_GC_BATCH", 2)
+    source, _ = files
+    cache = ProcessingCache(PROFILES)
+    entry = cache.entries.pop(str(source))
+    deleted = [str(tmp_path / "photos" / f"deleted{i}.jpg") for i in range(5)]
+    for key in deleted:
+        cache.entries[key] = dict(entry)
+
+    assert cache.collect_garbage() == 2
+    assert cache.collect_garbage() == 2
+    assert cache.collect_garbage() == 1
+    assert cache.entries == {}
+
+
+def test_gc_position_survives_a_save(files, tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "CACHE_GC_BATCH", 1)
+    source, _ = files
+    cache = ProcessingCache(PROFILES)
+    for i in range(3):
+        cache.entries[str(tmp_path / "unmounted" / f"{i}.jpg")] = dict(cache.entries[str(source)])
+    position = cache._gc_position
+    cache._changed = True
+    cache.save()
+    assert ProcessingCache(PROFILES)._gc_position == position + 1
+
+
+def test_unchanged_manifest_is_not_rewritten(files):
+    cache = ProcessingCache(PROFILES)
+    mtime_ns = os.stat(cache.manifest_path).st_mtime_ns
+    os.utime(cache.manifest_path, ns=(1, 1))
+    cache.save()
+    assert os.stat(cache.manifest_path).st_mtime_ns == 1
+    assert mtime_ns != 1
@@ -0,0 +1,64 @@
+import threading
+
+from PIL import Image, ImageChops
+
+from canvas_cache import BorderCanvasCache
+from image_processor import apply_border
+
+BORDERS = (3, 2, 3, 2)
+WHITE = (255, 255, 255)
+
+
+def test_framed_matches_apply_border():
+    cache = BorderCanvasCache()
+    for color in ((200, 10, 10), (10, 200, 10)):
+        img = Image.new("RGB", (20, 10), color)
+        with cache.framed(img, BORDERS, WHITE) as framed:
+            assert ImageChops.difference(framed, apply_border(img, BORDERS, WHITE)).getbbox() is None
+
+
+def test_canvas_is_reused_for_the_same_geometry():
+    cache = BorderCanvasCache()
+    img = Image.new("RGB", (20, 10))
+    with cache.framed(img, BORDERS, WHITE) as first:
+        pass
+    with cache.framed(img, BORDERS, WHITE) as second:
+        assert second is first
+    with cache.framed(img, BORDERS, (0, 0, 0)) as other_color:
+        assert other_color is not first
+
+
+def test_a_lent_canvas_is_not_shared():
+    cache = BorderCanvasCache()
+    img = Image.new("RGB", (20, 10))
+    with cache.framed(img, BORDERS, WHITE) as first:
+        with cache.framed(img, BORDERS, WHITE) as second:
+            assert second is not first
+
+
+def test_idle_canvases_are_bounded():
+    cache = BorderCanvasCache(max_canvases=2)
+    for width in range(10, 15):
+        with cache.framed(Image.new("RGB", (width, 10)), BORDERS, WHITE):
+            pass
+    assert cache._idle_count == 2
+    assert [key[0][0] for key in cache._pool] == [19, 20]  # The most recently used sizes
+
+
+def test_concurrent_threads_frame_their_own_images():
+    cache = BorderCanvasCache()
+    errors = []
+
+    def frame(color):
+        img = Image.new("RGB", (20, 10), color)
+        for _ in range(50):
+            with cache.framed(img, BORDERS, WHITE) as framed:
+                if framed.getpixel((10, 5)) != color:
+                    errors.append(color)
+
+    threads = [threading.Thread(target=frame, args=((value, 0, 0),)) for value in (10, 100, 200)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
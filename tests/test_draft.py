@@ -0,0 +1,42 @@
+import io
+
+import pytest
+from PIL import Image
+
+from image_processor import apply_shared_draft, prepare_variant, process_image_variants
+
+
+def jpeg(size=(4000, 3000)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (90, 60, 30)).save(buffer, format="JPEG")
+    buffer.seek(0)
+    return buffer
+
+
+def output_size(preset, size=(400, 400)):
+    return {"mode": "output_size", "output_size": list(size), "resample_preset": preset}
+
+
+@pytest.mark.parametrize("preset, decoded_width", [("quality", 4000), ("balanced", 1000), ("fast", 500)])
+def test_draft_decodes_at_a_reduced_scale_with_headroom(preset, decoded_width):
+    with Image.open(jpeg()) as img:
+        apply_shared_draft(img, [prepare_variant(img, output_size(preset))])
+        img.load()
+        assert img.width == decoded_width
+
+
+def test_draft_satisfies_the_largest_variant():
+    with Image.open(jpeg()) as img:
+        variants = [prepare_variant(img, output_size("fast")), prepare_variant(img, output_size("fast", (1200, 1200)))]
+        apply_shared_draft(img, variants)
+        img.load()
+        assert img.width == 2000
+
+
+def test_presets_give_the_same_output_size(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(jpeg().getvalue())
+    for preset in ("quality", "balanced", "fast"):
+        profile = dict(output_size(preset), output_pattern=f"{{filename}}_{preset}.{{ext}}")
+        [output_path] = process_image_variants(str(path), [profile])
+        assert Image.open(output_path).size == (400, 400)
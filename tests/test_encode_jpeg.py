@@ -0,0 +1,72 @@
+import io
+import random
+
+import pytest
+from PIL import Image
+
+import constants
+from image_processor import encode_jpeg
+
+OPTIONS = {"quality": 95, "subsampling": 0, "progressive": False, "optimize": False}
+
+
+@pytest.fixture
+def noise():
+    # Noise keeps the encoded size sensitive to the quality setting
+    rng = random.Random(1)
+    return Image.frombytes("RGB", (128, 128), bytes(rng.randrange(256) for _ in range(128 * 128 * 3)))
+
+
+@pytest.fixture
+def saves(monkeypatch):
+    """Counts the JPEG encodes and records their qualities."""
+    qualities = []
+    save = Image.Image.save
+
+    def counting_save(self, fp, format=None, **params):
+        qualities.append(params.get("quality"))
+        return save(self, fp, format, **params)
+
+    monkeypatch.setattr(Image.Image, "save", counting_save)
+    return qualities
+
+
+def encoded_size(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", **dict(OPTIONS, quality=quality))
+    return buffer.tell()
+
+
+def test_no_limit_encodes_once(noise, saves):
+    encode_jpeg(noise, io.BytesIO(), OPTIONS)
+    assert saves == [95]
+
+
+def test_fitting_result_is_encoded_once(noise, saves):
+    encode_jpeg(noise, io.BytesIO(), OPTIONS, max_bytes=10 ** 9)
+    assert saves == [95]
+
+
+def test_search_keeps_the_highest_quality_that_fits(noise, saves):
+    max_bytes = encoded_size(noise, 60)
+    saves.clear()
+
+    output = io.BytesIO()
+    encode_jpeg(noise, output, OPTIONS, max_bytes=max_bytes)
+    assert output.tell() <= max_bytes
+    assert len(saves) <= 1 + constants.MAX_BYTES_SEARCH_STEPS
+    assert all(constants.MIN_SEARCH_JPEG_QUALITY <= quality <= 95 for quality in saves)
+
+    fitting = [quality for quality in saves[1:] if encoded_size(noise, quality) <= max_bytes]
+    assert max(fitting) >= 60
+    assert output.tell() == encoded_size(noise, max(fitting))
+
+
+def test_unreachable_limit_writes_the_smallest_encoding(noise, saves):
+    encode_jpeg(noise, io.BytesIO(), OPTIONS, max_bytes=1)
+    assert len(saves) <= 1 + constants.MAX_BYTES_SEARCH_STEPS
+    assert min(saves) == constants.MIN_SEARCH_JPEG_QUALITY
+
+    output = io.BytesIO()
+    encode_jpeg(noise, output, OPTIONS, max_bytes=1)
+    assert output.tell() == encoded_size(noise, constants.MIN_SEARCH_JPEG_QUALITY)
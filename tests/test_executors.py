@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import constants
+import executors
+from executors import resolve_backend, run_batch
+
+BACKENDS = ["threads", "processes"]
+
+
+def echo(input_path, data=None, output_paths=None, **profile_settings):
+    """A task returning its arguments, module-level so worker processes can unpickle it."""
+    time.sleep(0.01)
+    return input_path, data, output_paths, profile_settings
+
+
+def fail(input_path, **profile_settings):
+    raise ValueError(f"cannot process {input_path}")
+
+
+def results(batch):
+    return {file: (result, error) for file, result, error in batch}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_submission_window_is_bounded(backend):
+    pulled = []
+
+    def files():
+        for i in range(50):
+            pulled.append(i)
+            yield f"{i}.jpg"
+
+    batch = run_batch(files(), {}, max_workers=2, backend=backend, task=echo)
+    next(batch)
+    assert len(pulled) == 2 * constants.TASKS_IN_FLIGHT_PER_WORKER
+    assert len(list(batch)) == 49
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_profile_settings_reach_the_task(backend):
+    done = results(run_batch(["a.jpg", "b.jpg"], {"border_size": "5%"}, max_workers=2, backend=backend, task=echo))
+    assert done["a.jpg"] == (("a.jpg", None, None, {"border_size": "5%"}), None)
+    assert set(done) == {"a.jpg", "b.jpg"}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_task_errors_are_yielded(backend):
+    done = results(run_batch(["a.jpg"], {}, max_workers=1, backend=backend, task=fail))
+    result, error = done["a.jpg"]
+    assert result is None
+    assert isinstance(error, ValueError)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_prefetched_read_errors_skip_the_task(backend):
+    error = FileNotFoundError(2, "No such file or directory", "b.jpg")
+    items = [("a.jpg", b"a"), ("b.jpg", error), ("c.jpg", b"c")]
+    done = results(run_batch(items, {}, max_workers=2, backend=backend, task=echo, prefetched=True))
+    assert done["b.jpg"] == (None, error)
+    assert done["a.jpg"] == (("a.jpg", b"a", None, {}), None)
+    assert done["c.jpg"] == (("c.jpg", b"c", None, {}), None)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_reserved_output_paths_reach_the_task(backend):
+    reserved = []
+
+    def reserve(file):
+        reserved.append(file)
+        return [file + ".out"]
+
+    done = results(run_batch(["a.jpg", "b.jpg"], {}, max_workers=2, backend=backend, task=echo, reserve=reserve))
+    assert sorted(reserved) == ["a.jpg", "b.jpg"]
+    assert done["a.jpg"] == (("a.jpg", None, ["a.jpg.out"], {}), None)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_reserved_output_paths_are_released_when_the_task_ends(backend):
+    released = []
+    batch = run_batch(["a.jpg", "b.jpg"], {}, max_workers=1, backend=backend, task=fail,
+                      reserve=lambda file: [file + ".out"], release=released.append)
+    assert len(list(batch)) == 2
+    assert sorted(released) == [["a.jpg.out"], ["b.jpg.out"]]
+
+
+def test_auto_uses_threads_for_a_single_file(monkeypatch):
+    monkeypatch.setattr(executors.os, "cpu_count", lambda: 8)
+    assert resolve_backend("auto", file_count=1) == "threads"
+    assert resolve_backend("auto", file_count=10) == "processes"
+    assert resolve_backend("auto") == "processes"
+
+
+def test_auto_uses_threads_on_one_core(monkeypatch):
+    monkeypatch.setattr(executors.os, "cpu_count", lambda: 1)
+    assert resolve_backend("auto", file_count=10) == "threads"
+
+
+def test_explicit_backends_are_kept():
+    assert resolve_backend("threads", file_count=100) == "threads"
+    assert resolve_backend("processes", file_count=1) == "processes"
+
+
+def test_invalid_backend_is_rejected():
+    with pytest.raises(ValueError, match="Invalid executor"):
+        resolve_backend("gpu")
+
+
+def test_worker_uses_the_task_and_profile_from_the_initializer(monkeypatch):
+    monkeypatch.setattr(executors, "_worker_task", None)
+    monkeypatch.setattr(executors, "_worker_profile_settings", None)
+    executors._init_worker(echo, {"mode": "output_size"})
+    assert executors._process_in_worker("a.jpg", {"data": b"a", "output_paths": ["a_out.jpg"]}) == (
+        "a.jpg", b"a", ["a_out.jpg"], {"mode": "output_size"})
+
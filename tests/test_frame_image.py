@@ -0,0 +1,86 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from image_processor import frame_image, frame_image_into
+from profile_plan import compile_profile
+
+PROFILE = {"border_size": 5, "border_color": [0, 0, 255]}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "a.jpg"
+    Image.new("RGB", (40, 30), (250, 0, 0)).save(path, format="JPEG")
+    return path
+
+
+class Stream(io.RawIOBase):
+    """A readable stream that cannot seek, like a socket or a pipe."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._data.readinto(buffer)
+
+
+def decoded(data):
+    img = Image.open(io.BytesIO(data))
+    assert img.format == "JPEG"
+    return img
+
+
+@pytest.mark.parametrize("kind", ["bytes", "bytearray", "memoryview", "file", "stream", "path"])
+def test_every_source_type_gives_the_same_result(source, kind):
+    data = source.read_bytes()
+    inputs = {
+        "bytes": lambda: data,
+        "bytearray": lambda: bytearray(data),
+        "memoryview": lambda: memoryview(data),
+        "file": lambda: open(source, "rb"),
+        "stream": lambda: Stream(data),
+        "path": lambda: str(source),
+    }
+    value = inputs[kind]()
+    try:
+        assert frame_image(value, **PROFILE) == frame_image(data, **PROFILE)
+    finally:
+        if hasattr(value, "close"):
+            value.close()
+
+
+def test_result_has_the_border(source):
+    img = decoded(frame_image(source.read_bytes(), **PROFILE))
+    _, (left, top, right, bottom) = compile_profile(PROFILE).geometry((40, 30))
+    assert img.size == (40 + left + right, 30 + top + bottom)
+    red, green, blue = img.getpixel((1, 1))
+    assert blue > 200 and red < 40
+
+
+def test_compiled_plan_takes_precedence(source):
+    plan = compile_profile({"mode": "output_size", "output_size": [64, 64]})
+    assert decoded(frame_image(source.read_bytes(), plan, border_size=100)).size == (64, 64)
+
+
+def test_writes_at_the_current_position_of_the_buffer(source):
+    output = io.BytesIO()
+    output.write(b"header")
+    written = frame_image_into(source.read_bytes(), output, **PROFILE)
+    assert written == output.tell() - len(b"header")
+    assert output.getvalue()[len(b"header"):] == frame_image(source.read_bytes(), **PROFILE)
+
+
+def test_nothing_is_written_to_disk(source, tmp_path):
+    frame_image(str(source), **PROFILE)
+    assert os.listdir(tmp_path) == ["a.jpg"]
+
+
+def test_invalid_image_raises(source):
+    with pytest.raises(OSError):
+        frame_image(b"not an image", **PROFILE)
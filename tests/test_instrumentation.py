@@ -0,0 +1,47 @@
+import json
+
+from PIL import Image
+
+import constants
+from instrumentation import FileMetrics, RunMetrics, instrumented_process_image_variants
+
+
+def file_metrics(path, **stages):
+    return {"path": path, "stages": stages, "bytes_read": 10, "bytes_written": 20}
+
+
+def test_stages_are_timed_as_laps():
+    metrics = FileMetrics("a.jpg")
+    metrics.mark("open")
+    metrics.mark("decode")
+    metrics.mark("decode")
+    assert list(metrics.stages) == ["open", "decode"]
+    assert all(seconds >= 0 for seconds in metrics.stages.values())
+
+
+def test_instrumented_run_records_every_stage(tmp_path):
+    path = tmp_path / "a.jpg"
+    Image.new("RGB", (40, 30)).save(path, format="JPEG")
+    output_paths, metrics = instrumented_process_image_variants(str(path), [{"border_size": 4}])
+    assert output_paths == [str(tmp_path / "a_processed.jpg")]
+    assert {"open", "decode", "border", "encode", "write"} <= set(metrics["stages"])
+    assert metrics["bytes_read"] == path.stat().st_size
+    assert metrics["bytes_written"] == (tmp_path / "a_processed.jpg").stat().st_size
+
+
+def test_run_metrics_aggregate_totals_histograms_and_slowest_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "METRICS_SLOWEST_FILES", 2)
+    run = RunMetrics()
+    for i, seconds in enumerate((0.0005, 0.003, 0.2, 9.0)):
+        run.add(file_metrics(f"{i}.jpg", decode=seconds))
+
+    summary = run.to_dict()
+    assert summary["files"] == 4
+    assert summary["bytes_read"] == 40
+    assert summary["stage_totals_s"]["decode"] == round(9.2035, 6)
+    histogram = summary["stage_histograms"]["decode"]
+    assert (histogram["<=1ms"], histogram["<=5ms"], histogram["<=200ms"], histogram[">5000ms"]) == (1, 1, 1, 1)
+    assert [entry["path"] for entry in summary["slowest_files"]] == ["3.jpg", "2.jpg"]
+
+    run.write(tmp_path / "metrics.json")
+    assert json.loads((tmp_path / "metrics.json").read_text()) == summary
@@ -0,0 +1,53 @@
+import io
+import json
+import logging
+
+import constants
+from logger import AppLogger, ProgressReporter
+
+
+def read_log(app_logger):
+    app_logger.stop()  # Writes the queued records
+    with open(app_logger.log_file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_as_json_with_their_fields(settings_home):
+    app_logger = AppLogger()
+    app_logger.record("File processed", path="a.jpg", status="processed", seconds=0.5)
+    entry = read_log(app_logger)[-1]
+    assert entry["message"] == "File processed"
+    assert entry["level"] == "INFO"
+    assert (entry["path"], entry["status"], entry["seconds"]) == ("a.jpg", "processed", 0.5)
+
+
+def test_exceptions_keep_their_traceback(settings_home):
+    app_logger = AppLogger()
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        app_logger.exception("Processing failed")
+    entry = read_log(app_logger)[-1]
+    assert entry["level"] == "ERROR"
+    assert "Traceback" in entry["exception"] and "ValueError: broken" in entry["exception"]
+
+
+def test_debug_records_follow_the_level(settings_home):
+    app_logger = AppLogger(level="INFO")
+    app_logger.record("File skipped", logging.DEBUG, path="a.jpg")
+    assert all(entry["message"] != "File skipped" for entry in read_log(app_logger))
+
+
+def test_progress_is_throttled_and_shows_the_eta(monkeypatch):
+    monkeypatch.setattr(constants, "PROGRESS_LOG_INTERVAL", 3600)
+    stream = io.StringIO()
+    progress = ProgressReporter(stream, total=4)
+    for _ in range(3):
+        progress.update()
+    assert stream.getvalue() == ""
+
+    progress.start_time -= 3600
+    progress.update(failed=True)
+    progress.finish()
+    assert stream.getvalue().startswith("4/4 file(s), 0 skipped, 1 failed")
+    assert "ETA 00:00" in stream.getvalue()
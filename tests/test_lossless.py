@@ -0,0 +1,82 @@
+import io
+import sys
+
+import pytest
+from PIL import Image
+
+import constants
+from lossless import add_lossless_border, get_mcu_size, round_up
+
+# Stands in for jpegtran: pastes the decoded photo into the canvas read from stdin
+FAKE_JPEGTRAN = f"""#!{sys.executable}
+import io, sys
+from PIL import Image
+args = sys.argv[1:]
+x, y = (int(value) for value in args[args.index("-drop") + 1].lstrip("+").split("+"))
+canvas = Image.open(io.BytesIO(sys.stdin.buffer.read()))
+canvas.load()
+canvas.paste(Image.open(args[-1]), (x, y))
+output = io.BytesIO()
+canvas.save(output, "JPEG", quality=100)
+sys.stdout.buffer.write(output.getvalue())
+"""
+
+
+@pytest.fixture
+def jpegtran(tmp_path, monkeypatch):
+    path = tmp_path / "jpegtran"
+    path.write_text(FAKE_JPEGTRAN)
+    path.chmod(0o755)
+    monkeypatch.setattr(constants, "JPEGTRAN_EXECUTABLE", str(path))
+
+
+def jpeg(mode="RGB", size=(100, 60), subsampling=2):
+    buffer = io.BytesIO()
+    options = {"subsampling": subsampling} if mode == "RGB" else {}
+    Image.new(mode, size, 128).save(buffer, format="JPEG", **options)
+    return buffer.getvalue()
+
+
+def test_mcu_size_follows_the_chroma_subsampling():
+    for subsampling, mcu in ((0, (8, 8)), (1, (16, 8)), (2, (16, 16))):
+        assert get_mcu_size(Image.open(io.BytesIO(jpeg(subsampling=subsampling)))) == mcu
+    assert get_mcu_size(Image.open(io.BytesIO(jpeg("L")))) == (8, 8)
+
+
+def test_round_up():
+    assert [round_up(value, 16) for value in (0, 1, 16, 17)] == [0, 16, 16, 32]
+
+
+@pytest.mark.parametrize("mode, size", [("RGB", (144, 96)), ("L", (120, 80))])
+def test_borders_are_rounded_up_to_whole_mcus(jpegtran, mode, size):
+    data = jpeg(mode)
+    img = Image.open(io.BytesIO(data))
+    result = Image.open(io.BytesIO(add_lossless_border(img, data, (5, 5, 5, 5), (255, 255, 255))))
+    assert result.size == size
+    assert result.mode == mode
+
+
+def test_path_sources_are_passed_to_jpegtran(jpegtran, tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(jpeg())
+    with Image.open(path) as img:
+        result = add_lossless_border(img, str(path), (16, 16, 16, 16), (0, 0, 0))
+    assert Image.open(io.BytesIO(result)).size == (144, 96)
+
+
+def test_other_inputs_are_rejected(jpegtran):
+    png = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(png, format="PNG")
+    with pytest.raises(ValueError):
+        add_lossless_border(Image.open(png), png.getvalue(), (8, 8, 8, 8), (0, 0, 0))
+    cmyk = io.BytesIO()
+    Image.new("CMYK", (16, 16)).save(cmyk, format="JPEG")
+    with pytest.raises(ValueError):
+        add_lossless_border(Image.open(cmyk), cmyk.getvalue(), (8, 8, 8, 8), (0, 0, 0))
+
+
+def test_missing_jpegtran_is_reported(monkeypatch):
+    monkeypatch.setattr(constants, "JPEGTRAN_EXECUTABLE", "no-such-jpegtran")
+    data = jpeg()
+    with pytest.raises(RuntimeError, match="not found"):
+        add_lossless_border(Image.open(io.BytesIO(data)), data, (8, 8, 8, 8), (0, 0, 0))
@@ -0,0 +1,12 @@
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def test_cli_startup_imports_neither_logging_nor_pillow():
+    # A fresh interpreter; the test process has both loaded already
+    code = "import sys, main; print(sorted({'logging', 'PIL'} & {name.split('.')[0] for name in sys.modules}))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
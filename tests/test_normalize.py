@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from PIL import Image
+
+from image_processor import frame_image
+from normalize import canvas_color, canvas_mode, normalize_mode
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("RGB", "RGB"), ("L", "L"), ("RGBA", "RGBA"), ("LA", "LA"), ("P", "RGB"), ("1", "L"),
+    ("I;16", "L"), ("CMYK", "RGB"), ("YCbCr", "RGB"),
+])
+def test_modes_are_normalized(mode, expected):
+    assert normalize_mode(Image.new(mode, (4, 4))).mode == expected
+
+
+def test_transparent_palette_keeps_its_alpha():
+    img = Image.new("P", (4, 4))
+    img.info["transparency"] = 0
+    assert normalize_mode(img).mode == "RGBA"
+
+
+def test_16_bit_grayscale_is_scaled_not_clipped():
+    img = Image.new("I;16", (1, 1), 0x8000)
+    assert normalize_mode(img).getpixel((0, 0)) == 0x80
+
+
+def test_canvas_of_grayscale_images_is_grayscale():
+    assert canvas_mode("LA") == "L"
+    assert canvas_color("L", (255, 255, 255)) == 255
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "WEBP", "TIFF", "BMP"])
+def test_other_formats_are_framed_into_jpeg(fmt):
+    source = io.BytesIO()
+    Image.new("RGB", (40, 20), (200, 0, 0)).save(source, format=fmt)
+    result = Image.open(io.BytesIO(frame_image(source.getvalue(), border_size="10%")))
+    assert result.format == "JPEG"
+    assert result.size == (48, 28)
+
+
+def test_alpha_is_flattened_onto_the_border_color():
+    source = io.BytesIO()
+    Image.new("RGBA", (20, 20), (0, 0, 0, 0)).save(source, format="PNG")
+    result = Image.open(io.BytesIO(frame_image(source.getvalue(), border_size="10%", border_color=[0, 0, 255])))
+    assert result.mode == "RGB"
+    red, green, blue = result.getpixel((12, 12))
+    assert blue > 200 and red < 40 and green < 40
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+import constants
+import image_processor
+from image_processor import write_output
+from output_files import OutputNames, write_atomic
+
+
+def test_reserve_keeps_the_name_of_the_same_source():
+    names = OutputNames()
+    assert names.reserve("out/a.jpg", "in/a.jpg") == "out/a.jpg"
+    assert names.reserve("out/a.jpg", "in/a.jpg") == "out/a.jpg"
+
+
+def test_reserve_numbers_names_of_other_sources():
+    names = OutputNames()
+    assert names.reserve("out/a.jpg", "x/a.jpg") == "out/a.jpg"
+    assert names.reserve("out/a.jpg", "y/a.jpg") == "out/a_1.jpg"
+    assert names.reserve("out/a.jpg", "z/a.jpg") == "out/a_2.jpg"
+    assert names.reserve("out/a.jpg", "y/a.jpg") == "out/a_1.jpg"
+
+
+def test_reserve_without_source_always_gets_a_new_name():
+    names = OutputNames()
+    assert names.reserve("a.jpg") == "a.jpg"
+    assert names.reserve("a.jpg") == "a_1.jpg"
+
+
+
+def test_released_names_stay_taken_by_their_source():
+    names = OutputNames()
+    names.release(names.reserve("out/a.jpg", "x/a.jpg"))
+    assert names.reserve("out/a.jpg", "y/a.jpg") == "out/a_1.jpg"
+    assert names.reserve("out/a.jpg", "x/a.jpg") == "out/a.jpg"
+
+
+def test_released_names_are_forgotten_after_the_recent_window():
+    names = OutputNames(recent=2)
+    for i in range(5):
+        names.release(names.reserve(f"out/{i}.jpg", f"in/{i}.jpg"))
+    assert len(names._owners) == 0
+    assert list(names._released) == ["out/3.jpg", "out/4.jpg"]
+    assert names.reserve("out/0.jpg", "other/0.jpg") == "out/0.jpg"
+
+
+def test_name_reserved_twice_by_a_source_is_held_until_both_are_released():
+    names = OutputNames()
+    names.reserve("out/a.jpg", "x/a.jpg")
+    names.reserve("out/a.jpg", "x/a.jpg")
+    names.release("out/a.jpg")
+    assert "out/a.jpg" in names._owners
+    names.release("out/a.jpg")
+    assert "out/a.jpg" not in names._owners
+
+
+def test_default_window_size():
+    assert OutputNames()._recent == constants.OUTPUT_NAMES_RECENT
+
+
+def test_write_atomic_replaces_the_file_and_leaves_no_temporary_file(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"old")
+    write_atomic(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["a.jpg"]
+
+
+def test_write_output_releases_the_name_after_writing(tmp_path, monkeypatch):
+    names = OutputNames()
+    monkeypatch.setattr(image_processor, "output_names", names)
+    path = str(tmp_path / "a.jpg")
+    assert write_output(path, b"framed", "in/a.jpg") == path
+    assert names._owners == {}
+    assert write_output(path, b"framed", "other/a.jpg") == str(tmp_path / "a_1.jpg")
+
+
+def test_write_output_releases_the_name_when_the_write_fails(tmp_path, monkeypatch):
+    names = OutputNames()
+    monkeypatch.setattr(image_processor, "output_names", names)
+    with pytest.raises(OSError):
+        write_output(str(tmp_path / "missing" / "a.jpg"), b"framed", "in/a.jpg")
+    assert names._owners == {}
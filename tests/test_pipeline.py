@@ -0,0 +1,94 @@
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from pipeline import OutputWriter, prefetch_files, run_pipeline
+
+PROFILES = [{"border_size": 4}, {"mode": "output_size", "output_size": [50, 50],
+                                 "output_pattern": "{filename}_square.{ext}"}]
+
+
+def jpeg_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"{i}.jpg"
+        Image.new("RGB", (40, 30), (i * 20, 0, 0)).save(path, format="JPEG")
+        paths.append(str(path))
+    return paths
+
+
+def test_prefetch_reads_files_in_order(tmp_path):
+    paths = jpeg_files(tmp_path, 3)
+    items = list(prefetch_files(paths))
+    assert [file for file, _ in items] == paths
+    with open(paths[0], "rb") as f:
+        assert items[0][1] == f.read()
+
+
+def test_prefetch_reports_unreadable_files_as_their_error(tmp_path):
+    file, content = next(prefetch_files([str(tmp_path / "missing.jpg")]))
+    assert isinstance(content, FileNotFoundError)
+
+
+def test_prefetch_reads_at_most_depth_files_ahead(tmp_path):
+    paths = jpeg_files(tmp_path, 1) * 20
+    pulled = []
+
+    def files():
+        for path in paths:
+            pulled.append(path)
+            yield path
+
+    items = prefetch_files(files(), depth=2)
+    next(items)
+    time.sleep(0.2)
+    assert len(pulled) <= 4  # One handed over, two queued, one waiting for room
+    items.close()
+
+
+def test_prefetch_raises_errors_of_the_file_iterable(tmp_path):
+    paths = jpeg_files(tmp_path, 1)
+
+    def files():
+        yield paths[0]
+        raise PermissionError("cannot list the folder")
+
+    items = prefetch_files(files())
+    assert next(items)[0] == paths[0]
+    with pytest.raises(PermissionError):
+        next(items)
+
+
+def test_writer_reports_write_errors(tmp_path):
+    def write(output_path, encoded, source):
+        raise OSError("disk full")
+
+    writer = OutputWriter(write=write)
+    writer.submit("a.jpg", [("a_processed.jpg", b"framed")])
+    writer.close()
+    [(file, output_paths, _, error)] = writer.completed()
+    assert (file, output_paths, str(error)) == ("a.jpg", None, "disk full")
+
+
+@pytest.mark.parametrize("backend", ["threads", "processes"])
+def test_pipeline_writes_every_variant(tmp_path, backend):
+    paths = jpeg_files(tmp_path, 6)
+    results = list(run_pipeline(paths + [str(tmp_path / "missing.jpg")], PROFILES, max_workers=2, backend=backend))
+    assert len(results) == 7
+    failed = [file for file, _, error in results if error is not None]
+    assert failed == [str(tmp_path / "missing.jpg")]
+    for file, output_paths, error in results:
+        if error is None:
+            base = os.path.splitext(file)[0]
+            assert output_paths == [base + "_processed.jpg", base + "_square.jpg"]
+            assert Image.open(output_paths[1]).size == (50, 50)
+
+
+def test_instrumented_pipeline_records_the_write_stage(tmp_path):
+    paths = jpeg_files(tmp_path, 2)
+    for file, (output_paths, file_metrics), error in run_pipeline(paths, PROFILES, max_workers=1,
+                                                                  backend="threads", instrument=True):
+        assert error is None
+        assert "write" in file_metrics["stages"]
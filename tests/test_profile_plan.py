@@ -0,0 +1,114 @@
+import io
+import pickle
+
+import pytest
+from PIL import Image
+
+import constants
+from profile_plan import ProfilePlan, compile_profile, parse_border_size
+from scheduler import estimate_memory_cost
+
+
+def test_defaults():
+    plan = compile_profile({"border_size": "5%"})
+    assert plan.mode == constants.DEFAULT_MODE
+    assert plan.border_color == constants.DEFAULT_BORDER_COLOR
+    assert plan.auto_color is None
+    assert dict(plan.encode_options)["quality"] == constants.DEFAULT_JPEG_QUALITY
+    assert plan.max_bytes == constants.DEFAULT_MAX_BYTES
+
+
+def test_compiled_plan_is_returned_as_is():
+    plan = compile_profile({"border_size": 10})
+    assert compile_profile(plan) is plan
+
+
+@pytest.mark.parametrize("profile", [
+    {"mode": "frame", "border_size": 10},
+    {"mode": "border_size"},
+    {"border_size": "10px"},
+    {"border_size": "1,2,3"},
+    {"border_size": 10, "border_color": [255, 255]},
+    {"border_size": 10, "border_color": [0, 0, 256]},
+    {"border_size": 10, "border_color": "auto:median"},
+    {"border_size": 10, "quality": 0},
+    {"border_size": 10, "quality": "high"},
+    {"border_size": 10, "quality": None},
+    {"border_size": 10, "quality": True},
+    {"border_size": 10, "subsampling": 3},
+    {"border_size": 10, "max_bytes": -1},
+    {"mode": "output_size", "output_size": [1080]},
+    {"mode": "output_size", "output_size": [0, 1080]},
+    {"mode": "output_size", "output_size": "1080"},
+    {"mode": "output_size", "output_size": True},
+    {"mode": "output_size", "output_size": 1080, "min_border": -1},
+    {"mode": "output_size", "output_size": 1080, "min_border": "10"},
+    {"mode": "output_size", "output_size": 1080, "resample_preset": "fastest"},
+])
+def test_invalid_profiles_raise_value_error(profile):
+    with pytest.raises(ValueError):
+        compile_profile(profile)
+
+
+def test_int_output_size_is_a_square():
+    plan = compile_profile({"mode": "output_size", "output_size": 500})
+    assert plan.output_size == (500, 500)
+    assert plan.geometry((400, 300)) == ((500, 376), (0, 62, 0, 62))
+
+
+def test_int_output_size_is_estimated_as_a_square():
+    source = io.BytesIO()
+    Image.new("RGB", (400, 300)).save(source, format="JPEG")
+    costs = []
+    for output_size in (500, [500, 500]):
+        source.seek(0)
+        costs.append(estimate_memory_cost(source, {"mode": "output_size", "output_size": output_size}))
+    assert costs[0] == costs[1]
+
+
+def test_output_size_geometry_centers_the_photo():
+    plan = compile_profile({"mode": "output_size", "output_size": [1080, 1080], "min_border": 40})
+    new_size, borders = plan.geometry((4000, 3000))
+    assert new_size == (1000, 750)
+    left, top, right, bottom = borders
+    assert (left + new_size[0] + right, top + new_size[1] + bottom) == (1080, 1080)
+    assert left >= 40 and top >= 40
+
+
+@pytest.mark.parametrize("border_size, borders", [
+    ("10", (10, 10, 10, 10)),
+    ("5%", (20, 20, 20, 20)),
+    ("10,5%", (10, 10, 10, 10)),
+    ([1, 2, 3, 4], (2, 2, 4, 4)),
+])
+def test_border_size_geometry(border_size, borders):
+    plan = compile_profile({"border_size": border_size})
+    assert plan.geometry((400, 200)) == (None, borders)
+
+
+def test_geometry_is_memoized_and_bounded(monkeypatch):
+    monkeypatch.setattr(constants, "PROFILE_GEOMETRY_CACHE_SIZE", 2)
+    plan = compile_profile({"border_size": "5%"})
+    first = plan.geometry((400, 200))
+    assert plan.geometry((400, 200)) is first
+    plan.geometry((500, 200))
+    plan.geometry((600, 200))
+    assert len(plan._geometry) <= 2
+
+
+def test_plan_is_immutable():
+    plan = compile_profile({"border_size": 10})
+    with pytest.raises(AttributeError):
+        plan.mode = "output_size"
+    with pytest.raises(AttributeError):
+        del plan.mode
+
+
+def test_plan_pickles_without_its_geometry():
+    plan = compile_profile({"border_size": "5%", "border_color": "auto"})
+    plan.geometry((400, 200))
+    restored = pickle.loads(pickle.dumps(plan))
+    assert isinstance(restored, ProfilePlan)
+    assert restored._geometry == {}
+    assert restored.auto_color == plan.auto_color
+    assert restored.border_size == parse_border_size("5%")
@@ -0,0 +1,76 @@
+import os
+
+from scanner import iter_input_files
+
+PATTERNS = [("{filename}_processed.{ext}", False)]
+
+
+def touch(directory, *names):
+    for name in names:
+        (directory / name).write_bytes(b"")
+
+
+def names(files):
+    return sorted(os.path.basename(path) for path in files)
+
+
+def test_walk_yields_supported_files(tmp_path):
+    touch(tmp_path, "a.jpg", "b.JPEG", "c.png", "notes.txt")
+    (tmp_path / "nested").mkdir()
+    touch(tmp_path / "nested", "d.jpg")
+    assert names(iter_input_files([str(tmp_path)])) == ["a.jpg", "b.JPEG", "c.png"]
+
+
+def test_recursive_walk_descends_into_subdirectories(tmp_path):
+    touch(tmp_path, "a.jpg")
+    (tmp_path / "nested" / "deeper").mkdir(parents=True)
+    touch(tmp_path / "nested" / "deeper", "d.jpg")
+    assert names(iter_input_files([str(tmp_path)], recursive=True)) == ["a.jpg", "d.jpg"]
+
+
+def test_include_and_exclude_match_names_and_relative_paths(tmp_path):
+    touch(tmp_path, "a.jpg", "b.jpg")
+    (tmp_path / "raw").mkdir()
+    touch(tmp_path / "raw", "c.jpg")
+    files = iter_input_files([str(tmp_path)], recursive=True, include=["*.jpg"], exclude=["b.jpg", "raw"])
+    assert names(files) == ["a.jpg"]
+
+
+def test_files_are_yielded_before_the_walk_finishes(tmp_path):
+    touch(tmp_path, "a.jpg")
+    (tmp_path / "nested").mkdir()
+    touch(tmp_path / "nested", "b.jpg")
+    files = iter_input_files([str(tmp_path)], recursive=True)
+    assert os.path.basename(next(files)) == "a.jpg"
+    # Outputs written while the batch runs are not picked up from an already listed directory
+    touch(tmp_path, "a_processed.jpg")
+    assert names(files) == ["b.jpg"]
+
+
+def test_missing_inputs_are_skipped(tmp_path, capsys):
+    touch(tmp_path, "a.jpg")
+    files = iter_input_files([str(tmp_path / "missing"), str(tmp_path / "a.jpg")])
+    assert names(files) == ["a.jpg"]
+    assert "does not exist" in capsys.readouterr().out
+
+
+def test_outputs_of_sibling_files_are_skipped(tmp_path):
+    touch(tmp_path, "a.jpg", "a_processed.jpg", "a_processed_processed.jpg", "b.png", "b_processed.png.jpg",
+          "c_processed.jpg", "notes.txt")
+    files = iter_input_files([str(tmp_path)], output_patterns=PATTERNS)
+    assert names(files) == ["a.jpg", "b.png", "c_processed.jpg"]
+
+
+def test_overwrite_profiles_do_not_skip_the_inputs(tmp_path):
+    touch(tmp_path, "a.jpg", "b.png", "b.png.jpg")
+    files = iter_input_files([str(tmp_path)], output_patterns=[("{filename}.{ext}", True)])
+    assert names(files) == ["a.jpg", "b.png"]
+
+
+def test_direct_files_shard_by_working_directory_path(tmp_path, monkeypatch):
+    touch(tmp_path, *(f"{i}.jpg" for i in range(20)))
+    monkeypatch.chdir(tmp_path)
+    relative = [list(iter_input_files([f"{i}.jpg" for i in range(20)], shard=(index, 3))) for index in (1, 2, 3)]
+    absolute = [list(iter_input_files([str(tmp_path / f"{i}.jpg") for i in range(20)], shard=(index, 3)))
+                for index in (1, 2, 3)]
+    assert [[os.path.basename(path) for path in shard] for shard in absolute] == relative
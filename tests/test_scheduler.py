@@ -0,0 +1,78 @@
+from PIL import Image
+
+from executors import run_batch
+from scheduler import MemoryBudgetScheduler, _draft_scale, estimate_memory_cost
+
+MB = 1024 * 1024
+
+
+def jpeg_file(tmp_path, name="a.jpg", size=(400, 300)):
+    path = tmp_path / name
+    Image.new("RGB", size).save(path, format="JPEG")
+    return str(path)
+
+
+def test_border_size_cost_counts_the_source_and_the_framed_image(tmp_path):
+    path = jpeg_file(tmp_path)
+    cost = estimate_memory_cost(path, {"border_size": 10, "streaming": False})
+    assert cost == (400 * 300 + 420 * 320) * 4
+
+
+def test_lossless_and_streamed_images_hold_only_the_canvas(tmp_path):
+    path = jpeg_file(tmp_path)
+    assert estimate_memory_cost(path, {"mode": "lossless_border", "border_size": 10}) == 420 * 320 * 4
+    assert estimate_memory_cost(path, {"border_size": 10, "streaming": True}) == 420 * 320 * 4
+
+
+def test_reduced_scale_decoding_lowers_the_cost(tmp_path):
+    path = jpeg_file(tmp_path, size=(4000, 3000))
+    profile = {"mode": "output_size", "output_size": [400, 400]}
+    full = estimate_memory_cost(path, dict(profile, resample_preset="quality"))
+    draft = estimate_memory_cost(path, dict(profile, resample_preset="fast"))
+    assert draft < full / 4
+
+
+def test_draft_scale():
+    assert _draft_scale((4000, 3000), (400, 300)) == 8
+    assert _draft_scale((4000, 3000), (1000, 750)) == 4
+    assert _draft_scale((4000, 3000), (4000, 3000)) == 1
+
+
+def test_estimate_reads_prefetched_content_and_survives_unreadable_files(tmp_path):
+    path = jpeg_file(tmp_path)
+    scheduler = MemoryBudgetScheduler(100 * MB, [{"border_size": 10}, {"border_size": 20}])
+    with open(path, "rb") as f:
+        data = f.read()
+    assert scheduler.estimate(path, data) == scheduler.estimate(path) > 0
+    assert scheduler.estimate(str(tmp_path / "missing.jpg")) == 0
+
+
+def test_admission_rules():
+    scheduler = MemoryBudgetScheduler(100, [])
+    assert scheduler.can_admit(500)  # Nothing runs, even an image over the budget is admitted
+    scheduler.admit(60)
+    assert scheduler.large_in_flight
+    assert not scheduler.can_admit(55)  # A second large image waits for the first
+    assert scheduler.can_admit(40)
+    assert not scheduler.can_admit(45)
+    scheduler.release(60)
+    assert not scheduler.large_in_flight
+    assert scheduler.in_use == 0
+    assert scheduler.peak == 60
+
+
+def record_peak(input_path, scheduler=None, **profile_settings):
+    return scheduler.in_use
+
+
+def test_batch_stays_within_the_budget(tmp_path):
+    files = [jpeg_file(tmp_path, f"{i}.jpg") for i in range(12)]
+    profiles = [{"border_size": 10, "streaming": False}]
+    cost = estimate_memory_cost(files[0], profiles[0])
+    scheduler = MemoryBudgetScheduler(int(cost * 2.5), profiles)
+    results = list(run_batch(files, {"scheduler": scheduler}, max_workers=4, backend="threads",
+                             scheduler=scheduler, task=record_peak))
+    assert len(results) == 12
+    assert scheduler.peak <= scheduler.budget
+    assert max(result for _, result, _ in results) <= 2 * cost
+    assert scheduler.in_use == 0
@@ -0,0 +1,136 @@
+import http.client
+import io
+import json
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import constants
+from server import FramingRequestHandler, FramingService, _remove_socket
+from settings_manager import SettingsManager
+
+
+@pytest.fixture
+def service(settings_home):
+    service = FramingService(SettingsManager(), max_workers=1)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FramingRequestHandler)
+    httpd.service = service
+    httpd.quiet = True
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    service.port = httpd.server_port
+    yield service
+    httpd.shutdown()
+    httpd.server_close()
+    service.close()
+
+
+def jpeg(size=(80, 60)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (10, 20, 30)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def request(service, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+    try:
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def raw_request(service, head):
+    # http.client does not send a negative Content-Length
+    with socket.create_connection(("127.0.0.1", service.port), timeout=5) as connection:
+        connection.sendall(head.encode("ascii"))
+        return connection.recv(65536).split(b" ", 2)[1]
+
+
+def test_frame_with_the_active_profile(service):
+    status, body = request(service, "POST", "/frame", jpeg())
+    assert status == 200
+    result = Image.open(io.BytesIO(body))
+    assert result.format == "JPEG"
+    assert result.size[0] > 80
+
+    metrics = json.loads(request(service, "GET", "/metrics")[1])
+    assert metrics["processed"] == 1
+    assert metrics["in_flight"] == 0
+
+
+def test_frame_with_a_named_profile(service):
+    service.settings_manager.create_profile("square", {"mode": "output_size", "output_size": 100})
+    status, body = request(service, "POST", "/frame?profile=square", jpeg())
+    assert status == 200
+    assert Image.open(io.BytesIO(body)).size == (100, 100)
+
+
+def test_unknown_profile_is_404(service):
+    assert request(service, "POST", "/frame?profile=missing", jpeg())[0] == 404
+
+
+@pytest.mark.parametrize("name", ["../outside", "..%2Foutside", "..%5Coutside", ".."])
+def test_profile_names_outside_the_profiles_directory_are_rejected(service, name):
+    # A valid profile one level above the profiles directory
+    with open(f"{service.settings_manager.base_dir}/outside.json", "w", encoding="utf-8") as f:
+        json.dump({"border_size": 4}, f)
+    assert request(service, "POST", f"/frame?profile={name}", jpeg())[0] == 400
+
+
+def test_unreadable_image_is_400(service):
+    assert request(service, "POST", "/frame", b"not an image")[0] == 400
+    assert service.metrics.to_dict()["failed"] == 1
+
+
+def test_negative_content_length_is_rejected_without_a_slot(service):
+    status = raw_request(service, "POST /frame HTTP/1.1\r\nHost: x\r\nContent-Length: -1\r\n\r\n")
+    assert status == b"400"
+    assert service._slots.acquire(blocking=False)
+    service._slots.release()
+
+
+def test_missing_content_length_is_411(service):
+    assert raw_request(service, "POST /frame HTTP/1.1\r\nHost: x\r\n\r\n") == b"411"
+
+
+def test_too_large_upload_is_413(service, monkeypatch):
+    monkeypatch.setattr(constants, "SERVE_MAX_REQUEST_MB", 0)
+    assert request(service, "POST", "/frame", jpeg())[0] == 413
+
+
+def test_busy_service_is_503(service, monkeypatch):
+    monkeypatch.setattr(constants, "SERVE_QUEUE_TIMEOUT", 0.05)
+    slots = constants.TASKS_IN_FLIGHT_PER_WORKER
+    for _ in range(slots):
+        service._slots.acquire()
+    try:
+        assert request(service, "POST", "/frame", jpeg())[0] == 503
+    finally:
+        for _ in range(slots):
+            service._slots.release()
+    assert service.metrics.to_dict()["rejected"] == 1
+
+
+def test_unknown_path_is_404(service):
+    assert request(service, "GET", "/nothing")[0] == 404
+    assert request(service, "GET", "/health")[0] == 200
+
+
+def test_plans_are_cached_per_profile(service):
+    first = service.load_plan()
+    assert service.load_plan() is first
+    service.settings_manager.create_profile("other", {"border_size": 4})
+    assert service.load_plan("other") is not first
+
+
+def test_only_sockets_are_removed(tmp_path):
+    path = tmp_path / "easyframe.sock"
+    path.write_text("not a socket")
+    assert not _remove_socket(str(path))
+    assert path.exists()
+    assert _remove_socket(str(tmp_path / "missing.sock"))
@@ -0,0 +1,26 @@
+import os
+
+import constants
+from settings_manager import SettingsManager
+
+
+def test_first_launch_creates_the_settings(settings_home):
+    settings_manager = SettingsManager()
+    assert settings_manager.user_settings["active_profile"] == constants.DEFAULT_PROFILE
+    assert settings_manager.list_profiles() == [constants.DEFAULT_PROFILE]
+
+
+def test_later_launches_only_read(settings_home):
+    SettingsManager()
+    paths = [os.path.join(root, name) for root, _, names in os.walk(settings_home) for name in names]
+    for path in paths:
+        os.utime(path, ns=(1, 1))
+
+    SettingsManager().active_profile
+    assert all(os.stat(path).st_mtime_ns == 1 for path in paths)
+
+
+def test_active_profile_is_loaded_on_first_use(settings_home):
+    settings_manager = SettingsManager()
+    assert settings_manager._active_profile is None
+    assert settings_manager.active_profile["mode"] == constants.DEFAULT_MODE
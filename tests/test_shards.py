@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from shards import ShardReport, in_shard, merge_reports, parse_shard
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for text in ("0/4", "5/4", "2", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_every_file_is_in_exactly_one_shard():
+    paths = [f"dir{i % 7}/IMG_{i:04d}.jpg" for i in range(500)]
+    counts = [sum(in_shard(path, (index, 3)) for path in paths) for index in (1, 2, 3)]
+    assert sum(counts) == len(paths)
+    for path in paths:
+        assert sum(in_shard(path, (index, 3)) for index in (1, 2, 3)) == 1
+    assert min(counts) > 100  # Roughly balanced
+
+
+def test_shard_assignment_is_stable():
+    assert in_shard("dir/IMG_0001.jpg", (1, 4)) == in_shard("dir/IMG_0001.jpg", (1, 4))
+    assert [in_shard("a/b.jpg", (index, 4)) for index in (1, 2, 3, 4)].count(True) == 1
+
+
+def write_report(path, shard, results, complete=True):
+    report = ShardReport(str(path), shard, ["basic_profile"])
+    for file, status in results:
+        report.add(file, status, error="broken" if status == "failed" else None)
+    if complete:
+        report.close()
+    else:
+        report._file.close()
+
+
+def test_merge_counts_retries_and_missing_shards(tmp_path):
+    write_report(tmp_path / "r1.jsonl", (1, 3), [("a.jpg", "processed"), ("b.jpg", "failed")])
+    write_report(tmp_path / "r2.jsonl", (2, 3), [("c.jpg", "skipped")], complete=False)
+    write_report(tmp_path / "retry.jsonl", None, [("b.jpg", "processed")])
+
+    summary = merge_reports([str(tmp_path / name) for name in ("retry.jsonl", "r1.jsonl", "r2.jsonl")])
+    assert summary["missing_shards"] == ["3/3"]
+    assert summary["incomplete_runs"] == [str(tmp_path / "r2.jsonl")]
+    assert (summary["files"], summary["processed"], summary["skipped"], summary["failed"]) == (3, 2, 1, 0)
+
+
+def test_merge_ignores_a_truncated_last_line(tmp_path):
+    path = tmp_path / "r1.jsonl"
+    write_report(path, (1, 1), [("a.jpg", "failed")], complete=False)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"type": "file", "path": "b.j')
+
+    summary = merge_reports([str(path)])
+    assert summary["files"] == 1
+    assert summary["failures"] == [{"path": "a.jpg", "error": "broken"}]
+
+
+def test_merge_rejects_other_files(tmp_path):
+    path = tmp_path / "other.jsonl"
+    path.write_text(json.dumps({"type": "file"}) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        merge_reports([str(path)])
@@ -0,0 +1,68 @@
+import io
+
+import pytest
+from PIL import Image, ImageChops
+
+import constants
+import streaming
+from image_processor import apply_border, frame_image
+from streaming import can_stream, decode_into_frame, should_stream
+
+BORDERS = (6, 4, 8, 2)
+COLOR = (0, 120, 255)
+
+
+def encoded(mode="RGB", size=(96, 64), **options):
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert(mode).save(buffer, format="JPEG", **options)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("mode, options", [("RGB", {}), ("L", {}), ("RGB", {"progressive": True})])
+def test_streamed_frame_matches_the_decoded_frame(mode, options):
+    data = encoded(mode, **options)
+    with Image.open(io.BytesIO(data)) as img:
+        assert can_stream(img)
+        framed = decode_into_frame(img, BORDERS, COLOR)
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        expected = apply_border(img, BORDERS, COLOR)
+    assert framed.size == expected.size
+    assert ImageChops.difference(framed, expected).getbbox() is None
+
+
+def test_other_images_are_not_streamed():
+    with Image.open(io.BytesIO(encoded("CMYK"))) as img:
+        assert not can_stream(img)
+    png = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(png, format="PNG")
+    with Image.open(png) as img:
+        assert not can_stream(img)
+
+
+def test_without_the_decoder_api_images_are_not_streamed(monkeypatch):
+    monkeypatch.setattr(streaming, "_has_decoder_api", lambda: False)
+    with Image.open(io.BytesIO(encoded())) as img:
+        assert not can_stream(img)
+        assert not should_stream(img, True)
+
+
+def test_large_images_are_streamed_by_default(monkeypatch):
+    with Image.open(io.BytesIO(encoded())) as img:
+        assert not should_stream(img)
+        assert should_stream(img, True)
+        assert not should_stream(img, False)
+        monkeypatch.setattr(constants, "STREAMING_MIN_MEGAPIXELS", 0.001)
+        assert should_stream(img)
+
+
+def test_truncated_file_raises():
+    data = encoded(quality=100, size=(512, 512))
+    with Image.open(io.BytesIO(data[:len(data) // 2])) as img:
+        with pytest.raises(OSError):
+            decode_into_frame(img, BORDERS, COLOR)
+
+
+def test_frame_image_streams_when_asked():
+    data = encoded()
+    assert frame_image(data, border_size=4, streaming=True) == frame_image(data, border_size=4, streaming=False)
@@ -0,0 +1,13 @@
+import os
+
+from utils import generate_output_path
+
+
+def test_output_names_of_other_formats_keep_the_source_extension():
+    assert generate_output_path(os.path.join("d", "a.png")) == os.path.join("d", "a_processed.png.jpg")
+    assert generate_output_path(os.path.join("d", "a.jpg")) == os.path.join("d", "a_processed.jpg")
+
+
+def test_overwrite_never_targets_a_sibling_jpeg():
+    assert generate_output_path(os.path.join("d", "a.png"), overwrite=True) == os.path.join("d", "a.png.jpg")
+    assert generate_output_path(os.path.join("d", "a.jpg"), overwrite=True) == os.path.join("d", "a.jpg")
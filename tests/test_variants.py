@@ -0,0 +1,42 @@
+import io
+
+from PIL import Image
+
+from image_processor import prepare_variant, process_image_variants, select_resize_source
+
+
+def jpeg(size=(4000, 3000)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (90, 60, 30)).save(buffer, format="JPEG")
+    buffer.seek(0)
+    return buffer
+
+
+def output_size(preset, size=(400, 400)):
+    return {"mode": "output_size", "output_size": list(size), "resample_preset": preset}
+
+
+def test_fast_variants_resize_from_a_larger_variant():
+    img = Image.new("RGB", (4000, 3000))
+    with Image.open(jpeg()) as header:
+        small = prepare_variant(header, output_size("fast", (200, 200)))
+        fine = prepare_variant(header, output_size("quality", (200, 200)))
+    large = Image.new("RGB", (1000, 750))
+    assert select_resize_source(img, {((1000, 750), "quality"): large}, small) is large
+    assert select_resize_source(img, {((1000, 750), "quality"): large}, fine) is img
+    assert select_resize_source(img, {}, small) is img
+
+
+def test_one_decode_gives_every_variant(tmp_path, monkeypatch):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(jpeg((800, 600)).getvalue())
+    opened = []
+    open_image = Image.open
+    monkeypatch.setattr(Image, "open", lambda fp, *args: opened.append(fp) or open_image(fp, *args))
+
+    profiles = [{"border_size": 10}, dict(output_size("balanced", (200, 200)), output_pattern="{filename}_sq.{ext}")]
+    output_paths = process_image_variants(str(path), profiles)
+    assert opened == [str(path)]
+    assert output_paths == [str(tmp_path / "a_processed.jpg"), str(tmp_path / "a_sq.jpg")]
+    assert Image.open(output_paths[0]).size == (820, 620)
+    assert Image.open(output_paths[1]).size == (200, 200)
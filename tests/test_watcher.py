@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import watcher
+from cache import ProcessingCache
+from profile_plan import compile_profile
+from watcher import WatchedFolder, watch_folders
+
+PROFILES = [{"border_size": 4}]
+
+
+def watched(path):
+    return WatchedFolder(str(path), ["basic_profile"], PROFILES, [compile_profile(profile) for profile in PROFILES])
+
+
+def save_jpeg(path):
+    Image.new("RGB", (40, 30), (200, 0, 0)).save(path, format="JPEG")
+
+
+def run_in_background(folders, cache, **options):
+    stop_event = threading.Event()
+    thread = threading.Thread(target=watch_folders, args=(folders, cache), daemon=True,
+                              kwargs=dict(options, stop_event=stop_event, poll_interval=0.02))
+    thread.start()
+    return stop_event, thread
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_scan_waits_for_an_unchanged_file(tmp_path):
+    folder = watched(tmp_path)
+    save_jpeg(tmp_path / "a.jpg")
+    (tmp_path / "b.jpg").write_bytes(b"\xff\xd8 still being written")
+    assert folder.scan(set()) == []
+    assert folder.scan(set()) == [str(tmp_path / "a.jpg")]  # Ends with the JPEG end marker
+    assert folder.scan(set(), settle_seconds=0) == [str(tmp_path / "b.jpg")]
+
+
+def test_finished_files_are_picked_up_again_only_when_changed(tmp_path):
+    folder = watched(tmp_path)
+    path = tmp_path / "a.jpg"
+    save_jpeg(path)
+    folder.scan(set())
+    folder.finish(folder.scan(set())[0])
+    assert folder.scan(set()) == [] and folder.scan(set()) == []
+    os.utime(path, ns=(1, 1))
+    folder.scan(set())
+    assert folder.scan(set()) == [str(path)]
+
+
+def test_ignored_paths_are_not_scanned(tmp_path):
+    folder = watched(tmp_path)
+    save_jpeg(tmp_path / "a.jpg")
+    ignored = {str(tmp_path / "a.jpg")}
+    assert folder.scan(ignored) == [] and folder.scan(ignored) == []
+
+
+@pytest.mark.parametrize("backend", ["threads", "processes"])
+def test_new_files_are_processed_and_recorded(settings_home, tmp_path, backend):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    cache = ProcessingCache(PROFILES)
+    stop_event, thread = run_in_background([watched(inbox)], cache, max_workers=1, backend=backend)
+    try:
+        save_jpeg(inbox / "a.jpg")
+        wait_for(lambda: (inbox / "a_processed.jpg").exists() and str(inbox / "a.jpg") in cache.entries)
+    finally:
+        stop_event.set()
+        thread.join(10)
+    assert not thread.is_alive()
+    assert sorted(os.listdir(inbox)) == ["a.jpg", "a_processed.jpg"]
+    assert ProcessingCache(PROFILES).is_up_to_date(str(inbox / "a.jpg"))
+
+
+class BlockingCache:
+    """A cache whose check of b.jpg blocks until released."""
+
+    def __init__(self):
+        self.release_check = threading.Event()
+
+    def output_paths(self):
+        return set()
+
+    def is_up_to_date(self, path, profile_hash=None):
+        if path.endswith("b.jpg"):
+            self.release_check.wait()
+        return False
+
+    def record(self, *args):
+        pass
+
+    def save(self):
+        pass
+
+
+def test_shutdown_does_not_spin_on_finished_checks(tmp_path, monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_task(path, plans, output_paths=None):
+        started.set()
+        finish.wait(10)
+        return output_paths
+
+    waits = []
+    real_wait = watcher.wait
+
+    def counting_wait(*args, **kwargs):
+        waits.append(time.monotonic())
+        return real_wait(*args, **kwargs)
+
+    monkeypatch.setattr(watcher, "process_image_variants", slow_task)
+    monkeypatch.setattr(watcher, "wait", counting_wait)
+    cache = BlockingCache()
+    save_jpeg(tmp_path / "a.jpg")
+    stop_event, thread = run_in_background([watched(tmp_path)], cache, max_workers=1)
+    try:
+        assert started.wait(10)
+        save_jpeg(tmp_path / "b.jpg")
+        wait_for(lambda: any(path.endswith("b.jpg") for path in os.listdir(tmp_path)))
+        time.sleep(0.1)  # b.jpg is scanned twice and its check is running
+        stop_event.set()
+        cache.release_check.set()
+        time.sleep(0.3)
+        calls = len(waits)
+        time.sleep(0.3)
+        assert len(waits) - calls < 50  # About one per poll interval, not a busy loop
+    finally:
+        cache.release_check.set()
+        finish.set()
+        thread.join(10)
+    assert not thread.is_alive()